@@ -8,6 +8,7 @@ python -m grpc_tools.protoc \
   -I$PROTO_DIR \
   --python_out=$PROTO_DIR \
   --grpc_python_out=$PROTO_DIR \
+  --pyi_out=$PROTO_DIR \
   $PROTO_DIR/protos/spotify.proto
 
 
@@ -0,0 +1,354 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+
+import numpy as np
+
+import config
+
+# Bump whenever the on-disk layout changes; indexes in another format are ignored
+INDEX_VERSION = 1
+
+N_METRICS = 4  # energy, danceability, valence, tempo, as extract_ab_metrics returns them
+N_MFCC = 13
+
+_ISRC_SLOT = np.dtype([("isrc", "S12"), ("mbid", "V16")])
+_MBID_SLOT = np.dtype([("mbid", "V16"), ("row", "<u4")])
+_EMPTY_MBID = bytes(16)  # the nil UUID, never a real recording, marks a free slot
+
+# File name -> dtype and row shape of every memory-mapped array in an index
+_ARRAYS = {
+    "isrc_table": (_ISRC_SLOT, ()),
+    "mbid_table": (_MBID_SLOT, ()),
+    "metrics": (np.dtype("<f4"), (N_METRICS,)),
+    "length": (np.dtype("<f4"), ()),
+    "mfccs": (np.dtype("<f4"), (N_MFCC,)),
+    "beat_start": (np.dtype("<u8"), ()),
+    "beat_count": (np.dtype("<u4"), ()),
+    "beats": (np.dtype("<f4"), ()),
+}
+
+
+def _slot(key: bytes, mask: int) -> int:
+    return zlib.crc32(key) & mask
+
+
+def _capacity(entries: int) -> int:
+    """Smallest power of two keeping the table at most half full."""
+    return 1 << max(4, (2 * entries - 1).bit_length())
+
+
+def _hash_table(entries: np.ndarray, key: str) -> np.ndarray:
+    """Open-addressing table of `entries` keyed on field `key`; the first entry for a key wins.
+
+    Built in probe rounds over the whole array rather than an insert loop:
+    each round, the entries aimed at a free slot take it (the earliest one
+    where several aim at the same slot) and the rest move one slot on, which
+    leaves every entry where a linear-probing lookup will find it.
+    """
+    _, first = np.unique(entries[key], return_index=True)
+    entries = entries[np.sort(first)]
+    table = np.zeros(_capacity(len(entries)), dtype=entries.dtype)
+    mask = len(table) - 1
+    used = np.zeros(len(table), dtype=bool)
+
+    width = entries.dtype[key].itemsize
+    keys = memoryview(entries[key].tobytes())
+    slots = np.fromiter((_slot(keys[i:i + width], mask) for i in range(0, len(keys), width)),
+                        dtype=np.int64, count=len(entries))
+    pending = np.arange(len(entries))
+    while len(pending):
+        free = np.flatnonzero(~used[slots[pending]])
+        _, winners = np.unique(slots[pending[free]], return_index=True)
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[free[winners]] = True
+        won = pending[placed]
+        used[slots[won]] = True
+        table[slots[won]] = entries[won]
+        pending = pending[~placed]
+        slots[pending] = (slots[pending] + 1) & mask
+    return table
+
+
+class ABIndex:
+    """Read side of an offline AcousticBrainz index built by ab_ingest.py.
+
+    An index is a directory of flat arrays: two open-addressing hash tables
+    (ISRC -> MBID and MBID -> row, linear probing on CRC32), and per-row
+    float32 arrays of the high-level metrics, track length, MFCC means and
+    beat positions (one concatenated array with a start and count per row).
+    Nothing is read when the index is created; the arrays are memory-mapped
+    on the first lookup, so startup costs nothing and the OS pages in only
+    what is used. Lookups are a few array reads and need no network.
+
+    `path` is a symlink to the current build, which ABIndexWriter replaces
+    atomically. Every AB_INDEX_RECHECK_INTERVAL seconds the link is
+    resolved again: a new build is mapped in its place, and a missing
+    index is looked for again rather than remembered as absent.
+    """
+
+    def __init__(self, path: str = config.AB_INDEX_PATH):
+        self.path = path
+        self._mapped = None  # (meta, arrays) of the build at self._target
+        self._target = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def meta(self) -> dict | None:
+        mapped = self._load()
+        return mapped[0] if mapped else None
+
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def features_version(self) -> int | None:
+        """FEATURES_VERSION of the extraction the index was built with."""
+        mapped = self._load()
+        return mapped[0].get("features_version") if mapped else None
+
+    def mbid(self, isrc: str) -> str | None:
+        """MusicBrainz recording id for an ISRC, or None if the index has none."""
+        mapped = self._load()
+        if mapped is None:
+            return None
+        arrays = mapped[1]
+        key = isrc.upper().encode("ascii", "replace")[:12]
+        table = arrays["isrc_table"]
+        mask = len(table) - 1
+        i = _slot(key, mask)
+        while True:
+            slot = table[i]
+            if slot["isrc"] == key:
+                return str(uuid.UUID(bytes=slot["mbid"].tobytes()))
+            if not slot["isrc"]:
+                return None
+            i = (i + 1) & mask
+
+    def features(self, mbid: str) -> dict | None:
+        """extract_ab_features' output for an MBID, or None if the index has none."""
+        mapped = self._load()
+        if mapped is None:
+            return None
+        arrays = mapped[1]
+        row = self._row(arrays, mbid)
+        if row is None:
+            return None
+
+        energy, danceability, valence, tempo = arrays["metrics"][row].tolist()
+        start = int(arrays["beat_start"][row])
+        mfccs = arrays["mfccs"][row]
+        return {
+            "energy": round(energy, 3),
+            "danceability": round(danceability, 3),
+            "valence": round(valence, 3),
+            "tempo": round(tempo, 3),
+            "beats": arrays["beats"][start:start + int(arrays["beat_count"][row])].tolist(),
+            "mfccs": mfccs[~np.isnan(mfccs)].tolist(),
+            "length": float(arrays["length"][row]),
+        }
+
+    def stats(self) -> dict:
+        mapped = self._load()
+        if mapped is None:
+            return {"available": False}
+        meta, arrays = mapped
+        return {"available": True, "recordings": meta.get("recordings", len(arrays["metrics"])), "isrcs": meta["isrcs"],
+                "built_at": meta["built_at"]}
+
+    # ── internals ───────────────────────────────────────────────────────────
+    def _row(self, arrays, mbid: str) -> int | None:
+        try:
+            key = uuid.UUID(mbid).bytes
+        except ValueError:
+            return None
+        table = arrays["mbid_table"]
+        mask = len(table) - 1
+        i = _slot(key, mask)
+        while True:
+            slot = table[i]
+            stored = slot["mbid"].tobytes()
+            if stored == key:
+                return int(slot["row"])
+            if stored == _EMPTY_MBID:
+                return None
+            i = (i + 1) & mask
+
+    def _load(self) -> tuple[dict, dict] | None:
+        if time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._refresh()
+                    self._next_check = time.monotonic() + config.AB_INDEX_RECHECK_INTERVAL
+        return self._mapped
+
+    def _refresh(self) -> None:
+        target = os.path.realpath(self.path)
+        if target == self._target:
+            return
+        try:
+            mapped = self._open(target)
+        except (OSError, ValueError) as e:
+            # Not built yet, or removed: look again next interval
+            if not os.path.lexists(self.path):
+                self._mapped, self._target = None, None
+            else:
+                logging.warning("Could not map AcousticBrainz index at %s: %s", target, e)
+            return
+        self._mapped, self._target = mapped, target
+
+    def _open(self, target: str) -> tuple[dict, dict] | None:
+        with open(os.path.join(target, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            logging.warning("Ignoring AcousticBrainz index at %s: format %s, expected %s",
+                            self.path, meta.get("version"), INDEX_VERSION)
+            return None
+
+        arrays = {}
+        for name, (dtype, shape) in _ARRAYS.items():
+            rows = meta["rows"][name]
+            if rows == 0:
+                arrays[name] = np.empty((0, *shape), dtype=dtype)
+            else:
+                arrays[name] = np.memmap(os.path.join(target, f"{name}.bin"), dtype=dtype, mode="r",
+                                         shape=(rows, *shape))
+        logging.info("Mapped AcousticBrainz index at %s (%d recordings, %d ISRCs)",
+                     target, meta.get("recordings", meta["rows"]["metrics"]), meta["isrcs"])
+        return meta, arrays
+
+
+class ABIndexWriter:
+    """Builds an ABIndex directory from features and ISRC pairs fed one at a time.
+
+    Rows, their MBIDs and the ISRC pairs are appended to files as they
+    arrive, so nothing grows in memory while a dump is streamed through.
+    close() reads the keys back to build the hash tables (a few dozen bytes
+    per entry, briefly) and points `path` at the finished directory.
+    """
+
+    def __init__(self, features_version: int, path: str = config.AB_INDEX_PATH):
+        self.path = path
+        self.features_version = features_version
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._dir = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}-", dir=parent)
+        self._rows_written = 0
+        self._beats_written = 0
+        self._files = {name: open(os.path.join(self._dir, f"{name}.bin"), "wb")
+                       for name in ("metrics", "length", "mfccs", "beat_start", "beat_count", "beats")}
+        # Keys of the hash tables, as _MBID_SLOT's mbid field and _ISRC_SLOT records
+        self._mbids = open(os.path.join(self._dir, "mbids.tmp"), "wb")
+        self._isrcs = open(os.path.join(self._dir, "isrcs.tmp"), "wb")
+
+    def __len__(self):
+        return self._rows_written
+
+    def add_features(self, mbid: str, features: dict) -> None:
+        """Append one recording's features; if an MBID is added twice, its first row is used."""
+        key = uuid.UUID(mbid).bytes
+        if key == _EMPTY_MBID:
+            return
+        self._mbids.write(key)
+        self._rows_written += 1
+
+        metrics = [features.get(name, 0.5) for name in ("energy", "danceability", "valence", "tempo")]
+        mfccs = np.full(N_MFCC, np.nan, dtype="<f4")
+        values = (features.get("mfccs") or [])[:N_MFCC]
+        mfccs[:len(values)] = values
+        beats = np.asarray(features.get("beats") or [], dtype="<f4")
+
+        self._files["metrics"].write(np.asarray(metrics, dtype="<f4").tobytes())
+        self._files["length"].write(np.asarray(features.get("length") or 0.0, dtype="<f4").tobytes())
+        self._files["mfccs"].write(mfccs.tobytes())
+        self._files["beat_start"].write(np.asarray(self._beats_written, dtype="<u8").tobytes())
+        self._files["beat_count"].write(np.asarray(len(beats), dtype="<u4").tobytes())
+        self._files["beats"].write(beats.tobytes())
+        self._beats_written += len(beats)
+
+    def add_isrc(self, isrc: str, mbid: str) -> None:
+        """Map an ISRC to a recording; the first mapping seen for an ISRC wins."""
+        key = isrc.strip().upper().encode("ascii", "replace")
+        if len(key) == 12:
+            self._isrcs.write(key + uuid.UUID(mbid).bytes)
+
+    def close(self) -> dict:
+        """Finish the index and move it to `path`, replacing any previous one; returns its meta."""
+        self._close_files()
+
+        isrcs_path = os.path.join(self._dir, "isrcs.tmp")
+        isrc_table = _hash_table(np.fromfile(isrcs_path, dtype=_ISRC_SLOT), "isrc")
+        isrc_table.tofile(os.path.join(self._dir, "isrc_table.bin"))
+        os.remove(isrcs_path)
+
+        mbids_path = os.path.join(self._dir, "mbids.tmp")
+        rows = np.zeros(self._rows_written, dtype=_MBID_SLOT)
+        rows["mbid"] = np.fromfile(mbids_path, dtype="V16")
+        rows["row"] = np.arange(self._rows_written)
+        mbid_table = _hash_table(rows, "mbid")
+        mbid_table.tofile(os.path.join(self._dir, "mbid_table.bin"))
+        os.remove(mbids_path)
+        del rows
+
+        meta = {
+            "version": INDEX_VERSION,
+            "features_version": self.features_version,
+            "built_at": time.time(),
+            "recordings": int(np.count_nonzero(mbid_table["mbid"] != np.void(_EMPTY_MBID))),
+            "isrcs": int(np.count_nonzero(isrc_table["isrc"])),
+            "rows": {
+                "isrc_table": len(isrc_table), "mbid_table": len(mbid_table),
+                **{name: self._rows_written for name in ("metrics", "length", "mfccs", "beat_start", "beat_count")},
+                "beats": self._beats_written,
+            },
+        }
+        with open(os.path.join(self._dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        os.chmod(self._dir, 0o755)  # mkdtemp makes it private
+        self._publish()
+        return meta
+
+    def _publish(self) -> None:
+        # Readers follow the `path` symlink; replacing it is a single atomic
+        # rename, so they see the previous build or this one, never neither
+        previous = os.path.realpath(self.path) if os.path.islink(self.path) else None
+        if os.path.isdir(self.path) and not os.path.islink(self.path):
+            # A plain directory from before the link layout can't be replaced
+            # by a link; move it aside first (readers retry until the link lands)
+            previous = self._dir + ".old"
+            os.rename(self.path, previous)
+        link = self._dir + ".link"
+        os.symlink(os.path.basename(self._dir), link)
+        os.replace(link, self.path)
+        # Processes still mapping the previous build keep their pages until they remap
+        if previous and previous != os.path.realpath(self.path):
+            shutil.rmtree(previous, ignore_errors=True)
+
+    def abort(self) -> None:
+        self._close_files()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _close_files(self) -> None:
+        for f in (*self._files.values(), self._mbids, self._isrcs):
+            f.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_ab_index() -> ABIndex:
+    """Process-wide ABIndex, mapped on first lookup."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ABIndex()
+    return _index
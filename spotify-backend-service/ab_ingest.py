@@ -0,0 +1,232 @@
+"""Build the offline AcousticBrainz index (see ab_index.py) from the public data dumps.
+
+    python ab_ingest.py \\
+        --highlevel acousticbrainz-highlevel-json-20220623.tar.zst \\
+        --lowlevel acousticbrainz-lowlevel-json-20220623-*.tar.zst \\
+        --musicbrainz mbdump.tar.bz2
+
+AcousticBrainz dumps are tar archives (zstd, gzip, bz2, xz or plain) of one
+JSON document per submission, named <mbid>-<n>.json; an extracted
+directory of them works too. Only submission 0 is used, as the live API
+does. The high-level dumps are read first and only the four metrics kept,
+in a scratch SQLite table beside the output; the low-level dumps are then
+streamed through, and every recording with both ends up in the index. Each
+document is parsed and dropped and every row goes to disk, so memory stays
+flat however large the dumps are.
+
+--musicbrainz takes the MusicBrainz database dump (mbdump.tar.bz2, or an
+extracted mbdump/ directory; its isrc and recording tables are joined) or a
+two-column ISRC,MBID text file (tab or comma separated). It is optional:
+without it, ISRCs still resolve through the live MusicBrainz search.
+
+AB_INDEX_PATH (or --out) becomes a symlink to the finished index, replaced
+in one rename; running servers switch to it within AB_INDEX_RECHECK_INTERVAL.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import tarfile
+import tempfile
+import time
+from contextlib import closing
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import config
+from ab_index import ABIndexWriter
+from utils import FEATURES_VERSION, extract_ab_features, extract_ab_metrics
+
+_PROGRESS_EVERY = 100_000
+_METRICS = ("energy", "danceability", "valence", "tempo")
+
+
+# ── AcousticBrainz dumps ─────────────────────────────────────────────────────
+
+def _submission(name: str) -> str | None:
+    """MBID for the path of a submission-0 document; None for anything else."""
+    base = os.path.basename(name)
+    if not base.endswith(".json"):
+        return None
+    mbid, _, n = base[:-5].rpartition("-")
+    return mbid if mbid and n == "0" else None
+
+
+def iter_documents(path: str):
+    """(mbid, parsed JSON) for every submission-0 document in a dump archive or directory."""
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                mbid = _submission(name)
+                if mbid:
+                    with open(os.path.join(root, name), "rb") as f:
+                        yield mbid, json.load(f)
+        return
+
+    with open(path, "rb") as raw:
+        if path.endswith((".zst", ".zstd")):
+            if zstandard is None:
+                raise SystemExit(f"{path}: reading .zst dumps needs the zstandard package")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+            tar = tarfile.open(fileobj=stream, mode="r|")
+        else:
+            tar = tarfile.open(fileobj=raw, mode="r|*")
+        with tar:
+            # Streamed member by member; the archive is never seeked or held whole
+            for member in tar:
+                mbid = _submission(member.name) if member.isfile() else None
+                if mbid:
+                    yield mbid, json.load(tar.extractfile(member))
+
+
+def ingest_acousticbrainz(writer: ABIndexWriter, highlevel: list[str], lowlevel: list[str]) -> None:
+    scratch = tempfile.TemporaryDirectory(prefix=".ab_ingest-", dir=os.path.dirname(os.path.abspath(writer.path)))
+    with scratch, closing(sqlite3.connect(os.path.join(scratch.name, "highlevel.sqlite3"), isolation_level=None)) as db:
+        # A throwaway file: no journal or syncs, and one transaction throughout
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute("CREATE TABLE highlevel (mbid TEXT PRIMARY KEY, energy REAL, danceability REAL, "
+                   "valence REAL, tempo REAL) WITHOUT ROWID")
+        db.execute("BEGIN")
+
+        pending = 0
+        for path in highlevel:
+            logging.info("Reading high-level dump %s", path)
+            for mbid, doc in iter_documents(path):
+                metrics = extract_ab_metrics(doc.get("highlevel", {}))
+                if db.execute("INSERT OR IGNORE INTO highlevel VALUES (?, ?, ?, ?, ?)",
+                              (mbid, *(metrics[name] for name in _METRICS))).rowcount:
+                    pending += 1
+                    if pending % _PROGRESS_EVERY == 0:
+                        logging.info("  %d recordings with high-level data", pending)
+
+        for path in lowlevel:
+            logging.info("Reading low-level dump %s", path)
+            for mbid, doc in iter_documents(path):
+                # Taking the row out means a repeated low-level document finds nothing
+                row = db.execute("DELETE FROM highlevel WHERE mbid = ? RETURNING energy, danceability, valence, tempo",
+                                 (mbid,)).fetchone()
+                if row:
+                    writer.add_features(mbid, {**extract_ab_features({}, doc), **dict(zip(_METRICS, row))})
+                    if len(writer) % _PROGRESS_EVERY == 0:
+                        logging.info("  %d recordings indexed", len(writer))
+
+        unmatched = db.execute("SELECT count(*) FROM highlevel").fetchone()[0]
+        db.execute("COMMIT")
+    logging.info("%d recordings indexed (%d had high-level data only)", len(writer), unmatched)
+
+
+# ── MusicBrainz ISRCs ────────────────────────────────────────────────────────
+
+def _copy_rows(f):
+    """Split a PostgreSQL COPY text table (as in mbdump) into rows of columns."""
+    for line in f:
+        yield line.decode("utf-8").rstrip("\n").split("\t")
+
+
+_MB_TABLES = ("isrc", "recording")
+
+
+def _isrc_pairs_from_tables(tables, scratch_dir=None):
+    """Join the mbdump isrc and recording tables, given as (name, file) in
+    whatever order the dump has them.
+
+    Both are copied into a scratch SQLite file and joined there, so neither
+    table is held in memory.
+    """
+    scratch = tempfile.TemporaryDirectory(prefix=".ab_ingest-", dir=scratch_dir)
+    with scratch, closing(sqlite3.connect(os.path.join(scratch.name, "mbdump.sqlite3"), isolation_level=None)) as db:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute("CREATE TABLE isrc (recording INTEGER NOT NULL, isrc TEXT NOT NULL)")
+        db.execute("CREATE TABLE recording (id INTEGER PRIMARY KEY, gid TEXT NOT NULL)")
+        db.execute("BEGIN")
+        # isrc: id, recording, isrc, ...; recording: id, gid, ...
+        for name, f in tables:
+            if name == "isrc":
+                db.executemany("INSERT INTO isrc VALUES (?, ?)", ((int(row[1]), row[2]) for row in _copy_rows(f)))
+            elif name == "recording":
+                db.executemany("INSERT OR REPLACE INTO recording VALUES (?, ?)",
+                               ((int(row[0]), row[1]) for row in _copy_rows(f)))
+        db.execute("COMMIT")
+        yield from db.execute(
+            "SELECT isrc.isrc, recording.gid FROM isrc JOIN recording ON recording.id = isrc.recording"
+        )
+
+
+def _directory_tables(base):
+    for table in _MB_TABLES:
+        with open(os.path.join(base, table), "rb") as f:
+            yield table, f
+
+
+def _archive_tables(path):
+    # Streamed in archive order: a bz2 dump is never seeked or rescanned
+    seen = set()
+    with tarfile.open(path, "r|*") as tar:
+        for member in tar:
+            table = member.name.rpartition("/")[2]
+            if member.isfile() and table in _MB_TABLES and table not in seen:
+                seen.add(table)
+                yield table, tar.extractfile(member)
+                if len(seen) == len(_MB_TABLES):
+                    return
+
+
+def iter_isrc_pairs(path: str, scratch_dir: str | None = None):
+    """(isrc, mbid) pairs from an mbdump archive or directory, or an ISRC,MBID text file."""
+    if os.path.isdir(path):
+        base = os.path.join(path, "mbdump") if os.path.isdir(os.path.join(path, "mbdump")) else path
+        yield from _isrc_pairs_from_tables(_directory_tables(base), scratch_dir)
+    elif tarfile.is_tarfile(path):
+        yield from _isrc_pairs_from_tables(_archive_tables(path), scratch_dir)
+    else:
+        with open(path) as f:
+            for line in f:
+                parts = line.replace(",", "\t").split("\t")
+                if len(parts) >= 2 and parts[0].strip() and not parts[0].startswith("#"):
+                    yield parts[0].strip(), parts[1].strip()
+
+
+def ingest_musicbrainz(writer: ABIndexWriter, path: str) -> None:
+    logging.info("Reading ISRCs from %s", path)
+    count = 0
+    for isrc, mbid in iter_isrc_pairs(path, os.path.dirname(os.path.abspath(writer.path))):
+        try:
+            writer.add_isrc(isrc, mbid)
+        except ValueError:
+            continue  # malformed MBID
+        count += 1
+    logging.info("%d ISRC mappings read", count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--highlevel", nargs="+", required=True, help="AcousticBrainz high-level dumps")
+    parser.add_argument("--lowlevel", nargs="+", required=True, help="AcousticBrainz low-level dumps")
+    parser.add_argument("--musicbrainz", help="mbdump archive or directory, or an ISRC,MBID text file")
+    parser.add_argument("--out", default=config.AB_INDEX_PATH, help="index directory (default: AB_INDEX_PATH)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    started = time.perf_counter()
+    writer = ABIndexWriter(FEATURES_VERSION, args.out)
+    try:
+        ingest_acousticbrainz(writer, args.highlevel, args.lowlevel)
+        if args.musicbrainz:
+            ingest_musicbrainz(writer, args.musicbrainz)
+        meta = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    logging.info("Index of %d recordings and %d ISRCs written to %s in %.0fs",
+                 meta["recordings"], meta["isrcs"], args.out, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
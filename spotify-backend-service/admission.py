@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import itertools
+
+import grpc
+
+import config
+import deadlines
+import metrics
+
+# Lower is admitted first. Playback and sign-in are what the user is waiting on;
+# analysis is the bulk of the traffic and can always be retried or prefetched later.
+METHOD_PRIORITY = {
+    "ExchangeCode": 0,
+    "PlayNextTrack": 0,
+    "PlayFromQueue": 0,
+    "RegisterQueue": 0,
+    "UpdateQueue": 0,
+    "GetLikedTracks": 1,
+    "StreamLikedTracks": 1,
+    "GetAudioVisualData": 1,
+    "GetAudioVisualDataBatch": 2,
+    "GetVisualTimelines": 2,
+    "PrefetchAudioFeatures": 2,
+}
+DEFAULT_PRIORITY = 1
+
+
+class AdmissionController:
+    """Caps the RPCs running at once, with a short priority queue in front.
+
+    When every slot is taken, callers wait in priority order for at most
+    ADMISSION_QUEUE_TIMEOUT (or their deadline). When the queue is full too,
+    a caller is rejected at once, unless a less urgent caller is waiting; that
+    one is shed instead, so playback is never stuck behind analysis.
+    Rejections are cheap and immediate rather than a slow timeout later.
+    Lives on the server's event loop; not thread-safe.
+    """
+
+    def __init__(self, max_in_flight: int = config.ADMISSION_MAX_IN_FLIGHT,
+                 max_queued: int = config.ADMISSION_MAX_QUEUED,
+                 queue_timeout: float = config.ADMISSION_QUEUE_TIMEOUT):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    def queued(self) -> int:
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    async def acquire(self, priority: int, timeout: float | None = None) -> str | None:
+        """Take a slot; returns None once admitted, else why the call was refused."""
+        if self.in_flight < self.max_in_flight and not self.queued():
+            self.in_flight += 1
+            return None
+        if self.queued() >= self.max_queued and not self._shed_below(priority):
+            return "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        try:
+            async with asyncio.timeout(max(0.0, wait)):
+                return await future
+        except (TimeoutError, asyncio.CancelledError) as e:
+            # The slot may have been granted in the same loop iteration the wait ended
+            granted = future.done() and not future.cancelled() and future.result() is None
+            future.cancel()
+            if isinstance(e, TimeoutError):
+                return None if granted else "queue_timeout"
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.max_in_flight:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _shed_below(self, priority: int) -> bool:
+        """Refuse the newest waiter less urgent than `priority`; False if there is none."""
+        victims = [entry for entry in self._waiters if entry[0] > priority and not entry[2].done()]
+        if not victims:
+            return False
+        _, _, future = max(victims, key=lambda entry: entry[:2])
+        future.set_result("shed")
+        return True
+
+
+class AdmissionInterceptor(grpc.aio.ServerInterceptor):
+    """Admits RPCs through an AdmissionController and enforces their deadlines.
+
+    Refused calls end immediately with RESOURCE_EXHAUSTED. Admitted calls run
+    under their gRPC deadline (see deadlines.within), so upstream requests are
+    bounded by it and everything is cancelled once the client stops waiting.
+    """
+
+    def __init__(self, controller: AdmissionController | None = None):
+        self.controller = controller or AdmissionController()
+        metrics.watch_admission(self.controller)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+        priority = METHOD_PRIORITY.get(method, DEFAULT_PRIORITY)
+        controller = self.controller
+
+        async def admit(context):
+            refused = await controller.acquire(priority, context.time_remaining())
+            if refused:
+                metrics.ADMISSION_REJECTED.labels(method, refused).inc()
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Server overloaded ({refused})")
+
+        if handler.unary_unary:
+            inner = handler.unary_unary
+
+            async def unary_unary(request, context):
+                await admit(context)
+                try:
+                    async with deadlines.within(context.time_remaining()):
+                        return await inner(request, context)
+                except TimeoutError:
+                    await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline exceeded")
+                finally:
+                    controller.release()
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary, handler.request_deserializer, handler.response_serializer
+            )
+
+        if handler.unary_stream:
+            inner = handler.unary_stream
+
+            async def unary_stream(request, context):
+                await admit(context)
+                try:
+                    async with deadlines.within(context.time_remaining()):
+                        async for response in inner(request, context):
+                            yield response
+                except TimeoutError:
+                    await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline exceeded")
+                finally:
+                    controller.release()
+
+            return grpc.unary_stream_rpc_method_handler(
+                unary_stream, handler.request_deserializer, handler.response_serializer
+            )
+
+        return handler
@@ -0,0 +1,318 @@
+"""Local stand-ins for Spotify, MusicBrainz and AcousticBrainz.
+
+    python benchmarks/fake_upstreams.py --library-size 2000 --latency-ms 40 --throttle-rate 0.02
+
+Each service listens on its own port (so the backend's per-host limits and
+connection pools apply exactly as they would upstream) and serves a
+deterministic library: track i has a fixed id, ISRC, MBID, album and artists,
+so every run sees the same data. With --unanalysed-every N, every Nth track
+has no AcousticBrainz data, only a WAV preview clip (served by the Spotify
+stand-in), like recent releases upstream. Latency, 5xx errors and 429s with
+Retry-After are injected per request.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from fixtures import synthetic_lowlevel, synthetic_preview
+
+SERVICES = ("spotify_api", "spotify_accounts", "musicbrainz", "acousticbrainz")
+DEFAULT_PORTS = {"spotify_api": 9101, "spotify_accounts": 9102, "musicbrainz": 9103, "acousticbrainz": 9104}
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0     # fraction of requests answered with 503
+    throttle_rate: float = 0.0  # fraction answered with 429 + Retry-After
+    retry_after: float = 1.0
+    seed: int = 0
+
+
+class Library:
+    """Deterministic fake catalogue of `size` liked tracks, newest first."""
+
+    def __init__(self, size: int, unanalysed_every: int = 0, preview_base: str = ""):
+        self.size = size
+        self.unanalysed_every = unanalysed_every
+        self.preview_base = preview_base
+
+    @staticmethod
+    def track_id(i: int) -> str:
+        return f"bench{i:017d}"
+
+    @staticmethod
+    def isrc(i: int) -> str:
+        return f"QZB{i:09d}"
+
+    @staticmethod
+    def mbid(i: int) -> str:
+        return str(uuid.UUID(int=i, version=4))
+
+    @staticmethod
+    def index(key: str) -> int | None:
+        """Track index from a track id, ISRC or MBID; None if it isn't one of ours."""
+        try:
+            if key.startswith("bench"):
+                return int(key[5:])
+            if key.startswith("QZB"):
+                return int(key[3:])
+            return uuid.UUID(key).int & ((1 << 62) - 1)
+        except ValueError:
+            return None
+
+    def valid(self, i: int | None) -> bool:
+        return i is not None and 0 <= i < self.size
+
+    def analysed(self, i: int) -> bool:
+        """Whether AcousticBrainz has data for track i."""
+        return not self.unanalysed_every or i % self.unanalysed_every != self.unanalysed_every - 1
+
+    def track(self, i: int) -> dict:
+        album = i // 10
+        return {
+            "id": self.track_id(i),
+            "uri": f"spotify:track:{self.track_id(i)}",
+            "name": f"Track {i}",
+            "duration_ms": int((150.0 + i % 120) * 1000),
+            "preview_url": f"{self.preview_base}/previews/{self.track_id(i)}.wav",
+            "external_ids": {"isrc": self.isrc(i)},
+            "artists": [
+                {"id": f"artist{a:016d}", "uri": f"spotify:artist:artist{a:016d}", "name": f"Artist {a}"}
+                for a in sorted({album % 97, (album * 7 + i % 3) % 97})
+            ],
+            "album": {
+                "id": f"album{album:017d}",
+                "uri": f"spotify:album:album{album:017d}",
+                "name": f"Album {album}",
+                "images": [{"url": f"https://i.scdn.co/image/bench{album}-{size}", "height": size, "width": size}
+                           for size in (640, 300, 64)],
+            },
+        }
+
+    def saved_item(self, i: int) -> dict:
+        added_at = _EPOCH - timedelta(minutes=i)
+        return {"added_at": added_at.strftime("%Y-%m-%dT%H:%M:%SZ"), "track": self.track(i)}
+
+
+def fault_injector(app, faults: Faults):
+    """ASGI wrapper that delays requests and swaps some responses for 503/429."""
+    rnd = random.Random(faults.seed)
+
+    async def wrapped(scope, receive, send):
+        if scope["type"] != "http":
+            await app(scope, receive, send)
+            return
+        if faults.latency_ms or faults.jitter_ms:
+            delay = rnd.gauss(faults.latency_ms, faults.jitter_ms) if faults.jitter_ms else faults.latency_ms
+            await asyncio.sleep(max(0.0, delay) / 1000)
+        roll = rnd.random()
+        if roll < faults.throttle_rate:
+            response = Response("rate limited", status_code=429,
+                                headers={"Retry-After": f"{faults.retry_after:g}"})
+        elif roll < faults.throttle_rate + faults.error_rate:
+            response = Response("injected failure", status_code=503)
+        else:
+            await app(scope, receive, send)
+            return
+        await response(scope, receive, send)
+
+    return wrapped
+
+
+# ── Spotify Web API ──────────────────────────────────────────────────────────
+
+def conditional_json(request: Request, payload) -> Response:
+    """JSON with an ETag, or a bodiless 304 when the client already has it (as Spotify does)."""
+    body = json.dumps(payload).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def spotify_api_app(library: Library) -> Starlette:
+    async def me(request: Request):
+        return JSONResponse({"id": "bench-user", "display_name": "Benchmark"})
+
+    async def saved_tracks(request: Request):
+        limit = min(int(request.query_params.get("limit", 20)), 50)
+        offset = int(request.query_params.get("offset", 0))
+        items = [library.saved_item(i) for i in range(offset, min(offset + limit, library.size))]
+        return conditional_json(request, {"items": items, "total": library.size, "limit": limit, "offset": offset})
+
+    async def track(request: Request):
+        i = Library.index(request.path_params["track_id"])
+        if not library.valid(i):
+            return JSONResponse({"error": {"status": 404, "message": "Not found"}}, status_code=404)
+        return conditional_json(request, library.track(i))
+
+    async def tracks(request: Request):
+        ids = request.query_params.get("ids", "").split(",")
+        found = [Library.index(track_id) for track_id in ids]
+        return JSONResponse({"tracks": [library.track(i) if library.valid(i) else None for i in found]})
+
+    async def play(request: Request):
+        await request.body()
+        return Response(status_code=204)
+
+    async def preview(request: Request):
+        i = Library.index(request.path_params["track_id"])
+        if not library.valid(i):
+            return Response(status_code=404)
+        return Response(_preview_body(i), media_type="audio/wav")
+
+    return Starlette(routes=[
+        Route("/v1/me", me),
+        Route("/v1/me/tracks", saved_tracks),
+        Route("/v1/tracks/{track_id}", track),
+        Route("/v1/tracks", tracks),
+        Route("/v1/me/player/play", play, methods=["PUT"]),
+        Route("/previews/{track_id}.wav", preview),
+    ])
+
+
+def spotify_accounts_app() -> Starlette:
+    async def token(request: Request):
+        await request.body()
+        return JSONResponse({"access_token": "bench-token", "token_type": "Bearer",
+                             "expires_in": 3600, "refresh_token": "bench-refresh"})
+
+    return Starlette(routes=[Route("/api/token", token, methods=["POST"])])
+
+
+# ── MusicBrainz / AcousticBrainz ─────────────────────────────────────────────
+
+def musicbrainz_app(library: Library) -> Starlette:
+    async def search(request: Request):
+        query = request.query_params.get("query", "")
+        recordings = []
+        for term in query.split(" OR "):
+            isrc = term.partition(":")[2].strip()
+            i = Library.index(isrc)
+            if library.valid(i):
+                recordings.append({"id": Library.mbid(i), "score": 100, "title": f"Track {i}", "isrcs": [isrc]})
+        return JSONResponse({"recordings": recordings, "count": len(recordings)})
+
+    return Starlette(routes=[Route("/ws/2/recording/", search)])
+
+
+@lru_cache(maxsize=512)
+def _lowlevel_body(i: int) -> bytes:
+    return json.dumps(synthetic_lowlevel(150.0 + i % 120, seed=i)).encode()
+
+
+@lru_cache(maxsize=64)
+def _preview_body(i: int) -> bytes:
+    return synthetic_preview(30.0, 70 + random.Random(i).random() * 110, seed=i)
+
+
+def acousticbrainz_app(library: Library) -> Starlette:
+    def lookup(request):
+        i = Library.index(request.path_params["mbid"])
+        return i if library.valid(i) and library.analysed(i) else None
+
+    async def high_level(request: Request):
+        i = lookup(request)
+        if i is None:
+            return JSONResponse({"message": "Not found"}, status_code=404)
+        rnd = random.Random(i)
+        return JSONResponse({"highlevel": {
+            "danceability": {"value": "danceable", "probability": rnd.random()},
+            "mood_happy": {"value": "happy", "probability": rnd.random()},
+            "mood_relaxed": {"value": "relaxed", "probability": rnd.random()},
+            "bpm": {"value": 70 + rnd.random() * 110},
+        }})
+
+    async def low_level(request: Request):
+        i = lookup(request)
+        if i is None:
+            return JSONResponse({"message": "Not found"}, status_code=404)
+        return Response(_lowlevel_body(i), media_type="application/json")
+
+    return Starlette(routes=[
+        Route("/api/v1/{mbid}/high-level", high_level),
+        Route("/api/v1/{mbid}/low-level", low_level),
+    ])
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+def build_apps(library_size: int, faults: Faults, unanalysed_every: int = 0, preview_base: str = "") -> dict:
+    library = Library(library_size, unanalysed_every, preview_base)
+    apps = {
+        "spotify_api": spotify_api_app(library),
+        "spotify_accounts": spotify_accounts_app(),
+        "musicbrainz": musicbrainz_app(library),
+        "acousticbrainz": acousticbrainz_app(library),
+    }
+    return {name: fault_injector(app, faults) for name, app in apps.items()}
+
+
+def base_urls(host: str, ports: dict) -> dict:
+    return {name: f"http://{host}:{ports[name]}" for name in SERVICES}
+
+
+async def serve(library_size: int, faults: Faults, host: str = "127.0.0.1", ports: dict = DEFAULT_PORTS,
+                unanalysed_every: int = 0):
+    apps = build_apps(library_size, faults, unanalysed_every, base_urls(host, ports)["spotify_api"])
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=host, port=ports[name], log_level="warning", lifespan="off"))
+        for name, app in apps.items()
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--library-size", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="std dev of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--unanalysed-every", type=int, default=0,
+                        help="every Nth track has no AcousticBrainz data, only a preview (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=9101,
+                        help="first of four consecutive ports (Spotify API, accounts, MusicBrainz, AcousticBrainz)")
+
+
+def faults_from_args(args) -> Faults:
+    return Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.retry_after, args.seed)
+
+
+def ports_from_args(args) -> dict:
+    return {name: args.base_port + i for i, name in enumerate(SERVICES)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    ports = ports_from_args(args)
+    for name, url in base_urls(args.host, ports).items():
+        print(f"{name:>17}: {url}")
+    try:
+        asyncio.run(serve(args.library_size, faults_from_args(args), args.host, ports, args.unanalysed_every))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Synthetic upstream documents shared by the benchmarks."""
+import io
+import random
+import wave
+
+import numpy as np
+
+_STATS = ("dmean", "dmean2", "dvar", "dvar2", "max", "mean", "median", "min", "var")
+
+
+def synthetic_lowlevel(seconds: float, seed: int = 0) -> dict:
+    """A document shaped like AcousticBrainz low-level output for a track of `seconds`."""
+    rnd = random.Random(seed)
+
+    def scalar():
+        return {k: rnd.random() for k in _STATS}
+
+    def vector(n):
+        return {k: [rnd.random() for _ in range(n)] for k in _STATS}
+
+    def coeffs(n):
+        return {
+            "mean": [rnd.random() for _ in range(n)],
+            "cov": [[rnd.random() for _ in range(n)] for _ in range(n)],
+            "icov": [[rnd.random() for _ in range(n)] for _ in range(n)],
+        }
+
+    lowlevel = {f"spectral_{name}": scalar() for name in (
+        "centroid", "complexity", "decrease", "energy", "entropy", "flux",
+        "kurtosis", "rms", "rolloff", "skewness", "spread", "strongpeak")}
+    lowlevel.update(barkbands=vector(27), melbands=vector(40), erbbands=vector(40),
+                    mfcc=coeffs(13), gfcc=coeffs(13), average_loudness=rnd.random())
+    beats = [i * 0.47 + rnd.random() * 0.01 for i in range(int(seconds / 0.47))]
+    return {
+        "lowlevel": lowlevel,
+        "metadata": {"audio_properties": {"length": seconds, "sample_rate": 44100, "codec": "mp3"}},
+        "rhythm": {"beats_position": beats, "beats_count": len(beats), "bpm": 127.6,
+                   "beats_loudness": scalar(), "onset_rate": 4.2},
+        "tonal": {"hpcp": vector(36), "thpcp": [rnd.random() for _ in range(36)],
+                  "key_key": "C", "key_scale": "major"},
+    }
+
+
+def synthetic_preview(seconds: float, bpm: float, seed: int = 0, sample_rate: int = 22050) -> bytes:
+    """A mono 16-bit WAV clip: a sustained chord under a noise click on every beat at `bpm`."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    root = 220.0 * 2 ** (rng.integers(0, 12) / 12)
+    audio = sum(0.1 * np.sin(2 * np.pi * root * ratio * t) for ratio in (1.0, 1.26, 1.5))
+    click = rng.standard_normal(sample_rate // 10) * np.exp(-np.arange(sample_rate // 10) / (sample_rate / 150))
+    for beat in np.arange(rng.random() * 0.3, seconds, 60.0 / bpm):
+        start = int(beat * sample_rate)
+        end = min(start + len(click), len(t))
+        audio[start:end] += 0.5 * click[:end - start]
+    pcm = (np.clip(audio * 0.5, -1.0, 1.0) * 32767).astype("<i2")
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
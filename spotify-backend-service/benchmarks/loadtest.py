@@ -0,0 +1,199 @@
+"""Drive the proxy's endpoints at a fixed concurrency and report latency percentiles.
+
+    python benchmarks/loadtest.py --spawn --library-size 2000 --concurrency 32 --duration 20 --json run.json
+    python benchmarks/loadtest.py --spawn --concurrency 32 --duration 20 --compare run.json
+    python benchmarks/loadtest.py --proxy http://127.0.0.1:8000   # an already-running stack
+
+With --spawn the whole stack (fake upstreams, gRPC server, proxy) is started
+via run_stack.py, so runs need no network and are repeatable. Endpoints are
+driven one after another, each for --duration seconds or --requests
+requests, and reported as throughput plus p50/p95/p99 latency. --json saves
+the report; --compare prints the change against a saved one.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_upstreams import Library
+from run_stack import Stack, add_stack_arguments
+
+ENDPOINTS = ("liked", "play-next", "queue-play", "audio-analysis")
+_METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Workload:
+    """Builds request bodies for each endpoint from the fake library's ids."""
+
+    def __init__(self, library_size: int, seed: int):
+        self.library_size = library_size
+        self.rnd = random.Random(seed)
+        self.queue_id = ""  # set by register_queue() before queue-play runs
+
+    def _index(self) -> int:
+        return self.rnd.randrange(self.library_size)
+
+    def request(self, endpoint: str) -> tuple[str, dict]:
+        if endpoint == "liked":
+            return "/tracks/liked", {"access_token": "bench", "total": 50}
+        if endpoint == "play-next":
+            start = self._index()
+            uris = [f"spotify:track:{Library.track_id((start + k) % self.library_size)}" for k in range(50)]
+            return "/tracks/play-next", {"access_token": "bench", "current_track_uri": uris[0], "uris": uris}
+        if endpoint == "queue-play":
+            return "/tracks/queue/play", {"access_token": "bench", "queue_id": self.queue_id,
+                                          "index": self._index()}
+        if endpoint == "audio-analysis":
+            return "/audio-analysis", {"access_token": "bench", "track_id": Library.track_id(self._index())}
+        raise ValueError(f"unknown endpoint {endpoint!r}")
+
+
+async def register_queue(client: httpx.AsyncClient, workload: Workload) -> None:
+    """Register the whole fake library once, as the frontend does before its first click."""
+    uris = [f"spotify:track:{Library.track_id(i)}" for i in range(workload.library_size)]
+    response = await client.post("/tracks/queue", json={"uris": uris})
+    response.raise_for_status()
+    workload.queue_id = response.json()["queue_id"]
+
+
+def succeeded(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    if response.headers.get("content-type", "").startswith("application/json"):
+        return response.json().get("success", True) is not False
+    return True
+
+
+async def drive(client: httpx.AsyncClient, workload: Workload, endpoint: str,
+                concurrency: int, duration: float, requests: int | None) -> dict:
+    latencies, errors = [], 0
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal issued, errors
+        while (issued < requests) if requests else (time.perf_counter() < deadline):
+            issued += 1
+            path, body = workload.request(endpoint)
+            start = time.perf_counter()
+            try:
+                ok = succeeded(await client.post(path, json=body))
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run(proxy_url: str, args) -> dict:
+    workload = Workload(args.library_size, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=proxy_url, limits=limits, timeout=args.timeout) as client:
+        if "queue-play" in args.endpoints:
+            await register_queue(client, workload)
+        for endpoint in args.endpoints:
+            if args.warmup:
+                await drive(client, workload, endpoint, args.concurrency, 0, args.warmup)
+            results[endpoint] = await drive(
+                client, workload, endpoint, args.concurrency, args.duration, args.requests
+            )
+            print_row(endpoint, results[endpoint])
+    return results
+
+
+def print_row(endpoint: str, r: dict) -> None:
+    print(f"{endpoint:>15}  {r['requests']:>7} req  {r['rps']:>8.1f} req/s  "
+          f"p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  "
+          f"errors {r['error_rate'] * 100:5.1f}%")
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nvs {baseline.get('label') or 'baseline'}:")
+    for endpoint, now in current["results"].items():
+        before = baseline["results"].get(endpoint)
+        if not before:
+            continue
+        parts = []
+        for metric in _METRICS:
+            old, new = before.get(metric, 0), now.get(metric, 0)
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            parts.append(f"{metric} {old:g} -> {new:g} ({change})")
+        print(f"{endpoint:>15}  " + "  ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stack_arguments(parser)
+    parser.add_argument("--proxy", help="URL of a running proxy (otherwise use --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start fakes, gRPC server and proxy locally")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint")
+    parser.add_argument("--requests", type=int, help="requests per endpoint (overrides --duration)")
+    parser.add_argument("--warmup", type=int, default=0, help="unmeasured requests per endpoint first")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", help="name stored in the JSON report")
+    parser.add_argument("--json", dest="json_out", help="write the report here")
+    parser.add_argument("--compare", help="report JSON from an earlier run")
+    args = parser.parse_args()
+
+    if not args.spawn and not args.proxy:
+        parser.error("pass --proxy URL or --spawn")
+
+    if args.spawn:
+        with tempfile.TemporaryDirectory(prefix="idle-annie-bench-") as workdir, Stack(args, workdir) as stack:
+            results = asyncio.run(run(stack.proxy_url, args))
+    else:
+        results = asyncio.run(run(args.proxy, args))
+
+    report = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: getattr(args, k) for k in (
+            "concurrency", "duration", "requests", "library_size", "latency_ms", "jitter_ms",
+            "error_rate", "throttle_rate", "real_limits")},
+        "results": results,
+    }
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    if any(r["requests"] == 0 for r in results.values()):
+        sys.exit("an endpoint completed no requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare full vs streaming-selective parsing of AcousticBrainz low-level documents.
+
+    python benchmarks/lowlevel_parse.py                  # synthetic ~4 min track
+    python benchmarks/lowlevel_parse.py --file doc.json  # a real /low-level response
+
+Both paths start from the body split into network-sized chunks and end with
+extract_ab_features' beats/mfccs, so the numbers cover what a request pays.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import aclosing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_lowlevel  # noqa: E402
+from json_stream import ijson, select_paths  # noqa: E402
+from utils import LOWLEVEL_PATHS, extract_ab_features  # noqa: E402
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def full_parse(chunks):
+    lowlevel = json.loads(b"".join(chunks))
+    return extract_ab_features({}, lowlevel)
+
+
+async def stream_parse(chunks):
+    async with aclosing(_aiter(chunks)) as body:
+        lowlevel = await select_paths(body, LOWLEVEL_PATHS)
+    return extract_ab_features({}, lowlevel)
+
+
+def measure(fn, chunks, iterations):
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(fn(chunks))
+        start = time.perf_counter()
+        for _ in range(iterations):
+            loop.run_until_complete(fn(chunks))
+        elapsed = (time.perf_counter() - start) / iterations
+
+        tracemalloc.start()
+        loop.run_until_complete(fn(chunks))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        loop.close()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", help="low-level JSON document to parse instead of a synthetic one")
+    parser.add_argument("--seconds", type=float, default=240.0, help="synthetic track length")
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            body = f.read()
+    else:
+        body = json.dumps(synthetic_lowlevel(args.seconds)).encode()
+    chunks = [body[i:i + args.chunk_size] for i in range(0, len(body), args.chunk_size)]
+
+    print(f"document: {len(body) / 1024:.0f} KiB in {len(chunks)} chunk(s); "
+          f"ijson backend: {ijson.backend if ijson else 'not installed (full-parse fallback)'}")
+    results = {}
+    for name, fn in (("full", full_parse), ("stream", stream_parse)):
+        result, elapsed, peak = measure(fn, chunks, args.iterations)
+        results[name] = result
+        print(f"{name:>7}: {elapsed * 1e3:7.3f} ms/doc   peak {peak / 1024:7.0f} KiB")
+
+    if results["full"] != results["stream"]:
+        sys.exit("streaming parse disagrees with the full parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Run the gRPC server and proxy against local upstream stand-ins.
+
+    python benchmarks/run_stack.py --library-size 2000 --latency-ms 30
+
+Starts fake_upstreams.py, main.py and the proxy as subprocesses with
+SPOTIFY_API_URL and friends pointed at the fakes, and with caches in a
+throwaway directory so every run starts cold. Nothing leaves the machine.
+By default the per-host limits are lifted so the numbers measure this code
+rather than MusicBrainz's 1 req/s; pass --real-limits to keep them.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_upstreams import add_arguments, base_urls, ports_from_args
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_ENV_NAMES = {
+    "spotify_api": "SPOTIFY_API_URL",
+    "spotify_accounts": "SPOTIFY_ACCOUNTS_URL",
+    "musicbrainz": "MUSICBRAINZ_URL",
+    "acousticbrainz": "ACOUSTICBRAINZ_URL",
+}
+_RELAXED_LIMITS = {"rate": 100000.0, "burst": 100000, "concurrency": 512}
+
+
+class Stack:
+    """Context manager owning the fake upstreams, gRPC server and proxy processes."""
+
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.urls = base_urls(args.host, ports_from_args(args))
+        self.proxy_url = f"http://127.0.0.1:{args.proxy_port}"
+        self._procs = []
+
+    def env(self) -> dict:
+        env = dict(os.environ)
+        env.update({_ENV_NAMES[name]: url for name, url in self.urls.items()})
+        env.update(
+            VITE_SPOTIFY_CLIENT_ID="bench",
+            VITE_SPOTIFY_CLIENT_SECRET="bench",
+            GRPC_BIND=f"127.0.0.1:{self.args.grpc_port}",
+            GRPC_TARGET=f"127.0.0.1:{self.args.grpc_port}",
+            METRICS_PORT=str(self.args.metrics_port),
+            FEATURE_CACHE_PATH=os.path.join(self.workdir, "features.sqlite3"),
+            LIBRARY_STORE_PATH=os.path.join(self.workdir, "library.sqlite3"),
+            SESSION_STORE_PATH=os.path.join(self.workdir, "sessions.sqlite3"),
+            QUEUE_STORE_PATH=os.path.join(self.workdir, "queues.sqlite3"),
+            LEASE_STORE_PATH=os.path.join(self.workdir, "leases.sqlite3"),
+            AB_INDEX_PATH=os.path.join(self.workdir, "ab_index"),  # none: lookups go to the fakes
+        )
+        if not self.args.real_limits:
+            netlocs = [url.split("://", 1)[1] for url in self.urls.values()]
+            env["UPSTREAM_HOST_LIMITS"] = json.dumps({netloc: _RELAXED_LIMITS for netloc in netlocs})
+        return env
+
+    def __enter__(self):
+        env = self.env()
+        fake_args = [
+            "--library-size", str(self.args.library_size),
+            "--latency-ms", str(self.args.latency_ms), "--jitter-ms", str(self.args.jitter_ms),
+            "--error-rate", str(self.args.error_rate), "--throttle-rate", str(self.args.throttle_rate),
+            "--retry-after", str(self.args.retry_after), "--seed", str(self.args.seed),
+            "--unanalysed-every", str(self.args.unanalysed_every),
+            "--host", self.args.host, "--base-port", str(self.args.base_port),
+        ]
+        log = open(os.path.join(self.workdir, "stack.log"), "ab")
+        self._spawn([sys.executable, os.path.join(BENCH_DIR, "fake_upstreams.py"), *fake_args], env, log)
+        self._spawn([sys.executable, "main.py"], env, log)
+        self._spawn([sys.executable, "-m", "uvicorn", "proxy:app", "--port", str(self.args.proxy_port),
+                     "--log-level", "warning"], env, log)
+        try:
+            self.wait_ready()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for proc in reversed(self._procs):
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in reversed(self._procs):
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._procs.clear()
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(proc.poll() is not None for proc in self._procs):
+                raise RuntimeError(f"a stack process exited early; see {self.workdir}/stack.log")
+            try:
+                for url in self.urls.values():
+                    httpx.get(url, timeout=1)  # any response means the fake is listening
+                if httpx.get(f"{self.proxy_url}/health", timeout=1).json().get("success"):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            time.sleep(0.2)
+        raise TimeoutError(f"stack not ready after {timeout}s; see {self.workdir}/stack.log")
+
+    def _spawn(self, cmd, env, log):
+        self._procs.append(subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+
+def add_stack_arguments(parser: argparse.ArgumentParser) -> None:
+    add_arguments(parser)
+    parser.add_argument("--proxy-port", type=int, default=8100)
+    parser.add_argument("--grpc-port", type=int, default=50151)
+    parser.add_argument("--metrics-port", type=int, default=9564, help="gRPC server's /metrics (0 disables)")
+    parser.add_argument("--real-limits", action="store_true",
+                        help="keep the production per-host rate limits for the fakes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stack_arguments(parser)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix="idle-annie-bench-") as workdir, Stack(args, workdir) as stack:
+        print(f"proxy: {stack.proxy_url}  (logs: {workdir}/stack.log)")
+        if args.metrics_port:
+            print(f"gRPC server metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+        for name, url in stack.urls.items():
+            print(f"{name:>17}: {url}")
+        try:
+            signal.pause()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
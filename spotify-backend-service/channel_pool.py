@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import logging
+
+import grpc
+import protos.spotify_pb2_grpc as pb2_grpc
+
+import config
+
+# Channels in these states are skipped when handing out stubs
+_UNHEALTHY = (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN)
+
+_COMPRESSION = {
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+    "none": grpc.Compression.NoCompression,
+}
+
+
+def compression_algorithm(name: str) -> grpc.Compression:
+    try:
+        return _COMPRESSION[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown gRPC compression {name!r}; expected one of {', '.join(_COMPRESSION)}")
+
+
+def channel_options(keepalive_time_ms: int, keepalive_timeout_ms: int) -> list:
+    """Client-side HTTP/2 keepalive so idle pooled connections stay warm."""
+    return [
+        ("grpc.keepalive_time_ms", keepalive_time_ms),
+        ("grpc.keepalive_timeout_ms", keepalive_timeout_ms),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # Each pooled channel gets its own subchannel instead of sharing one
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+
+
+class ChannelPool:
+    """A fixed set of long-lived grpc.aio channels shared by every proxy handler.
+
+    Stubs are handed out round-robin, skipping channels whose last observed
+    connectivity state is unhealthy. A background task polls each channel and
+    replaces any that have been shut down.
+    """
+
+    def __init__(
+        self,
+        target: str = config.GRPC_TARGET,
+        size: int = config.GRPC_CHANNEL_POOL_SIZE,
+        keepalive_time_ms: int = config.GRPC_KEEPALIVE_TIME_MS,
+        keepalive_timeout_ms: int = config.GRPC_KEEPALIVE_TIMEOUT_MS,
+        health_check_interval: float = config.GRPC_HEALTH_CHECK_INTERVAL,
+        compression: str = config.GRPC_COMPRESSION,
+        interceptors: list | None = None,
+    ):
+        self.target = target
+        self.size = max(1, size)
+        self.options = channel_options(keepalive_time_ms, keepalive_timeout_ms)
+        self.health_check_interval = health_check_interval
+        self.compression = compression_algorithm(compression)
+        self.interceptors = interceptors
+        self._channels: list[grpc.aio.Channel] = []
+        self._stubs: list[pb2_grpc.SpotifyAuthStub] = []
+        self._states: list[grpc.ChannelConnectivity] = []
+        self._rr = itertools.count()
+        self._health_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        for _ in range(self.size):
+            self._add_channel()
+        self._health_task = asyncio.create_task(self._health_loop())
+        logging.info(f"gRPC channel pool started: {self.size} channel(s) to {self.target}")
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.gather(*(ch.close() for ch in self._channels), return_exceptions=True)
+        self._channels.clear()
+        self._stubs.clear()
+        self._states.clear()
+
+    def stub(self) -> pb2_grpc.SpotifyAuthStub:
+        """Return the next healthy stub, or any stub if none look healthy."""
+        if not self._stubs:
+            raise RuntimeError("gRPC channel pool is not started")
+        start = next(self._rr)
+        for i in range(len(self._stubs)):
+            idx = (start + i) % len(self._stubs)
+            if self._states[idx] not in _UNHEALTHY:
+                return self._stubs[idx]
+        # Everything is failing; let the call surface the real error
+        return self._stubs[start % len(self._stubs)]
+
+    def health(self) -> dict:
+        states = [s.name for s in self._states]
+        return {
+            "target": self.target,
+            "size": len(self._channels),
+            "healthy": sum(s not in _UNHEALTHY for s in self._states),
+            "states": states,
+        }
+
+    def _add_channel(self, idx: int | None = None) -> None:
+        channel = grpc.aio.insecure_channel(
+            self.target, options=self.options, compression=self.compression, interceptors=self.interceptors
+        )
+        # Kick off the connection now rather than on the first request
+        state = channel.get_state(try_to_connect=True)
+        stub = pb2_grpc.SpotifyAuthStub(channel)
+        if idx is None:
+            self._channels.append(channel)
+            self._stubs.append(stub)
+            self._states.append(state)
+        else:
+            self._channels[idx] = channel
+            self._stubs[idx] = stub
+            self._states[idx] = state
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for idx, channel in enumerate(self._channels):
+                state = channel.get_state(try_to_connect=True)
+                if state != self._states[idx]:
+                    logging.info(f"gRPC channel {idx} -> {state.name}")
+                self._states[idx] = state
+                if state == grpc.ChannelConnectivity.SHUTDOWN:
+                    logging.warning(f"Replacing shut down gRPC channel {idx}")
+                    self._add_channel(idx)
@@ -0,0 +1,108 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick zstd (when available) or gzip from an Accept-Encoding header."""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    if zstandard is not None and offered.get("zstd", 0) > 0:
+        return "zstd"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 = gzip container
+            self._sync_flush = zlib.Z_SYNC_FLUSH
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        # Flush every chunk of a streaming body so the client can decode it
+        # immediately instead of waiting for the compressor's buffer to fill
+        out = self._obj.compress(body)
+        return out + (self._obj.flush(self._sync_flush) if more_body else self._obj.flush())
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses with zstd or gzip.
+
+    Bodies smaller than `minimum_size` and responses that already carry a
+    Content-Encoding are passed through untouched. Streaming responses are
+    compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if "content-encoding" not in headers and (more_body or len(body) >= self.minimum_size):
+                    compressor = _Compressor(encoding, self.gzip_level, self.zstd_level)
+                    headers["Content-Encoding"] = encoding
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                    message["body"] = compressor.compress(body, more_body)
+                    if not more_body:
+                        headers["Content-Length"] = str(len(message["body"]))
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            if compressor is not None:
+                message["body"] = compressor.compress(body, more_body)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,175 @@
+import json
+import os
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before anything reads them
+load_dotenv()
+
+# ── Upstream base URLs ───────────────────────────────────────────────────────
+# Overridable so the stack can run against local stand-ins (see benchmarks/)
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com").rstrip("/")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com").rstrip("/")
+MUSICBRAINZ_URL = os.getenv("MUSICBRAINZ_URL", "https://musicbrainz.org").rstrip("/")
+ACOUSTICBRAINZ_URL = os.getenv("ACOUSTICBRAINZ_URL", "https://acousticbrainz.org").rstrip("/")
+
+# ── gRPC server / proxy channel pool ─────────────────────────────────────────
+GRPC_BIND = os.getenv("GRPC_BIND", "[::]:50051")
+GRPC_TARGET = os.getenv("GRPC_TARGET", "127.0.0.1:50051")
+GRPC_CHANNEL_POOL_SIZE = int(os.getenv("GRPC_CHANNEL_POOL_SIZE", "4"))
+GRPC_KEEPALIVE_TIME_MS = int(os.getenv("GRPC_KEEPALIVE_TIME_MS", "30000"))
+GRPC_KEEPALIVE_TIMEOUT_MS = int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "10000"))
+GRPC_HEALTH_CHECK_INTERVAL = float(os.getenv("GRPC_HEALTH_CHECK_INTERVAL", "5"))
+GRPC_MAX_CONCURRENT_RPCS = int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", "5000"))
+GRPC_SHUTDOWN_GRACE = float(os.getenv("GRPC_SHUTDOWN_GRACE", "5"))
+# Admission control: RPCs beyond max in flight wait (by priority) in a short queue, else are refused
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "256"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "512"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+# Prefork mode: this many server processes share GRPC_BIND via SO_REUSEPORT under a supervisor
+GRPC_WORKERS = int(os.getenv("GRPC_WORKERS", "1"))
+GRPC_RESTART_BACKOFF_MAX = float(os.getenv("GRPC_RESTART_BACKOFF_MAX", "30"))
+# Coordinates background jobs between processes so only one runs each sweep
+LEASE_STORE_PATH = os.getenv(
+    "LEASE_STORE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "leases.sqlite3")
+)
+# Message compression between proxy and server: "gzip", "deflate" or "none"
+GRPC_COMPRESSION = os.getenv("GRPC_COMPRESSION", "gzip")
+
+# ── Proxy HTTP responses ─────────────────────────────────────────────────────
+# Bodies smaller than this are sent uncompressed; zstd is used when the client and server both support it
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "500"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_ZSTD_LEVEL = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+# Seconds each route may take, passed on as the gRPC deadline; null disables it.
+# JSON object of overrides, e.g. {"audio-analysis": 30}
+PROXY_DEADLINES = {
+    "auth": 10.0,
+    "liked": 15.0,
+    "liked-stream": None,  # as long as the client keeps reading
+    "play": 5.0,
+    "queue": 5.0,
+    "audio-analysis": 15.0,
+    "audio-analysis-batch": 30.0,
+    "timelines": 30.0,
+    "prefetch": 2.0,
+}
+PROXY_DEADLINES.update(json.loads(os.getenv("PROXY_DEADLINES", "{}")))
+# Retry-After (seconds) sent with 503s, when the gRPC server is overloaded or unreachable
+PROXY_RETRY_AFTER = int(os.getenv("PROXY_RETRY_AFTER", "1"))
+
+# ── Spotify OAuth sessions ───────────────────────────────────────────────────
+SPOTIFY_CLIENT_ID = os.getenv("VITE_SPOTIFY_CLIENT_ID")
+SPOTIFY_CLIENT_SECRET = os.getenv("VITE_SPOTIFY_CLIENT_SECRET")
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "sessions.sqlite3")
+)
+SESSION_REFRESH_MARGIN = float(os.getenv("SESSION_REFRESH_MARGIN", "300"))      # renew this long before expiry
+SESSION_REFRESH_INTERVAL = float(os.getenv("SESSION_REFRESH_INTERVAL", "60"))   # background renewal sweep
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", str(30 * 86400)))  # unused sessions are dropped
+
+# ── Spotify liked tracks ─────────────────────────────────────────────────────
+SPOTIFY_PAGE_SIZE = 50  # max `limit` accepted by /v1/me/tracks
+LIKED_TRACKS_FANOUT = int(os.getenv("LIKED_TRACKS_FANOUT", "8"))
+
+# ── Liked library snapshots ──────────────────────────────────────────────────
+LIBRARY_STORE_PATH = os.getenv(
+    "LIBRARY_STORE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "library.sqlite3")
+)
+LIBRARY_MIN_SYNC_INTERVAL = float(os.getenv("LIBRARY_MIN_SYNC_INTERVAL", "30"))
+LIBRARY_RECONCILE_INTERVAL = float(os.getenv("LIBRARY_RECONCILE_INTERVAL", str(6 * 3600)))
+LIBRARY_DELTA_MAX_PAGES = int(os.getenv("LIBRARY_DELTA_MAX_PAGES", "5"))
+# How long the proxy answers a matching If-None-Match for liked tracks without asking the server
+LIBRARY_ETAG_TTL = float(os.getenv("LIBRARY_ETAG_TTL", str(LIBRARY_MIN_SYNC_INTERVAL)))
+
+# ── Audio feature cache ──────────────────────────────────────────────────────
+FEATURE_CACHE_PATH = os.getenv(
+    "FEATURE_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "features.sqlite3")
+)
+FEATURE_CACHE_MEMORY_BYTES = int(os.getenv("FEATURE_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+# Offline index built from the AcousticBrainz/MusicBrainz dumps by ab_ingest.py; consulted before any live lookup
+AB_INDEX_PATH = os.getenv("AB_INDEX_PATH", os.path.join(os.path.dirname(__file__), ".cache", "ab_index"))
+# How often servers re-resolve AB_INDEX_PATH to pick up a rebuilt (or newly built) index
+AB_INDEX_RECHECK_INTERVAL = float(os.getenv("AB_INDEX_RECHECK_INTERVAL", "30"))
+
+# ── Batch audio analysis ─────────────────────────────────────────────────────
+SPOTIFY_TRACKS_BATCH_SIZE = 50  # max ids accepted by /v1/tracks
+MUSICBRAINZ_ISRC_BATCH_SIZE = int(os.getenv("MUSICBRAINZ_ISRC_BATCH_SIZE", "20"))
+ACOUSTICBRAINZ_BATCH_CONCURRENCY = int(os.getenv("ACOUSTICBRAINZ_BATCH_CONCURRENCY", "8"))
+
+# ── Local feature extraction ─────────────────────────────────────────────────
+# Tracks AcousticBrainz never analysed get features computed from their audio:
+# a file named <track id>.<ext> in LOCAL_AUDIO_DIR if present, else the Spotify preview
+LOCAL_FEATURES_ENABLED = os.getenv("LOCAL_FEATURES_ENABLED", "1") == "1"
+LOCAL_FEATURES_WORKERS = int(os.getenv("LOCAL_FEATURES_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+LOCAL_FEATURES_BATCH_SIZE = int(os.getenv("LOCAL_FEATURES_BATCH_SIZE", "4"))  # clips per process-pool job
+LOCAL_FEATURES_SAMPLE_RATE = int(os.getenv("LOCAL_FEATURES_SAMPLE_RATE", "22050"))
+LOCAL_FEATURES_DECODE_TIMEOUT = float(os.getenv("LOCAL_FEATURES_DECODE_TIMEOUT", "30"))
+LOCAL_AUDIO_DIR = os.getenv("LOCAL_AUDIO_DIR", "")
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")  # needed for anything but WAV, e.g. MP3 previews
+
+# ── Visualization timelines ──────────────────────────────────────────────────
+TIMELINE_FRAME_RATE = float(os.getenv("TIMELINE_FRAME_RATE", "30"))
+TIMELINE_MAX_FRAME_RATE = float(os.getenv("TIMELINE_MAX_FRAME_RATE", "120"))
+TIMELINE_PULSE_DECAY = float(os.getenv("TIMELINE_PULSE_DECAY", "0.15"))  # seconds for a beat pulse to fall to 1/e
+TIMELINE_DENSITY_WINDOW = float(os.getenv("TIMELINE_DENSITY_WINDOW", "4"))  # seconds of beats counted per frame
+# Tracks x frames computed in one vectorized pass; bounds the working memory of a batch
+TIMELINE_MAX_GRID_CELLS = int(os.getenv("TIMELINE_MAX_GRID_CELLS", "1000000"))
+
+# ── Play queues ──────────────────────────────────────────────────────────────
+QUEUE_STORE_PATH = os.getenv(
+    "QUEUE_STORE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "queues.sqlite3")
+)
+# URIs sent per PUT /me/player/play; Spotify rejects very large bodies, so play a window of the queue
+QUEUE_WINDOW = int(os.getenv("QUEUE_WINDOW", "100"))
+QUEUE_CACHE_SIZE = int(os.getenv("QUEUE_CACHE_SIZE", "256"))  # queues kept decoded in memory
+QUEUE_IDLE_TIMEOUT = float(os.getenv("QUEUE_IDLE_TIMEOUT", str(7 * 86400)))
+
+# ── Background prefetch ──────────────────────────────────────────────────────
+PREFETCH_AHEAD = int(os.getenv("PREFETCH_AHEAD", "5"))  # upcoming queue tracks warmed by PlayNextTrack
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_BATCH_SIZE = int(os.getenv("PREFETCH_BATCH_SIZE", "10"))
+PREFETCH_MAX_QUEUED = int(os.getenv("PREFETCH_MAX_QUEUED", "500"))
+
+# ── Upstream request scheduling ──────────────────────────────────────────────
+# rate = sustained requests/second, burst = bucket size, concurrency = max in flight.
+# MusicBrainz asks for at most 1 req/s; AcousticBrainz allows 10 requests per 10s.
+# Keyed by host[:port] of the base URLs above, so stand-ins get the same limits.
+UPSTREAM_HOST_LIMITS = {
+    urlsplit(MUSICBRAINZ_URL).netloc: {"rate": 1.0, "burst": 1, "concurrency": 1},
+    urlsplit(ACOUSTICBRAINZ_URL).netloc: {"rate": 1.0, "burst": 10, "concurrency": 4},
+    urlsplit(SPOTIFY_API_URL).netloc: {"rate": 10.0, "burst": 20, "concurrency": 16},
+    urlsplit(SPOTIFY_ACCOUNTS_URL).netloc: {"rate": 5.0, "burst": 10, "concurrency": 4},
+    "default": {"rate": 5.0, "burst": 10, "concurrency": 8},
+}
+# JSON object of per-host overrides, e.g. {"api.spotify.com": {"rate": 5, "burst": 5, "concurrency": 4}}
+UPSTREAM_HOST_LIMITS.update(json.loads(os.getenv("UPSTREAM_HOST_LIMITS", "{}")))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "30"))
+# Rate limits are shared by every process on the machine (prefork workers, proxy)
+# through a SQLite row per host, so running more processes doesn't multiply them
+UPSTREAM_SHARED_RATE_LIMITS = os.getenv("UPSTREAM_SHARED_RATE_LIMITS", "1") == "1"
+UPSTREAM_BUCKET_STORE_PATH = os.getenv("UPSTREAM_BUCKET_STORE_PATH", LEASE_STORE_PATH)
+
+# ── Upstream HTTP connection pools ───────────────────────────────────────────
+USER_AGENT = os.getenv("USER_AGENT", "idle-annie/0.1.0 ( https://github.com/rileylatham1/idle-annie )")
+UPSTREAM_HTTP2_HOSTS = set(
+    os.getenv("UPSTREAM_HTTP2_HOSTS", "api.spotify.com,accounts.spotify.com").split(",")
+)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "15"))
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+# The proxy serves /metrics itself; the gRPC server exposes it on its own port (0 disables)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+# ── Tracing ──────────────────────────────────────────────────────────────────
+# "file" appends spans to TRACING_FILE as JSON lines, "memory" keeps them in-process, "none" disables
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))  # share of root requests traced
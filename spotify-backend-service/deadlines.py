@@ -0,0 +1,43 @@
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager
+
+# time.monotonic() by which the current request must be answered, if it has a deadline
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("deadline", default=None)
+
+
+def remaining() -> float | None:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@asynccontextmanager
+async def within(seconds: float | None):
+    """Run the block under a deadline `seconds` from now (or the caller's, if sooner).
+
+    Everything awaited inside is cancelled when it passes, which surfaces as
+    TimeoutError here; outbound calls read remaining() to size their own
+    timeouts and skip retries that could not finish in time.
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + max(0.0, seconds)
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        async with asyncio.timeout(deadline - time.monotonic()):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def detached() -> contextvars.Context:
+    """A copy of the current context without a deadline, for work shared by several requests."""
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
@@ -0,0 +1,59 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over `parts`; equal parts give the same tag in every process."""
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+
+
+class LibraryETags:
+    """What the proxy last told each caller about its liked tracks.
+
+    Keyed by caller (session or token) and request shape, each entry holds
+    the ETag that was sent and the sync token it was derived from. A matching
+    If-None-Match within `ttl` of the last check is answered without asking
+    the gRPC server; the server itself would not look at Spotify again that
+    soon. After that the stored sync token lets the server confirm cheaply.
+    """
+
+    def __init__(self, ttl: float = config.LIBRARY_ETAG_TTL, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[str, str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tag(sync_token: str, total: int, normalized: bool) -> str:
+        return make_etag("liked", sync_token, total, normalized)
+
+    def lookup(self, key: tuple, if_none_match: str | None) -> tuple[str, bool] | None:
+        """(sync token, still fresh) for the caller's last ETag if the client sent it back."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not etag_matches(if_none_match, entry[0]):
+            return None
+        _, sync_token, checked_at = entry
+        return sync_token, time.monotonic() - checked_at < self.ttl
+
+    def store(self, key: tuple, etag: str, sync_token: str) -> None:
+        with self._lock:
+            self._entries[key] = (etag, sync_token, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
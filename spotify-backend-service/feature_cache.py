@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_isrc (track_id TEXT PRIMARY KEY, isrc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS isrc_mbid (isrc TEXT PRIMARY KEY, mbid TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS features (mbid TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS timelines (key TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+# Table -> (key column, value column, decoder for stored values)
+_TABLES = {
+    "track_isrc": ("track_id", "isrc", None),
+    "isrc_mbid": ("isrc", "mbid", None),
+    "features": ("mbid", "data", json.loads),
+    "timelines": ("key", "data", None),
+}
+_MAX_PARAMS = 500  # keys per SELECT ... IN (...)
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by the summed size (in bytes) of its entries."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size: int) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FeatureCache:
+    """In-process LRU in front of a SQLite store for the audio-feature pipeline.
+
+    Three independent mappings are cached, one per upstream hop:
+    Spotify track id -> ISRC, ISRC -> MusicBrainz recording id (MBID), and
+    MBID -> extracted features (metrics, beats, mfccs). Visualization
+    timelines derived from those features are cached alongside them, keyed by
+    MBID, frame rate and algorithm version. Features computed locally for
+    tracks AcousticBrainz lacks share the features table under
+    local_features.local_key(track_id). AcousticBrainz is frozen, so
+    entries never expire. Values returned from the memory tier are
+    shared; callers must not mutate them.
+
+    Nothing here waits on SQLite from the event loop: writes go to the
+    memory tier and a queue drained by a writer thread in batched
+    transactions (flush() waits for it), and async code reads through
+    get_many()/lookup(), which touch the disk only on a worker thread.
+    The synchronous get_* methods are for code already off the loop.
+    """
+
+    KINDS = ("track_isrc", "isrc_mbid", "features", "timelines")
+
+    def __init__(self, path: str = config.FEATURE_CACHE_PATH,
+                 memory_bytes: int = config.FEATURE_CACHE_MEMORY_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._memory = LRUCache(memory_bytes)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        # Writes not yet committed: (table, key) -> stored value; read before the disk
+        self._pending: dict[tuple, object] = {}
+        self._pending_cond = threading.Condition()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="feature-cache-writer", daemon=True)
+        self._writer.start()
+        self._stats_lock = threading.Lock()
+        self._stats = {kind: {"memory_hits": 0, "disk_hits": 0, "misses": 0} for kind in self.KINDS}
+
+    # ── public API ──────────────────────────────────────────────────────────
+    def get_isrc(self, track_id: str) -> str | None:
+        return self._get("track_isrc", "track_id", "isrc", track_id)
+
+    def put_isrc(self, track_id: str, isrc: str) -> None:
+        self._put("track_isrc", "track_id", "isrc", track_id, isrc, isrc)
+
+    def get_mbid(self, isrc: str) -> str | None:
+        return self._get("isrc_mbid", "isrc", "mbid", isrc)
+
+    def put_mbid(self, isrc: str, mbid: str) -> None:
+        self._put("isrc_mbid", "isrc", "mbid", isrc, mbid, mbid)
+
+    def get_features(self, mbid: str) -> dict | None:
+        return self._get("features", "mbid", "data", mbid, decode=json.loads)
+
+    def put_features(self, mbid: str, features: dict) -> None:
+        self._put("features", "mbid", "data", mbid, features, json.dumps(features))
+
+    def get_timeline(self, key: str) -> bytes | None:
+        return self._get("timelines", "key", "data", key)
+
+    def put_timeline(self, key: str, blob: bytes) -> None:
+        self._put("timelines", "key", "data", key, blob, blob)
+
+    async def get_many(self, table: str, keys) -> dict:
+        """Cached values for many keys of one table, leaving out the misses.
+
+        Memory hits are answered on the spot; the rest are read in batched
+        queries on a worker thread.
+        """
+        found, missing = {}, []
+        for key in dict.fromkeys(keys):
+            value = self._memory.get((table, key))
+            if value is not None:
+                self._count(table, "memory_hits")
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            found.update(await asyncio.to_thread(self._read_many, table, missing))
+        return found
+
+    async def lookup(self, table: str, key):
+        """get_many for a single key; None on a miss."""
+        return (await self.get_many(table, [key])).get(key)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every put so far is on disk; False if `timeout` ran out first."""
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = {kind: dict(counts) for kind, counts in self._stats.items()}
+        for counts in out.values():
+            lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            counts["hit_ratio"] = round((lookups - counts["misses"]) / lookups, 3) if lookups else 0.0
+        out["memory"] = {"entries": len(self._memory), "bytes": self._memory.bytes,
+                         "max_bytes": self._memory.max_bytes}
+        return out
+
+    def close(self) -> None:
+        """Write out what is pending and stop the writer thread."""
+        with self._pending_cond:
+            self._closed = True
+            self._pending_cond.notify_all()
+        self._writer.join()
+
+    # ── internals ───────────────────────────────────────────────────────────
+    def _get(self, table, key_col, value_col, key, decode=None):
+        value = self._memory.get((table, key))
+        if value is not None:
+            self._count(table, "memory_hits")
+            return value
+        return self._read_many(table, [key]).get(key)
+
+    def _read_many(self, table, keys) -> dict:
+        key_col, value_col, decode = _TABLES[table]
+        raws = {}
+        with self._pending_cond:
+            for key in keys:
+                if (table, key) in self._pending:
+                    raws[key] = self._pending[(table, key)]
+        unread = [key for key in keys if key not in raws]
+        for i in range(0, len(unread), _MAX_PARAMS):
+            chunk = unread[i:i + _MAX_PARAMS]
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT {key_col}, {value_col} FROM {table} WHERE {key_col} IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            raws.update(rows)
+
+        found = {}
+        for key, raw in raws.items():
+            value = decode(raw) if decode else raw
+            self._memory.put((table, key), value, len(raw))
+            found[key] = value
+        with self._stats_lock:
+            self._stats[table]["disk_hits"] += len(found)
+            self._stats[table]["misses"] += len(keys) - len(found)
+        return found
+
+    def _put(self, table, key_col, value_col, key, value, raw):
+        self._memory.put((table, key), value, len(raw))
+        with self._pending_cond:
+            self._pending[(table, key)] = raw
+            self._pending_cond.notify_all()
+
+    def _write_loop(self):
+        while True:
+            with self._pending_cond:
+                self._pending_cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                batch = dict(self._pending)
+            try:
+                with self._db_lock:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    try:
+                        for (table, key), raw in batch.items():
+                            key_col, value_col, _ = _TABLES[table]
+                            self._db.execute(
+                                f"INSERT OR REPLACE INTO {table} ({key_col}, {value_col}) VALUES (?, ?)", (key, raw)
+                            )
+                        self._db.execute("COMMIT")
+                    except BaseException:
+                        self._db.execute("ROLLBACK")
+                        raise
+            except sqlite3.Error as e:
+                # A cache: losing a batch only means computing it again later
+                logging.warning(f"Dropped {len(batch)} feature cache write(s): {e}")
+            with self._pending_cond:
+                for entry, raw in batch.items():
+                    if self._pending.get(entry) is raw:
+                        del self._pending[entry]
+                self._pending_cond.notify_all()
+
+    def _count(self, table, field):
+        with self._stats_lock:
+            self._stats[table][field] += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_feature_cache() -> FeatureCache:
+    """Process-wide FeatureCache, opened on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FeatureCache()
+    return _cache
+
+
+def shutdown() -> None:
+    """Write out pending entries of the process-wide cache, if it was opened."""
+    if _cache is not None:
+        _cache.close()
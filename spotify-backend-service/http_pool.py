@@ -0,0 +1,49 @@
+from urllib.parse import urlsplit
+
+import httpx
+
+import config
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class AsyncClientPool:
+    """One long-lived httpx.AsyncClient per upstream host[:port].
+
+    Clients keep their connections alive between calls (and multiplex over
+    HTTP/2 where the host supports it), so repeat calls skip the TCP+TLS
+    handshake. A client belongs to the event loop it was first used on; the
+    owner of that loop must call aclose() on shutdown.
+    """
+
+    def __init__(self):
+        self._clients = {}
+
+    def for_url(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        client = self._clients.get(parts.netloc)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE and parts.hostname in config.UPSTREAM_HTTP2_HOSTS,
+                limits=httpx.Limits(
+                    max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+                    keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(config.UPSTREAM_READ_TIMEOUT, connect=config.UPSTREAM_CONNECT_TIMEOUT),
+                headers={"User-Agent": config.USER_AGENT},
+            )
+            self._clients[parts.netloc] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+async_clients = AsyncClientPool()
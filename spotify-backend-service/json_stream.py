@@ -0,0 +1,86 @@
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+_UNSEEN = object()
+
+
+class _ChunkReader:
+    """Adapts an async iterator of byte chunks to the async read() ijson expects."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks.__aiter__()
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:  # ijson probes with read(0) to tell bytes from str
+            return b""
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+
+def _set_path(doc: dict, path: str, value) -> None:
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.setdefault(key, {})
+    doc[leaf] = value
+
+
+def _get_path(doc, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        doc = doc[key]
+    return doc
+
+
+async def select_paths(chunks, paths: list[str]) -> dict:
+    """Parse only `paths` (dotted object keys) out of a streamed JSON object.
+
+    Returns a sparse document containing just those paths, so code written
+    against the full document keeps working. Everything else is tokenized and
+    dropped without building Python objects, and parsing stops as soon as
+    every path has been seen. Without ijson the body is parsed in full and
+    then pruned to the same shape.
+    """
+    if ijson is None:
+        body = b"".join([chunk async for chunk in chunks])
+        full = json.loads(body)
+        doc = {}
+        for path in paths:
+            value = _get_path(full, path)
+            if value is not None:
+                _set_path(doc, path, value)
+        return doc
+
+    doc, pending, builders = {}, set(paths), {}
+    routes = {}  # prefix -> selected path it belongs to (or None); prefixes repeat a lot
+    async for prefix, event, value in ijson.parse_async(_ChunkReader(chunks), use_float=True):
+        path = routes.get(prefix, _UNSEEN)
+        if path is _UNSEEN:
+            # Values nested under a selected path carry longer prefixes
+            path = routes[prefix] = next(
+                (p for p in paths if prefix == p or prefix.startswith(p + ".")), None
+            )
+        if path is None or path not in pending:
+            continue
+
+        builder = builders.get(path)
+        if builder is None:
+            builder = builders[path] = [ijson.ObjectBuilder(), 0]
+        builder[0].event(event, value)
+        if event in ("start_map", "start_array"):
+            builder[1] += 1
+        elif event in ("end_map", "end_array"):
+            builder[1] -= 1
+        if builder[1] == 0 and event != "map_key":
+            _set_path(doc, path, builder[0].value)
+            pending.discard(path)
+            if not pending:
+                break
+    return doc
@@ -0,0 +1,52 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class Lease:
+    """A named lock in SQLite that lapses unless its holder renews it.
+
+    With several server processes sharing the on-disk stores, periodic jobs
+    (like the session refresh sweep) call acquire() before each run so only
+    one process does the work; if that process dies, another takes over once
+    the lease expires.
+    """
+
+    def __init__(self, name: str, ttl: float, path: str = config.LEASE_STORE_PATH, holder: str | None = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; False while another live holder has it."""
+        now = time.time()
+        with self._lock:
+            # One statement, so two processes can't both see the lease as free
+            return self._db.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (self.name, self.holder, now + self.ttl, now),
+            ).rowcount == 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
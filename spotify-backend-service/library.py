@@ -0,0 +1,449 @@
+import asyncio
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import aclosing
+
+import protos.spotify_pb2 as pb2
+
+import config
+from upstream import scheduler
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library_tracks (
+    user_id TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    added_at TEXT NOT NULL,
+    track BLOB NOT NULL,
+    PRIMARY KEY (user_id, uri)
+);
+CREATE INDEX IF NOT EXISTS library_tracks_order ON library_tracks (user_id, added_at DESC, uri);
+CREATE TABLE IF NOT EXISTS library_meta (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    reconciled_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS library_etags (
+    user_id TEXT PRIMARY KEY,
+    first_page TEXT NOT NULL  -- Spotify's ETag for the newest saved-tracks page
+);
+"""
+
+
+# Bump when the serialized Track layout in library_tracks changes; older
+# snapshots are then dropped and rebuilt by the next sync
+SNAPSHOT_FORMAT = 2
+
+
+class SpotifyAPIError(Exception):
+    """Non-200 response from the Spotify Web API."""
+
+
+# ── Spotify saved-tracks paging ──────────────────────────────────────────────
+
+async def request_liked_page(token, offset, etag=None):
+    """The raw saved-tracks response; with `etag` Spotify may answer 304 Not Modified."""
+    headers = {"Authorization": f"Bearer {token}"}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = await scheduler.request(
+        "GET",
+        f"{config.SPOTIFY_API_URL}/v1/me/tracks?limit={config.SPOTIFY_PAGE_SIZE}&offset={offset}",
+        headers=headers
+    )
+    if response.status_code not in (200, 304):
+        raise SpotifyAPIError(response.text)
+    return response
+
+
+async def fetch_liked_page(token, offset):
+    response = await request_liked_page(token, offset)
+    if response.status_code != 200:
+        raise SpotifyAPIError(response.text)
+    return response.json()
+
+
+async def iter_liked_pages(token, wanted=None):
+    """Yield (offset, total, page) for the first `wanted` liked tracks, in order.
+
+    The first page is fetched on its own to learn the library size. After
+    that at most LIKED_TRACKS_FANOUT pages are in flight ahead of the
+    consumer, so a slow consumer stops the fetching instead of piling up
+    pages in memory. Queued pages are cancelled if the consumer stops early
+    or a page fails.
+    """
+    first = await fetch_liked_page(token, 0)
+    total = first.get("total", 0)
+    if wanted:
+        total = min(wanted, total)
+        first["items"] = first.get("items", [])[:total]
+    yield 0, total, first
+
+    offsets = iter(range(config.SPOTIFY_PAGE_SIZE, total, config.SPOTIFY_PAGE_SIZE))
+    pending = deque(
+        (off, asyncio.create_task(fetch_liked_page(token, off)))
+        for off in itertools.islice(offsets, config.LIKED_TRACKS_FANOUT)
+    )
+    try:
+        while pending:
+            offset, task = pending.popleft()
+            page = await task
+            # The last page can run past `wanted`
+            page["items"] = page.get("items", [])[:total - offset]
+            nxt = next(offsets, None)
+            if nxt is not None:
+                pending.append((nxt, asyncio.create_task(fetch_liked_page(token, nxt))))
+            yield offset, total, page
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+def append_tracks(response, items, albums, tables=None):
+    """Add saved-track items to `response` (any message with a `tracks` field),
+    building each Album proto once.
+
+    With `tables` the tracks reference albums and artists by index and any
+    new ones are added to the response's own albums/artists fields.
+    """
+    for item in items:
+        track_data = item.get("track") or {}
+        album_data = track_data.get("album") or {}
+        album_id = album_data.get("id", "")
+
+        album = albums.get(album_id)
+        if album is None:
+            album = pb2.Album(
+                name=album_data.get("name", ""),
+                id=album_id,
+                uri=album_data.get("uri", ""),
+                images=pb2.AlbumImages(
+                    url=[img["url"] for img in album_data.get("images", []) if "url" in img]
+                ),
+            )
+            albums[album_id] = album
+        artists = [
+            pb2.Artist(name=a.get("name") or "", id=a.get("id") or "", uri=a.get("uri") or "")
+            for a in track_data.get("artists") or []
+        ]
+
+        # add() builds the Track in place instead of copying it in later
+        track = response.tracks.add(
+            name=track_data.get("name", ""),
+            id=track_data.get("id", ""),
+            uri=track_data.get("uri", ""),
+        )
+        if tables is not None:
+            tables.reference(track, album, artists, response)
+        else:
+            track.artist = artists[0].name if artists else ""
+            track.album.CopyFrom(album)
+            track.artists.extend(artists)
+
+
+class TrackTables:
+    """Album and artist lookup tables for normalized liked-track responses.
+
+    Tracks point at entries by index instead of embedding them; entries are
+    appended to the outgoing message the first time they are referenced. One
+    instance spans a whole response or stream so indexes stay valid across
+    pages.
+    """
+
+    def __init__(self):
+        self._albums = {}
+        self._artists = {}
+
+    def reference(self, track, album, artists, out) -> None:
+        track.album_index = self._index(self._albums, album.id or album.uri or album.name, album, out.albums)
+        track.artist_indices.extend(
+            self._index(self._artists, artist.id or artist.name, artist, out.artists) for artist in artists
+        )
+
+    def normalize(self, track, out) -> None:
+        """Move a full Track's embedded album and artists into the tables."""
+        self.reference(track, track.album, track.artists, out)
+        track.ClearField("album")
+        track.ClearField("artists")
+        track.ClearField("artist")
+
+    @staticmethod
+    def _index(seen, key, entry, table):
+        idx = seen.get(key)
+        if idx is None:
+            idx = seen[key] = len(seen)
+            table.add().CopyFrom(entry)
+        return idx
+
+
+def snapshot_rows(items, albums):
+    """(uri, added_at, serialized full Track) rows for a page of saved-track items."""
+    page = pb2.LikedTracksPage()
+    append_tracks(page, items, albums)
+    return [
+        (track.uri, item.get("added_at", ""), track.SerializeToString())
+        for item, track in zip(items, page.tracks)
+        if track.uri
+    ]
+
+
+# ── Snapshot store ───────────────────────────────────────────────────────────
+
+class LibraryStore:
+    """Per-user snapshot of the liked-tracks library in SQLite.
+
+    Tracks are stored as serialized Track protos keyed by URI (local files
+    have no track id) together with Spotify's `added_at`, and served newest
+    first. `version` changes whenever the snapshot's contents change.
+    """
+
+    def __init__(self, path: str = config.LIBRARY_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SNAPSHOT_FORMAT:
+            # Keep versions so sync tokens never repeat; zero reconciled_at forces a full rebuild
+            self._db.executescript("DELETE FROM library_tracks; UPDATE library_meta SET reconciled_at = 0;")
+            self._db.execute(f"PRAGMA user_version = {SNAPSHOT_FORMAT}")
+
+    def meta(self, user_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, synced_at, reconciled_at FROM library_meta WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"version": row[0], "synced_at": row[1], "reconciled_at": row[2]}
+
+    def count(self, user_id: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM library_tracks WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def added_at(self, user_id: str, uris: list[str]) -> dict:
+        """Stored added_at for whichever of `uris` are already in the snapshot."""
+        if not uris:
+            return {}
+        marks = ",".join("?" * len(uris))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT uri, added_at FROM library_tracks WHERE user_id = ? AND uri IN ({marks})",
+                (user_id, *uris),
+            ).fetchall()
+        return dict(rows)
+
+    def tracks(self, user_id: str, limit: int | None = None) -> list[bytes]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT track FROM library_tracks WHERE user_id = ? ORDER BY added_at DESC, uri LIMIT ?",
+                (user_id, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, user_id: str, rows: list, now: float) -> int:
+        """Upsert rows from a delta sync and bump the version if anything was new."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO library_tracks (user_id, uri, added_at, track) VALUES (?, ?, ?, ?)",
+                [(user_id, *row) for row in rows],
+            )
+            return self._bump(user_id, bool(rows), now, reconciled=False)
+
+    def replace(self, user_id: str, rows: list, now: float) -> int:
+        """Swap in a full reconcile, bumping the version only if the contents differ."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            before = set(self._db.execute(
+                "SELECT uri, added_at FROM library_tracks WHERE user_id = ?", (user_id,)
+            ).fetchall())
+            changed = before != {(uri, added_at) for uri, added_at, _ in rows}
+            if changed:
+                self._db.execute("DELETE FROM library_tracks WHERE user_id = ?", (user_id,))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO library_tracks (user_id, uri, added_at, track) VALUES (?, ?, ?, ?)",
+                    [(user_id, *row) for row in rows],
+                )
+            return self._bump(user_id, changed, now, reconciled=True)
+
+    def touch(self, user_id: str, now: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE library_meta SET synced_at = ? WHERE user_id = ?", (now, user_id))
+
+    def first_page_etag(self, user_id: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT first_page FROM library_etags WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_first_page_etag(self, user_id: str, etag: str | None) -> None:
+        with self._lock:
+            if etag:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO library_etags (user_id, first_page) VALUES (?, ?)", (user_id, etag)
+                )
+            else:
+                self._db.execute("DELETE FROM library_etags WHERE user_id = ?", (user_id,))
+
+    def _bump(self, user_id, changed, now, reconciled):
+        row = self._db.execute(
+            "SELECT version, reconciled_at FROM library_meta WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        version = (row[0] if row else 0) + (1 if changed or row is None else 0)
+        reconciled_at = now if reconciled or row is None else row[1]
+        self._db.execute(
+            "INSERT OR REPLACE INTO library_meta (user_id, version, synced_at, reconciled_at) VALUES (?, ?, ?, ?)",
+            (user_id, version, now, reconciled_at),
+        )
+        return version
+
+
+# ── Sync ─────────────────────────────────────────────────────────────────────
+
+class LibrarySync:
+    """Keeps each user's snapshot current with as few Spotify pages as possible.
+
+    A delta sync walks the newest pages only until it meets a track already in
+    the snapshot with the same added_at. Removals don't show up that way, so a
+    full reconcile runs every LIBRARY_RECONCILE_INTERVAL seconds, and
+    immediately if Spotify's total disagrees with the snapshot after a delta.
+    Calls within LIBRARY_MIN_SYNC_INTERVAL of the last sync reuse the snapshot
+    without touching Spotify.
+
+    A user without any snapshot yet gets no version back: the first full
+    reconcile runs in the background and the caller serves that request
+    straight from Spotify. Store calls run in worker threads so SQLite never
+    blocks the event loop.
+    """
+
+    def __init__(self, store: LibraryStore | None = None):
+        self.store = store or LibraryStore()
+        self._user_ids = OrderedDict()  # access token -> Spotify user id
+        # Held strongly only by the syncs using them, so idle users' locks go away
+        self._locks = weakref.WeakValueDictionary()
+        self._builds = {}  # user id -> background first reconcile
+
+    async def user_id(self, token: str) -> str:
+        user_id = self._user_ids.get(token)
+        if user_id:
+            return user_id
+        response = await scheduler.request(
+            "GET", f"{config.SPOTIFY_API_URL}/v1/me", headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code != 200:
+            raise SpotifyAPIError(response.text)
+        user_id = response.json()["id"]
+        self._user_ids[token] = user_id
+        if len(self._user_ids) > 1024:
+            self._user_ids.popitem(last=False)
+        return user_id
+
+    async def sync(self, token: str) -> tuple[str, int | None]:
+        """Bring the caller's snapshot up to date; returns (user_id, version).
+
+        The version is None while the user's first snapshot is still being
+        built in the background.
+        """
+        user_id = await self.user_id(token)
+        if user_id in self._builds:
+            return user_id, None
+        async with self._lock(user_id):
+            now = time.time()
+            meta = await asyncio.to_thread(self.store.meta, user_id)
+            if meta is None:
+                if user_id not in self._builds:
+                    self._start_build(user_id, token)
+                return user_id, None
+            if now - meta["reconciled_at"] >= config.LIBRARY_RECONCILE_INTERVAL:
+                return user_id, await self._reconcile(user_id, token)
+            if now - meta["synced_at"] < config.LIBRARY_MIN_SYNC_INTERVAL:
+                return user_id, meta["version"]
+            return user_id, await self._delta(user_id, token, meta)
+
+    async def tracks(self, user_id: str, limit: int | None = None) -> list[bytes]:
+        return await asyncio.to_thread(self.store.tracks, user_id, limit)
+
+    def _lock(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    def _start_build(self, user_id, token):
+        task = asyncio.create_task(self._build(user_id, token))
+        self._builds[user_id] = task
+        task.add_done_callback(lambda _: self._builds.pop(user_id, None))
+
+    async def _build(self, user_id, token):
+        try:
+            async with self._lock(user_id):
+                await self._reconcile(user_id, token)
+        except Exception:
+            logging.exception(f"Initial library sync for {user_id} failed")
+
+    async def _delta(self, user_id, token, meta):
+        # The newest page, total included, is unchanged: nothing was added or removed
+        etag = await asyncio.to_thread(self.store.first_page_etag, user_id)
+        first = await request_liked_page(token, 0, etag)
+        if first.status_code == 304:
+            await asyncio.to_thread(self.store.touch, user_id, time.time())
+            return meta["version"]
+        first_etag = first.headers.get("ETag")
+
+        rows, albums, offset = [], {}, 0
+        while True:
+            if offset >= config.LIBRARY_DELTA_MAX_PAGES * config.SPOTIFY_PAGE_SIZE:
+                # So much is new that paging serially would lose to a parallel reconcile
+                return await self._reconcile(user_id, token)
+            page = first.json() if offset == 0 else await fetch_liked_page(token, offset)
+            items = page.get("items", [])
+            page_rows = snapshot_rows(items, albums)
+            known = await asyncio.to_thread(self.store.added_at, user_id, [uri for uri, _, _ in page_rows])
+
+            reached_known = False
+            for row in page_rows:
+                if known.get(row[0]) == row[1]:
+                    reached_known = True
+                    break
+                rows.append(row)
+
+            offset += config.SPOTIFY_PAGE_SIZE
+            if reached_known or offset >= page.get("total", 0):
+                break
+
+        now = time.time()
+        if rows:
+            version = await asyncio.to_thread(self.store.add, user_id, rows, now)
+        else:
+            version = meta["version"]
+            await asyncio.to_thread(self.store.touch, user_id, now)
+
+        # Fewer tracks on Spotify than in the snapshot means something was removed
+        if page.get("total", 0) != await asyncio.to_thread(self.store.count, user_id):
+            logging.info(f"Library for {user_id} drifted; running full reconcile")
+            return await self._reconcile(user_id, token)
+        # Only remembered once the snapshot is known to match that page
+        await asyncio.to_thread(self.store.set_first_page_etag, user_id, first_etag)
+        return version
+
+    async def _reconcile(self, user_id, token):
+        rows, albums = [], {}
+        async with aclosing(iter_liked_pages(token)) as pages:
+            async for _, _, page in pages:
+                rows.extend(snapshot_rows(page.get("items", []), albums))
+        return await asyncio.to_thread(self.store.replace, user_id, rows, time.time())
+
+
+def sync_token(user_id: str, version: int) -> str:
+    return f"{user_id}:{version}"
@@ -0,0 +1,471 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import config
+import metrics
+from feature_cache import get_feature_cache
+from singleflight import SingleFlight
+from upstream import BACKGROUND, INTERACTIVE, scheduler
+
+# Bump whenever analyse() changes so tracks are analysed again instead of
+# being served the old output from the feature cache
+LOCAL_FEATURES_VERSION = 2
+
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+N_MELS = 40
+N_MFCC = 13
+_MIN_BPM, _MAX_BPM = 40.0, 220.0
+_CHUNK_FRAMES = 1024  # STFT frames transformed at once, to bound memory on long files
+
+# Krumhansl-Kessler key profiles, C first
+_MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+_MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+_AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".flac", ".m4a")
+
+
+class LocalFeaturesError(Exception):
+    """A track's audio could not be found, decoded or analysed."""
+
+
+# ── Decoding ─────────────────────────────────────────────────────────────────
+
+def decode_audio(data: bytes, sample_rate: int = config.LOCAL_FEATURES_SAMPLE_RATE) -> np.ndarray:
+    """Mono float32 samples in [-1, 1] at `sample_rate` from an encoded clip.
+
+    WAV is read with the standard library; anything else (Spotify previews
+    are MP3) goes through ffmpeg, which must be on the PATH for those.
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return _decode_wav(data, sample_rate)
+
+    ffmpeg = shutil.which(config.FFMPEG_PATH)
+    if ffmpeg is None:
+        raise LocalFeaturesError("Decoding compressed audio needs ffmpeg, which was not found")
+    try:
+        proc = subprocess.run(
+            [ffmpeg, "-v", "error", "-i", "pipe:0", "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+            input=data, capture_output=True, timeout=config.LOCAL_FEATURES_DECODE_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        raise LocalFeaturesError("ffmpeg timed out decoding audio")
+    if proc.returncode != 0:
+        raise LocalFeaturesError(f"ffmpeg could not decode audio: {proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, dtype="<f4").astype(np.float32)
+
+
+def _decode_wav(data: bytes, sample_rate: int) -> np.ndarray:
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise LocalFeaturesError(f"Unreadable WAV audio: {e}")
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8).astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise LocalFeaturesError(f"Unsupported WAV sample width: {width} bytes")
+
+    samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(samples):
+        # Linear interpolation is plenty for features built from 40 mel bands
+        positions = np.arange(int(len(samples) * sample_rate / rate)) * (rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+# ── Analysis ─────────────────────────────────────────────────────────────────
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+def mel_filterbank(sample_rate: int, n_fft: int = FRAME_SIZE, n_mels: int = N_MELS) -> np.ndarray:
+    """(n_mels x n_fft//2+1) triangular filters, each summing to one."""
+    edges = _mel_to_hz(np.linspace(0.0, _hz_to_mel(sample_rate / 2), n_mels + 2))
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    rising = (freqs - edges[:-2, None]) / (edges[1:-1] - edges[:-2])[:, None]
+    falling = (edges[2:, None] - freqs) / (edges[2:] - edges[1:-1])[:, None]
+    bank = np.maximum(0.0, np.minimum(rising, falling))
+    return bank / np.maximum(bank.sum(axis=1, keepdims=True), 1e-12)
+
+
+def dct_matrix(n_out: int = N_MFCC, n_in: int = N_MELS) -> np.ndarray:
+    """Orthonormal DCT-II basis, (n_out x n_in)."""
+    k = np.arange(n_out)[:, None]
+    n = np.arange(n_in)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_in)) * np.sqrt(2.0 / n_in)
+    basis[0] /= np.sqrt(2.0)
+    return basis
+
+
+def chroma_matrix(sample_rate: int, n_fft: int = FRAME_SIZE) -> np.ndarray:
+    """(12 x n_fft//2+1) map from spectrum bins to pitch classes, 55 Hz - 5 kHz."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    audible = (freqs >= 55.0) & (freqs <= 5000.0)
+    pitch = np.round(12 * np.log2(np.where(audible, freqs, 440.0) / 440.0)).astype(int) + 9  # A = 9 above C
+    return (np.arange(12)[:, None] == pitch % 12) & audible
+
+
+def spectral_frames(samples: np.ndarray, sample_rate: int):
+    """Per-frame mel band power, pitch-class power and spectral centroid.
+
+    Frames are windowed and transformed in chunks, each with one rfft call
+    over a strided (frames x FRAME_SIZE) view, and reduced to bands right away
+    so the full spectrogram is never held.
+    """
+    if len(samples) < FRAME_SIZE:
+        samples = np.pad(samples, (0, FRAME_SIZE - len(samples)))
+    frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    bank = mel_filterbank(sample_rate)
+    chroma_map = chroma_matrix(sample_rate).astype(np.float64)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+
+    mel, chroma, centroid = [], [], []
+    for start in range(0, len(frames), _CHUNK_FRAMES):
+        power = np.abs(np.fft.rfft(frames[start:start + _CHUNK_FRAMES] * window, axis=1)) ** 2
+        mel.append(power @ bank.T)
+        chroma.append(power @ chroma_map.T)
+        total = power.sum(axis=1)
+        centroid.append(np.where(total > 0, power @ freqs / np.maximum(total, 1e-12), 0.0))
+    return np.concatenate(mel), np.concatenate(chroma), np.concatenate(centroid)
+
+
+def onset_strength(mel_db: np.ndarray) -> np.ndarray:
+    """Half-wave rectified spectral flux of the log-mel spectrogram, one value per frame."""
+    flux = np.maximum(0.0, np.diff(mel_db, axis=0, prepend=mel_db[:1])).mean(axis=1)
+    flux -= np.convolve(flux, np.ones(16) / 16, mode="same")  # remove the slowly varying floor
+    return np.maximum(flux, 0.0)
+
+
+def estimate_tempo(onsets: np.ndarray, frame_rate: float) -> tuple[float, float]:
+    """(BPM, pulse clarity) from the onset envelope's autocorrelation.
+
+    Candidate periods are weighted by a log-normal prior around 120 BPM, as
+    tempo estimators usually are, to settle octave ambiguity. Pulse clarity is
+    the autocorrelation at the chosen period relative to lag zero.
+    """
+    x = onsets - onsets.mean()
+    n = len(x)
+    ac = np.fft.irfft(np.abs(np.fft.rfft(x, 2 * n)) ** 2)[:n]
+    if n < 4 or ac[0] <= 0:
+        return 120.0, 0.0
+    ac /= ac[0]
+
+    lags = np.arange(max(1, int(60 * frame_rate / _MAX_BPM)), min(n - 1, int(60 * frame_rate / _MIN_BPM)) + 1)
+    if not len(lags):
+        return 120.0, 0.0
+    bpms = 60.0 * frame_rate / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / 120.0)) ** 2)
+    best = lags[np.argmax(ac[lags] * prior)]
+
+    # Parabolic interpolation between neighbouring lags for a finer period
+    lag = float(best)
+    if 0 < best < n - 1:
+        a, b, c = ac[best - 1], ac[best], ac[best + 1]
+        denom = a - 2 * b + c
+        if denom < 0:
+            lag += 0.5 * (a - c) / denom
+    return 60.0 * frame_rate / lag, float(max(0.0, ac[best]))
+
+
+def track_beats(onsets: np.ndarray, period: float, tightness: float = 100.0) -> np.ndarray:
+    """Beat frames by dynamic programming over the onset envelope (Ellis, 2007).
+
+    Each frame's score is its onset strength plus the best score of a
+    predecessor half to two periods earlier, penalised by how far that gap is
+    from the tempo's period; the beats are then read back from the best frame
+    near the end. The recursion is solved a block of frames at a time.
+    """
+    n = len(onsets)
+    if n == 0 or period <= 0:
+        return np.empty(0, dtype=np.int64)
+    norm = onsets / (onsets.std() or 1.0)
+    gaps = np.arange(max(1, int(round(period / 2))), int(round(2 * period)) + 1)
+    penalty = -tightness * np.log(gaps / period) ** 2
+
+    score = norm.copy()
+    backlink = np.full(n, -1, dtype=np.int64)
+    # No frame looks back less than the shortest gap, so that many frames at
+    # a time depend only on scores already final and are solved together
+    step = int(gaps[0])
+    for start in range(step, n, step):
+        t = np.arange(start, min(start + step, n))
+        prev = t[:, None] - gaps[None, :]
+        candidates = np.where(prev >= 0, score[np.maximum(prev, 0)] + penalty, -np.inf)
+        best = np.argmax(candidates, axis=1)
+        rows = np.arange(len(t))
+        gain = candidates[rows, best]
+        take = gain > 0
+        score[t[take]] += gain[take]
+        backlink[t[take]] = prev[rows, best][take]
+
+    tail = score[max(0, n - int(round(period))):]
+    t = n - len(tail) + int(np.argmax(tail))
+    beats = []
+    while t >= 0:
+        beats.append(t)
+        t = backlink[t]
+    return np.array(beats[::-1], dtype=np.int64)
+
+
+def key_strength(pitch_classes: np.ndarray, profile: np.ndarray) -> float:
+    """Best correlation of a pitch-class distribution with `profile` over all 12 keys."""
+    keys = np.arange(12)
+    rotated = profile[(keys[None, :] - keys[:, None]) % 12]  # row k: the profile rooted at k
+    if not pitch_classes.std():
+        return 0.0
+    return float(np.corrcoef(pitch_classes, rotated)[0, 1:].max())
+
+
+def analyse(samples: np.ndarray, sample_rate: int = config.LOCAL_FEATURES_SAMPLE_RATE,
+            duration: float | None = None) -> dict:
+    """Visualizer features from raw samples, in extract_ab_features' shape.
+
+    tempo, beats and mfccs are measured the way AcousticBrainz's extractor
+    does (13 MFCCs of 40 log mel bands, beat positions in seconds). energy,
+    valence and danceability are proxies, since AcousticBrainz's come from
+    trained classifiers: energy from loudness and brightness, valence from
+    major/minor key strength, tempo and brightness, and danceability from
+    pulse clarity and how close the tempo is to a comfortable dance tempo.
+    When the clip is a preview of a longer track, pass the track's
+    `duration` as `length`. The beats are still only those heard in the clip,
+    in clip time: a preview starts somewhere unknown inside the track, so a
+    grid carried across the whole track would be out of phase.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if not len(samples) or not np.any(samples):
+        raise LocalFeaturesError("Audio is empty or silent")
+    clip_length = len(samples) / sample_rate
+    frame_rate = sample_rate / HOP_SIZE
+
+    mel, chroma, centroid = spectral_frames(samples, sample_rate)
+    mel_db = 20.0 * np.log10(np.maximum(mel, 1e-10))
+    mfccs = (mel_db @ dct_matrix().T).mean(axis=0)
+
+    onsets = onset_strength(mel_db)
+    bpm, clarity = estimate_tempo(onsets, frame_rate)
+    beat_frames = track_beats(onsets, 60.0 * frame_rate / bpm)
+    beats = (beat_frames * HOP_SIZE + FRAME_SIZE / 2) / sample_rate
+
+    length = max(clip_length, duration or 0.0)
+
+    rms_db = 10.0 * np.log10(max(float(np.mean(samples.astype(np.float64) ** 2)), 1e-12))
+    loudness = np.clip((rms_db + 40.0) / 35.0, 0.0, 1.0)  # -40 dBFS quiet .. -5 dBFS loud
+    brightness = np.clip(np.median(centroid) / 4000.0, 0.0, 1.0)
+    tempo = min(max(bpm / 200.0, 0.0), 1.0)
+
+    mode = np.clip(0.5 + key_strength(chroma.sum(axis=0), _MAJOR_PROFILE)
+                   - key_strength(chroma.sum(axis=0), _MINOR_PROFILE), 0.0, 1.0)
+
+    energy = 0.6 * loudness + 0.4 * brightness
+    valence = 0.5 * mode + 0.3 * tempo + 0.2 * brightness
+    danceability = 0.6 * min(1.0, 2.0 * clarity) + 0.4 * np.exp(-0.5 * (np.log2(bpm / 115.0) / 0.35) ** 2)
+
+    return {
+        "energy": round(float(energy), 3),
+        "danceability": round(float(danceability), 3),
+        "valence": round(float(valence), 3),
+        "tempo": round(float(tempo), 3),
+        "beats": [round(float(b), 4) for b in beats],
+        "mfccs": [float(c) for c in mfccs],
+        "length": round(float(length), 3),
+    }
+
+
+def analyse_clips(clips: list[tuple[bytes, float | None]]) -> list[dict | str]:
+    """decode_audio + analyse for each (audio, duration); failures come back as their message.
+
+    Runs in the process pool, so one call carries a whole batch of clips.
+    """
+    results = []
+    for data, duration in clips:
+        try:
+            results.append(analyse(decode_audio(data), duration=duration))
+        except LocalFeaturesError as e:
+            results.append(str(e))
+        except Exception as e:
+            logging.exception("Local audio analysis failed")
+            results.append(f"Local audio analysis failed: {e}")
+    return results
+
+
+# ── Fetching, pooling and caching ────────────────────────────────────────────
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process-wide analysis pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the server process is full of gRPC and event-loop threads
+                _pool = ProcessPoolExecutor(
+                    max_workers=max(1, config.LOCAL_FEATURES_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def local_key(track_id: str) -> str:
+    """Feature-cache key for a track's locally computed features."""
+    return f"local:v{LOCAL_FEATURES_VERSION}:{track_id}"
+
+
+async def cached_features(track_ids: list[str]) -> tuple[dict, list]:
+    """Locally analysed features already cached, and the track ids without any."""
+    track_ids = list(dict.fromkeys(track_ids))
+    cached = await get_feature_cache().get_many("features", [local_key(track_id) for track_id in track_ids])
+    found = {track_id: cached[local_key(track_id)] for track_id in track_ids if local_key(track_id) in cached}
+    return found, [track_id for track_id in track_ids if track_id not in found]
+
+
+async def _track_metadata(track_ids: list[str], access_token: str, priority: int) -> tuple[dict, dict]:
+    """(preview_url, duration in seconds) per track from Spotify's multi-id /v1/tracks."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    found, errors = {}, {}
+    for i in range(0, len(track_ids), config.SPOTIFY_TRACKS_BATCH_SIZE):
+        chunk = track_ids[i:i + config.SPOTIFY_TRACKS_BATCH_SIZE]
+        resp = await scheduler.request(
+            "GET", f"{config.SPOTIFY_API_URL}/v1/tracks",
+            params={"ids": ",".join(chunk)}, headers=headers, priority=priority,
+        )
+        if resp.status_code != 200:
+            for track_id in chunk:
+                errors[track_id] = f"Spotify track metadata error: {resp.text}"
+            continue
+        for track_id, track in zip(chunk, resp.json().get("tracks", [])):
+            if track is None:
+                errors[track_id] = "Spotify track not found"
+            else:
+                found[track_id] = (track.get("preview_url"), (track.get("duration_ms") or 0) / 1000.0)
+    return found, errors
+
+
+def _local_file(track_id: str) -> str | None:
+    if not config.LOCAL_AUDIO_DIR:
+        return None
+    for ext in _AUDIO_EXTENSIONS:
+        path = os.path.join(config.LOCAL_AUDIO_DIR, track_id + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+async def _load_audio(track_id: str, preview_url: str | None, priority: int) -> bytes:
+    """The track's audio: a file in LOCAL_AUDIO_DIR if there is one, else its Spotify preview."""
+    path = _local_file(track_id)
+    if path:
+        with open(path, "rb") as f:
+            return await asyncio.to_thread(f.read)
+    if not preview_url:
+        raise LocalFeaturesError("No preview or local audio for this track")
+    resp = await scheduler.request("GET", preview_url, priority=priority)
+    if resp.status_code != 200:
+        raise LocalFeaturesError(f"Preview download failed with HTTP {resp.status_code}")
+    return resp.content
+
+
+async def analyse_tracks(track_ids: list[str], access_token: str,
+                         priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Locally computed features for many tracks, as (features, errors) keyed by track id.
+
+    Cached results are served as-is; the rest are downloaded, then decoded
+    and analysed in the process pool LOCAL_FEATURES_BATCH_SIZE clips per job,
+    and cached so each track is only ever analysed once.
+    """
+    results, missing = await cached_features(track_ids)
+    if not missing:
+        return results, {}
+    if not config.LOCAL_FEATURES_ENABLED:
+        return results, {track_id: "Local audio analysis is disabled" for track_id in missing}
+
+    errors = {}
+    if config.LOCAL_AUDIO_DIR and all(_local_file(track_id) for track_id in missing):
+        metadata = {track_id: (None, None) for track_id in missing}
+    else:
+        metadata, errors = await _track_metadata(missing, access_token, priority)
+
+    ids = list(metadata)
+    loaded = await asyncio.gather(
+        *(_load_audio(track_id, metadata[track_id][0], priority) for track_id in ids), return_exceptions=True
+    )
+    clips = []
+    for track_id, audio in zip(ids, loaded):
+        if isinstance(audio, asyncio.CancelledError):
+            raise audio
+        if isinstance(audio, Exception):
+            errors[track_id] = str(audio)
+            metrics.LOCAL_FEATURE_ANALYSES.labels("no_audio").inc()
+        else:
+            clips.append((track_id, audio))
+
+    loop = asyncio.get_running_loop()
+    size = max(1, config.LOCAL_FEATURES_BATCH_SIZE)
+    batches = [clips[i:i + size] for i in range(0, len(clips), size)]
+    analysed = await asyncio.gather(*(
+        loop.run_in_executor(get_pool(), analyse_clips, [(audio, metadata[tid][1]) for tid, audio in batch])
+        for batch in batches
+    ))
+
+    cache = get_feature_cache()
+    for batch, outcomes in zip(batches, analysed):
+        for (track_id, _), outcome in zip(batch, outcomes):
+            if isinstance(outcome, str):
+                errors[track_id] = outcome
+                metrics.LOCAL_FEATURE_ANALYSES.labels("error").inc()
+            else:
+                cache.put_features(local_key(track_id), outcome)
+                results[track_id] = outcome
+                metrics.LOCAL_FEATURE_ANALYSES.labels("ok").inc()
+    return results, errors
+
+
+_local_flights = SingleFlight("local_features")
+
+
+async def get_local_features(track_id: str, access_token: str, priority: int = INTERACTIVE) -> dict:
+    """analyse_tracks for one track, coalescing concurrent requests for it."""
+    async def run():
+        results, errors = await analyse_tracks([track_id], access_token, priority)
+        if track_id not in results:
+            raise LocalFeaturesError(errors.get(track_id, "Local audio analysis failed"))
+        return results[track_id]
+
+    return await _local_flights.do(track_id, run)
@@ -1,12 +1,32 @@
+import asyncio
 import grpc
-from concurrent import futures
 import protos.spotify_pb2 as pb2
 import protos.spotify_pb2_grpc as pb2_grpc
-import requests
 import base64
+import multiprocessing
+import multiprocessing.connection
 import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 import logging
 from dotenv import load_dotenv
+import config
+from channel_pool import compression_algorithm
+from http_pool import async_clients
+import feature_cache
+import local_features
+import metrics
+import tracing
+from admission import AdmissionInterceptor
+from sessions import SessionError, get_session_manager
+from prefetch import Prefetcher, track_ids_from_uris
+from queues import QueueError, get_queue_manager
+from library import LibrarySync, SpotifyAPIError, TrackTables, append_tracks, iter_liked_pages, sync_token
+from timelines import CURVES, clamp_frame_rate, get_visual_timelines
+from upstream import BACKGROUND, INTERACTIVE, scheduler
+from utils import get_acousticbrainz_features_batch, get_track_features, pack_f32
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,13 +35,43 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
 # Load environment variables (you can also hardcode the client ID/secret)
-CLIENT_ID = os.getenv('VITE_SPOTIFY_CLIENT_ID')
-CLIENT_SECRET = os.getenv('VITE_SPOTIFY_CLIENT_SECRET')
+CLIENT_ID = config.SPOTIFY_CLIENT_ID
+CLIENT_SECRET = config.SPOTIFY_CLIENT_SECRET
 REDIRECT_URI = 'http://127.0.0.1:5173/callback'
 
 
+def audio_response(features: dict, packed: bool) -> pb2.GetAudioVisualDataResponse:
+    """Build a GetAudioVisualDataResponse, packing beats/mfccs as float32 bytes if asked."""
+    response = pb2.GetAudioVisualDataResponse(
+        success=True,
+        energy=features["energy"],
+        valence=features["valence"],
+        tempo=features["tempo"],
+        danceability=features["danceability"],
+    )
+    if packed:
+        response.beats_f32 = pack_f32(features["beats"])
+        response.mfccs_f32 = pack_f32(features["mfccs"])
+    else:
+        response.beats.extend(features["beats"])
+        response.mfccs.extend(features["mfccs"])
+    return response
+
+
 class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
-    def ExchangeCode(self, request, context):
+    def __init__(self):
+        self.library = LibrarySync()
+        self.sessions = get_session_manager()
+        self.prefetcher = Prefetcher()
+        self.queues = get_queue_manager()
+
+    async def _access_token(self, request) -> str:
+        """The caller's Spotify token: from its session when it sent one, else as given."""
+        if request.session_id:
+            return await self.sessions.access_token(request.session_id)
+        return request.access_token
+
+    async def ExchangeCode(self, request, context):
         try:
             if not CLIENT_ID or not CLIENT_SECRET:
                 raise ValueError("Missing Spotify CLIENT_ID or CLIENT_SECRET")
@@ -29,7 +79,7 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
             auth_code = request.code
             logging.info(f"Received auth code: {auth_code}")
 
-            token_url = "https://accounts.spotify.com/api/token"
+            token_url = f"{config.SPOTIFY_ACCOUNTS_URL}/api/token"
             auth_header = {
                 'Authorization': f'Basic {self._get_basic_auth()}',
                 'Content-Type': 'application/x-www-form-urlencoded'
@@ -41,11 +91,17 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
                 'redirect_uri': REDIRECT_URI
             }
 
-            response = requests.post(token_url, headers=auth_header, data=data)
+            response = await scheduler.request("POST", token_url, headers=auth_header, data=data)
             if response.status_code == 200:
                 token_data = response.json()
-                session_token = token_data['access_token']
-                return pb2.AuthResponse(session_token=session_token, success=True)
+                # Keep the refresh token server-side so the session outlives this access token
+                session = self.sessions.create(token_data)
+                return pb2.AuthResponse(
+                    session_token=session.access_token,
+                    success=True,
+                    session_id=session.session_id,
+                    expires_in=session.expires_in(),
+                )
             else:
                 context.set_details(response.text)
                 context.set_code(grpc.StatusCode.INTERNAL)
@@ -57,67 +113,78 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
             return pb2.AuthResponse(session_token="", success=False)
 
 
-    def GetLikedTracks(self, request, context):
+    async def GetLikedTracks(self, request, context):
         try:
-            token = request.access_token
-            total = request.total or 50
-            offset = 0
-            all_tracks = []
-
-            while offset < total:
-                response = requests.get(
-                    f"https://api.spotify.com/v1/me/tracks?limit=50&offset={offset}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
+            # Served from the local snapshot after a (usually one-page) delta sync
+            access_token = await self._access_token(request)
+            user_id, version = await self.library.sync(access_token)
+            tables = TrackTables() if request.normalized else None
+            if version is None:
+                # No snapshot yet: it is being built in the background, so
+                # answer from just the pages this request needs
+                response = pb2.LikedTracksResponse(success=True)
+                albums = {}
+                async with aclosing(iter_liked_pages(access_token, request.total or 50)) as pages:
+                    async for _, _, page in pages:
+                        append_tracks(response, page.get("items", []), albums, tables)
+                return response
+
+            token = sync_token(user_id, version)
+            if request.sync_token == token:
+                return pb2.LikedTracksResponse(success=True, sync_token=token, not_modified=True)
+
+            response = pb2.LikedTracksResponse(success=True, sync_token=token)
+            for blob in await self.library.tracks(user_id, request.total or 50):
+                track = response.tracks.add()
+                track.MergeFromString(blob)
+                if tables is not None:
+                    tables.normalize(track, response)
+            return response
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.LikedTracksResponse(success=False)
 
-                if response.status_code != 200:
-                    context.set_details(f"Spotify API error: {response.text}")
-                    context.set_code(grpc.StatusCode.INTERNAL)
-                    return pb2.LikedTracksResponse(success=False)
-
-                data = response.json()
-                for item in data.get("items", []):
-                    track_data = item.get("track", {})
-                    artist_name = track_data["artists"][0]["name"] if track_data.get("artists") else ""
-
-                    album_data = track_data.get("album", {})
-                    album_name = album_data.get("name", "")
-                    album_id = album_data.get("id", "")
-                    album_uri = album_data.get("uri", "")
-
-                    # Extract image URLs
-                    image_urls = [img["url"] for img in album_data.get("images", []) if "url" in img]
-                    album_images = pb2.AlbumImages(url=image_urls)
-
-                    # Build album proto
-                    album = pb2.Album(
-                        name=album_name,
-                        id=album_id,
-                        uri=album_uri,
-                        images=album_images
-                    )
-
-                    # Append to results
-                    all_tracks.append(pb2.Track(
-                        name=track_data.get("name", ""),
-                        id=track_data.get("id", ""),
-                        artist=artist_name,
-                        album=album,
-                        uri=track_data.get("uri", "")
-                    ))
-
-                offset += 50
-
-            return pb2.LikedTracksResponse(tracks=all_tracks, success=True)
+        except SpotifyAPIError as e:
+            context.set_details(f"Spotify API error: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return pb2.LikedTracksResponse(success=False)
 
         except Exception as e:
             context.set_details(str(e))
             context.set_code(grpc.StatusCode.INTERNAL)
             return pb2.LikedTracksResponse(success=False)
 
-    def PlayNextTrack(self, request, context):
+    async def StreamLikedTracks(self, request, context):
+        try:
+            albums = {}
+            tables = TrackTables() if request.normalized else None
+            token = await self._access_token(request)
+            # If the client goes away grpc.aio cancels this coroutine, and
+            # aclosing() cancels the page fetches still in flight
+            async with aclosing(iter_liked_pages(token, request.total or None)) as pages:
+                async for offset, total, page in pages:
+                    out = pb2.LikedTracksPage(offset=offset, total=total)
+                    append_tracks(out, page.get("items", []), albums, tables)
+                    yield out
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+
+        except SpotifyAPIError as e:
+            context.set_details(f"Spotify API error: {e}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+
+        except Exception as e:
+            logging.exception("Error in StreamLikedTracks")
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+
+    async def PlayNextTrack(self, request, context):
         try:
-            token = request.access_token
+            token = await self._access_token(request)
             current_uri = request.current_track_uri
             uris = list(request.uris)
 
@@ -134,8 +201,9 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
 
             ordered_uris = [current_uri] + uris
 
-            play_response = requests.put(
-                "https://api.spotify.com/v1/me/player/play",
+            play_response = await scheduler.request(
+                "PUT",
+                f"{config.SPOTIFY_API_URL}/v1/me/player/play",
                 headers={
                     "Authorization": f"Bearer {token}",
                     "Content-Type": "application/json"
@@ -150,76 +218,114 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
                 context.set_code(grpc.StatusCode.INTERNAL)
                 return pb2.PlayNextTrackResponse(success=False)
 
+            # Warm the tracks about to play so their visuals are ready when they start
+            upcoming = track_ids_from_uris(ordered_uris[:config.PREFETCH_AHEAD + 1])
+            self.prefetcher.schedule(upcoming, token, owner=request.session_id or token)
             return pb2.PlayNextTrackResponse(success=True)
 
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.PlayNextTrackResponse(success=False)
+
         except Exception as e:
             logging.exception("Playback error")
             context.set_details(str(e))
             context.set_code(grpc.StatusCode.INTERNAL)
             return pb2.PlayNextTrackResponse(success=False)
 
-    def GetAudioVisualData(self, request, context):
+    async def RegisterQueue(self, request, context):
         try:
-            # ── 0. unpack request ─────────────────────────────────────────────────
-            spotify_token = request.access_token
-            track_id      = request.track_id
-
-            # ── 1. Spotify → ISRC ────────────────────────────────────────────────
-            track_url = f"https://api.spotify.com/v1/tracks/{track_id}"
-            headers   = {"Authorization": f"Bearer {spotify_token}"}
-            track_resp = requests.get(track_url, headers=headers)
-            track_resp.raise_for_status()
-            isrc = track_resp.json().get("external_ids", {}).get("isrc")
-            if not isrc:
-                raise ValueError("Spotify track has no ISRC")
-
-            # ── 2. ISRC → MBID (MusicBrainz) ─────────────────────────────────────
-            mb_params = {"query": f"isrc:{isrc}", "fmt": "json", "limit": 1}
-            mb_resp   = requests.get(
-                "https://musicbrainz.org/ws/2/recording",
-                params=mb_params,
-                headers={"User-Agent": "YourAppName/1.0"},
+            queue = self.queues.register(list(request.uris), request.queue_id)
+            return pb2.QueueResponse(success=True, queue_id=queue.queue_id, length=len(queue),
+                                     version=queue.version)
+
+        except Exception as e:
+            logging.exception("Error in RegisterQueue")
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return pb2.QueueResponse(success=False)
+
+    async def UpdateQueue(self, request, context):
+        try:
+            queue = self.queues.update(
+                request.queue_id, list(request.add_uris), list(request.remove_uris), request.add_at_front,
             )
-            mb_resp.raise_for_status()
-            recordings = mb_resp.json().get("recordings", [])
-            if not recordings:
-                raise ValueError("MusicBrainz had no recording for this ISRC")
-            mbid = recordings[0]["id"]
-
-            # ── 3. AcousticBrainz high‑level  ────────────────────────────────────
-            ab_high = requests.get(
-                f"https://acousticbrainz.org/api/v1/{mbid}/high-level"
+            return pb2.QueueResponse(success=True, queue_id=queue.queue_id, length=len(queue),
+                                     version=queue.version)
+
+        except QueueError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return pb2.QueueResponse(success=False)
+
+        except Exception as e:
+            logging.exception("Error in UpdateQueue")
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return pb2.QueueResponse(success=False)
+
+    async def PlayFromQueue(self, request, context):
+        try:
+            token = await self._access_token(request)
+            queue = self.queues.get(request.queue_id)
+            if not len(queue):
+                context.set_details("Queue is empty")
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                return pb2.PlayFromQueueResponse(success=False)
+            if request.track_uri:
+                index = queue.index_of(request.track_uri)
+            elif 0 <= request.index < len(queue):
+                index = request.index
+            else:
+                context.set_details(f"Index {request.index} is outside the queue (length {len(queue)})")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return pb2.PlayFromQueueResponse(success=False)
+
+            # Spotify only needs what it will play next, not the whole library
+            window = queue.window(index, config.QUEUE_WINDOW)
+            play_response = await scheduler.request(
+                "PUT",
+                f"{config.SPOTIFY_API_URL}/v1/me/player/play",
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                json={"uris": window},
             )
-            ab_high.raise_for_status()
-            hl = ab_high.json().get("highlevel", {})
-
-            energy        = hl.get("energy",        {}).get("value", 0.4)
-            danceability  = hl.get("danceability",  {}).get("value", 0.4)
-            valence       = hl.get("happy",         {}).get("value", 0.4)
-            tempo         = hl.get("bpm",           {}).get("value", 0.4)
-
-            # ── 4. AcousticBrainz low‑level beats  ───────────────────────────────
-            ab_low_url = f"https://acousticbrainz.org/api/v1/{mbid}/low-level"
-            ab_low_resp = requests.get(ab_low_url)
-            if ab_low_resp.status_code != 200:
-                context.set_details(f"Failed to get AcousticBrainz low-level data: {ab_low_resp.text}")
+            if play_response.status_code not in [200, 204]:
+                context.set_details(f"Spotify playback error: {play_response.text}")
                 context.set_code(grpc.StatusCode.INTERNAL)
-                return pb2.GetAudioVisualDataResponse(success=False)
-            lowlevel = ab_low_resp.json()
-
-            beats = lowlevel.get("rhythm", {}).get("beats_position", [])
-            mfccs = lowlevel.get("lowlevel", {}).get("mfcc", []).get("mean", [])
-
-            # ── 5. Build and return gRPC response  ───────────────────────────────
-            return pb2.GetAudioVisualDataResponse(
-                success       = True,
-                energy        = energy,
-                valence       = valence,
-                tempo         = tempo,
-                danceability  = danceability,
-                beats         = beats,
-                mfccs         = mfccs,
-            )
+                return pb2.PlayFromQueueResponse(success=False)
+
+            upcoming = track_ids_from_uris(window[:config.PREFETCH_AHEAD + 1])
+            self.prefetcher.schedule(upcoming, token, owner=request.session_id or token)
+            return pb2.PlayFromQueueResponse(success=True, index=index, window=len(window))
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.PlayFromQueueResponse(success=False)
+
+        except QueueError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            return pb2.PlayFromQueueResponse(success=False)
+
+        except Exception as e:
+            logging.exception("Playback error")
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.INTERNAL)
+            return pb2.PlayFromQueueResponse(success=False)
+
+    async def GetAudioVisualData(self, request, context):
+        try:
+            # Same engine (and cache) as the proxy's /audio-analysis endpoint
+            features = await get_track_features(request.track_id, await self._access_token(request))
+
+            return audio_response(features, request.packed_arrays)
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.GetAudioVisualDataResponse(success=False)
 
         except Exception as e:
             logging.exception("Error in GetAudioVisualData")
@@ -227,25 +333,223 @@ class SpotifyAuthServicer(pb2_grpc.SpotifyAuthServicer):
             context.set_details(str(e))
             return pb2.GetAudioVisualDataResponse(success=False)
 
+    async def GetAudioVisualDataBatch(self, request, context):
+        try:
+            track_ids = list(request.track_ids)
+            if not track_ids:
+                context.set_details("No track_ids provided")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return pb2.GetAudioVisualDataBatchResponse(success=False)
+
+            token = await self._access_token(request)
+            features, errors = await get_acousticbrainz_features_batch(track_ids, token)
+
+            response = pb2.GetAudioVisualDataBatchResponse(success=True)
+            for track_id in track_ids:
+                result = response.results.add(track_id=track_id)
+                if track_id in features:
+                    result.data.CopyFrom(audio_response(features[track_id], request.packed_arrays))
+                else:
+                    result.error = errors.get(track_id, "Unknown error")
+            return response
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.GetAudioVisualDataBatchResponse(success=False)
+
+        except Exception as e:
+            logging.exception("Error in GetAudioVisualDataBatch")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return pb2.GetAudioVisualDataBatchResponse(success=False)
+
+    async def GetVisualTimelines(self, request, context):
+        try:
+            track_ids = list(request.track_ids)
+            if not track_ids:
+                context.set_details("No track_ids provided")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                return pb2.GetVisualTimelinesResponse(success=False)
+
+            frame_rate = clamp_frame_rate(request.frame_rate)
+            # A single track is the one being opened right now; many are grid warm-up
+            priority = INTERACTIVE if len(track_ids) == 1 else BACKGROUND
+            token = await self._access_token(request)
+            timelines, errors = await get_visual_timelines(track_ids, token, frame_rate, priority)
+
+            response = pb2.GetVisualTimelinesResponse(success=True, frame_rate=frame_rate)
+            for track_id in track_ids:
+                result = response.timelines.add(track_id=track_id)
+                if track_id in timelines:
+                    timeline = timelines[track_id]
+                    result.frames = timeline["frames"]
+                    for name in CURVES:
+                        setattr(result, name, timeline[name].tobytes())
+                else:
+                    result.error = errors.get(track_id, "Unknown error")
+            return response
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.GetVisualTimelinesResponse(success=False)
+
+        except Exception as e:
+            logging.exception("Error in GetVisualTimelines")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return pb2.GetVisualTimelinesResponse(success=False)
+
+    async def PrefetchAudioFeatures(self, request, context):
+        try:
+            token = await self._access_token(request)
+            queued = self.prefetcher.schedule(
+                list(request.track_ids), token, owner=request.session_id or token, replace=request.replace,
+            )
+            return pb2.PrefetchResponse(success=True, queued=queued)
+
+        except SessionError as e:
+            context.set_details(str(e))
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            return pb2.PrefetchResponse(success=False)
+
+        except Exception as e:
+            logging.exception("Error in PrefetchAudioFeatures")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(str(e))
+            return pb2.PrefetchResponse(success=False)
+
     def _get_basic_auth(self):
         # Encodes client_id:client_secret in base64
         return base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode('utf-8')).decode('utf-8')
 
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    pb2_grpc.add_SpotifyAuthServicer_to_server(SpotifyAuthServicer(), server)
-
-    logging.info("Starting gRPC server on port 50051...")
-    server.add_insecure_port('[::]:50051')
-    server.start()
+async def serve(worker: int = 0):
+    """Run one gRPC server process until SIGINT/SIGTERM.
+
+    In prefork mode `worker` numbers the process; every worker binds the same
+    port and the kernel spreads connections between them.
+    """
+    tracing.setup("grpc-server")
+    server = grpc.aio.server(
+        # Everything is I/O bound coroutines now; cap in-flight RPCs rather than threads
+        maximum_concurrent_rpcs=config.GRPC_MAX_CONCURRENT_RPCS,
+        compression=compression_algorithm(config.GRPC_COMPRESSION),
+        # Admission last, so refused calls are still traced and counted
+        interceptors=[tracing.ServerTracingInterceptor(), metrics.MetricsInterceptor(), AdmissionInterceptor()],
+        options=[
+            # Accept the proxy's keepalive pings on idle pooled channels
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.min_recv_ping_interval_without_data_ms", config.GRPC_KEEPALIVE_TIME_MS // 2),
+            ("grpc.http2.max_ping_strikes", 0),
+            # Lets prefork workers bind the same address
+            ("grpc.so_reuseport", 1),
+        ],
+    )
+    servicer = SpotifyAuthServicer()
+    pb2_grpc.add_SpotifyAuthServicer_to_server(servicer, server)
+
+    # Timeline computation runs here; a named pool lets /metrics report its backlog
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(config.WORKER_THREADS, thread_name_prefix="grpc-worker")
+    loop.set_default_executor(executor)
+    metrics.watch_executor("grpc-worker", executor)
+    if config.METRICS_PORT:
+        # Workers can't share a metrics port; scrape METRICS_PORT + worker for each
+        metrics_port = config.METRICS_PORT + worker
+        metrics.start_metrics_server(metrics_port)
+        logging.info(f"Serving metrics on :{metrics_port}/metrics")
+
+    logging.info(f"Starting gRPC server on {config.GRPC_BIND} (worker {worker}, pid {os.getpid()})...")
+    server.add_insecure_port(config.GRPC_BIND)
+    await server.start()
+    # Renew session tokens before they expire so requests never wait on it
+    refresher = asyncio.create_task(servicer.sessions.run())
+    servicer.prefetcher.start()
+
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
 
     try:
-        server.wait_for_termination()
-    except KeyboardInterrupt:
+        await stop.wait()
         logging.info("Shutting down gRPC server...")
-        server.stop(0)
+        await server.stop(config.GRPC_SHUTDOWN_GRACE)
+    finally:
+        refresher.cancel()
+        await servicer.prefetcher.close()
+        local_features.shutdown()
+        feature_cache.shutdown()
+        await async_clients.aclose()
+        tracing.shutdown()
+
+
+def run_worker(worker: int) -> None:
+    asyncio.run(serve(worker))
+
+
+def supervise(workers: int) -> None:
+    """Keep `workers` server processes running until SIGINT/SIGTERM.
+
+    Workers are spawned rather than forked (gRPC's core doesn't survive a
+    fork) and share the SQLite caches, sessions, library snapshots and queues
+    on disk. A worker that exits is restarted, with exponential backoff if it
+    keeps dying young.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    procs, started, backoff = {}, {}, {}
+    stopping = False
+
+    def start(worker):
+        proc = ctx.Process(target=run_worker, args=(worker,), name=f"grpc-worker-{worker}")
+        proc.start()
+        procs[worker], started[worker] = proc, time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logging.info(f"Supervising {workers} gRPC workers on {config.GRPC_BIND}")
+    for worker in range(workers):
+        start(worker)
+
+    restart_at = {}
+    while not stopping:
+        multiprocessing.connection.wait([p.sentinel for p in procs.values()], timeout=0.5)
+        now = time.monotonic()
+        for worker, proc in list(procs.items()):
+            if proc.is_alive() or worker in restart_at:
+                continue
+            # Crash loops back off; a worker that ran for a while restarts at once
+            if now - started[worker] > 60:
+                delay = 0.0
+            else:
+                delay = min(config.GRPC_RESTART_BACKOFF_MAX, max(0.5, backoff.get(worker, 0.0) * 2))
+            backoff[worker] = delay
+            restart_at[worker] = now + delay
+            logging.warning(f"gRPC worker {worker} (pid {proc.pid}) exited with {proc.exitcode}; "
+                            f"restarting in {delay:.1f}s")
+        for worker, at in list(restart_at.items()):
+            if now >= at and not stopping:
+                del restart_at[worker]
+                start(worker)
+
+    logging.info("Stopping gRPC workers...")
+    for proc in procs.values():
+        if proc.is_alive():
+            proc.terminate()  # SIGTERM: each worker drains its RPCs
+    deadline = time.monotonic() + config.GRPC_SHUTDOWN_GRACE + 5
+    for proc in procs.values():
+        proc.join(max(0.0, deadline - time.monotonic()))
+        if proc.is_alive():
+            proc.kill()
 
 
 if __name__ == '__main__':
-    serve()
\ No newline at end of file
+    if config.GRPC_WORKERS > 1:
+        supervise(config.GRPC_WORKERS)
+    else:
+        asyncio.run(serve())
@@ -0,0 +1,276 @@
+import asyncio
+import time
+
+import grpc
+import httpx
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+
+import singleflight
+from feature_cache import get_feature_cache
+
+# Covers everything from a memory-cache hit to a retried MusicBrainz lookup
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+GRPC_SERVER_LATENCY = Histogram(
+    "grpc_server_handling_seconds", "Time spent handling each RPC, including streaming.",
+    ["method", "code"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request to the last response byte, per proxy route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency per attempt, from send to headers.",
+    ["host", "status"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_WAIT = Histogram(
+    "upstream_wait_seconds", "Time an upstream call waited for a concurrency slot and rate-limit token.",
+    ["host"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_BYTES = Counter(
+    "upstream_bytes_total", "Bytes exchanged with each upstream host.", ["host", "direction"],
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total", "Upstream attempts that were retried, by the status or error that caused it.",
+    ["host", "status"],
+)
+ADMISSION_REJECTED = Counter(
+    "grpc_admission_rejected_total", "RPCs refused by admission control, by why.", ["method", "reason"],
+)
+PREFETCH_TRACKS = Counter(
+    "prefetch_tracks_total", "Tracks handled by the background prefetcher, by outcome.", ["outcome"],
+)
+LOCAL_FEATURE_ANALYSES = Counter(
+    "local_feature_analyses_total", "Tracks sent for local audio analysis, by outcome.", ["outcome"],
+)
+
+
+# ── gRPC server ──────────────────────────────────────────────────────────────
+
+class MetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Records GRPC_SERVER_LATENCY for every unary and server-streaming RPC."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method.rsplit("/", 1)[-1]
+
+        if handler.unary_unary:
+            inner = handler.unary_unary
+
+            async def unary_unary(request, context):
+                start = time.perf_counter()
+                code = grpc.StatusCode.UNKNOWN
+                try:
+                    response = await inner(request, context)
+                    code = _status(context)
+                    return response
+                except grpc.aio.AbortError:
+                    code = _status(context)
+                    raise
+                except asyncio.CancelledError:
+                    code = _cancelled(context)
+                    raise
+                finally:
+                    GRPC_SERVER_LATENCY.labels(method, code.name).observe(time.perf_counter() - start)
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary, handler.request_deserializer, handler.response_serializer
+            )
+
+        if handler.unary_stream:
+            inner = handler.unary_stream
+
+            async def unary_stream(request, context):
+                start = time.perf_counter()
+                code = grpc.StatusCode.CANCELLED
+                try:
+                    async for response in inner(request, context):
+                        yield response
+                    code = _status(context)
+                except grpc.aio.AbortError:
+                    code = _status(context)
+                    raise
+                except asyncio.CancelledError:
+                    code = _cancelled(context)
+                    raise
+                except Exception:
+                    code = grpc.StatusCode.UNKNOWN
+                    raise
+                finally:
+                    GRPC_SERVER_LATENCY.labels(method, code.name).observe(time.perf_counter() - start)
+
+            return grpc.unary_stream_rpc_method_handler(
+                unary_stream, handler.request_deserializer, handler.response_serializer
+            )
+
+        return handler
+
+
+def _status(context) -> grpc.StatusCode:
+    # Servicers report failures with set_code rather than raising
+    return context.code() or grpc.StatusCode.OK
+
+
+def _cancelled(context) -> grpc.StatusCode:
+    # gRPC cancels the handler both when the client leaves and when the deadline passes
+    remaining = context.time_remaining()
+    if remaining is not None and remaining <= 0:
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+    return grpc.StatusCode.CANCELLED
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve /metrics for a process that has no HTTP server of its own."""
+    start_http_server(port)
+
+
+# ── Proxy ────────────────────────────────────────────────────────────────────
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware recording HTTP_REQUEST_LATENCY per route template.
+
+    Latency runs until the last body chunk is sent, so streamed responses are
+    measured end to end. Paths that match no route are grouped under one
+    label to keep the label set bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def render() -> tuple[bytes, str]:
+    """The default registry in Prometheus text format, with its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# ── Upstream calls ───────────────────────────────────────────────────────────
+
+class CountingStream(httpx.AsyncByteStream):
+    """Wraps a streamed httpx response body to count its bytes once consumed."""
+
+    def __init__(self, response, host: str):
+        self._response = response
+        self._stream = response.stream
+        self._host = host
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        UPSTREAM_BYTES.labels(self._host, "received").inc(self._response.num_bytes_downloaded)
+        await self._stream.aclose()
+
+
+def observe_upstream(host: str, response, elapsed: float, streamed: bool) -> None:
+    UPSTREAM_LATENCY.labels(host, str(response.status_code)).observe(elapsed)
+    UPSTREAM_BYTES.labels(host, "sent").inc(int(response.request.headers.get("content-length", 0)))
+    if streamed:
+        response.stream = CountingStream(response, host)
+    else:
+        UPSTREAM_BYTES.labels(host, "received").inc(response.num_bytes_downloaded)
+
+
+# ── Snapshot collectors ──────────────────────────────────────────────────────
+# Read live state at scrape time instead of updating gauges on the hot path.
+
+_executors = {}
+_admission = None
+
+
+def watch_executor(name: str, executor) -> None:
+    """Export the queue depth and thread count of a ThreadPoolExecutor."""
+    _executors[name] = executor
+
+
+def watch_admission(controller) -> None:
+    """Export the running and queued RPC counts of an AdmissionController."""
+    global _admission
+    _admission = controller
+
+
+class _StateCollector:
+    def describe(self):
+        # Without this, register() calls collect() at import time to learn the names
+        return []
+
+    def collect(self):
+        from upstream import scheduler  # upstream imports this module
+
+        queue = GaugeMetricFamily("thread_pool_queue_depth", "Work items waiting for a pool thread.",
+                                  labels=["pool"])
+        threads = GaugeMetricFamily("thread_pool_threads", "Threads started by the pool.", labels=["pool"])
+        for name, executor in _executors.items():
+            queue.add_metric([name], executor._work_queue.qsize())
+            threads.add_metric([name], len(executor._threads))
+        yield queue
+        yield threads
+
+        if _admission is not None:
+            yield GaugeMetricFamily("grpc_admission_in_flight", "RPCs admitted and running.",
+                                    value=_admission.in_flight)
+            yield GaugeMetricFamily("grpc_admission_queued", "RPCs waiting for admission.",
+                                    value=_admission.queued())
+
+        in_flight = GaugeMetricFamily("upstream_in_flight", "Upstream calls holding a slot.", labels=["host"])
+        queued = GaugeMetricFamily("upstream_queued", "Upstream calls waiting for a slot.", labels=["host"])
+        limit = GaugeMetricFamily("upstream_concurrency_limit", "Adaptive concurrency limit.", labels=["host"])
+        for host, state in scheduler.stats().items():
+            in_flight.add_metric([host], state["in_flight"])
+            queued.add_metric([host], state["queued"])
+            limit.add_metric([host], state["limit"])
+        yield in_flight
+        yield queued
+        yield limit
+
+        lookups = CounterMetricFamily("feature_cache_lookups", "Feature cache lookups by outcome.",
+                                      labels=["kind", "result"])
+        ratio = GaugeMetricFamily("feature_cache_hit_ratio", "Share of lookups served from memory or disk.",
+                                  labels=["kind"])
+        cache_stats = get_feature_cache().stats()
+        memory = cache_stats.pop("memory")
+        for kind, counts in cache_stats.items():
+            for result in ("memory_hits", "disk_hits", "misses"):
+                lookups.add_metric([kind, result], counts[result])
+            ratio.add_metric([kind], counts["hit_ratio"])
+        yield lookups
+        yield ratio
+        yield GaugeMetricFamily("feature_cache_memory_bytes", "Bytes held by the in-memory LRU.",
+                                value=memory["bytes"])
+
+        flights = GaugeMetricFamily("singleflight_in_flight", "Distinct keys being fetched.", labels=["group"])
+        coalesced = CounterMetricFamily("singleflight_coalesced", "Calls that joined one already in flight.",
+                                        labels=["group"])
+        for name, group in singleflight.stats().items():
+            flights.add_metric([name], group["in_flight"])
+            coalesced.add_metric([name], group["coalesced"])
+        yield flights
+        yield coalesced
+
+
+REGISTRY.register(_StateCollector())
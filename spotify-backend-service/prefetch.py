@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+import config
+import metrics
+from timelines import get_visual_timelines
+from upstream import BACKGROUND
+
+
+def track_ids_from_uris(uris) -> list[str]:
+    """Spotify track ids from `spotify:track:<id>` URIs, skipping local files and episodes."""
+    return [uri.rsplit(":", 1)[1] for uri in uris if uri.startswith("spotify:track:")]
+
+
+class Prefetcher:
+    """Warms audio features and timelines for tracks that are about to play.
+
+    Track ids wait in a bounded FIFO (a track already waiting is not queued
+    twice; when full, the oldest entries are dropped) and a few workers take
+    them in batches through the same cached pipeline as GetVisualTimelines,
+    in the background lane so interactive lookups always go first. Work is
+    tagged with an owner (the caller's session or token) so a new play queue
+    can cancel whatever is still pending or running for the old one.
+    """
+
+    def __init__(self, concurrency: int = config.PREFETCH_CONCURRENCY,
+                 batch_size: int = config.PREFETCH_BATCH_SIZE,
+                 max_queued: int = config.PREFETCH_MAX_QUEUED,
+                 frame_rate: float = config.TIMELINE_FRAME_RATE):
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_queued = max_queued
+        self.frame_rate = frame_rate
+        self._queue: OrderedDict[str, tuple[str, str]] = OrderedDict()  # track id -> (owner, token)
+        self._running: dict[asyncio.Task, str] = {}  # warm-up task -> owner
+        self._ready = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def close(self) -> None:
+        for task in [*self._workers, *self._running]:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queue.clear()
+
+    def schedule(self, track_ids: list[str], token: str, owner: str, replace: bool = True) -> int:
+        """Queue tracks for warming; returns how many were newly queued."""
+        if replace:
+            self.cancel(owner)
+        queued = 0
+        for track_id in track_ids:
+            if track_id in self._queue:
+                continue
+            self._queue[track_id] = (owner, token)
+            queued += 1
+        while len(self._queue) > self.max_queued:
+            self._queue.popitem(last=False)
+            metrics.PREFETCH_TRACKS.labels("dropped").inc()
+        if self._queue:
+            self._ready.set()
+        return queued
+
+    def cancel(self, owner: str) -> int:
+        """Drop the owner's queued tracks and stop its running batches."""
+        stale = [track_id for track_id, (o, _) in self._queue.items() if o == owner]
+        for track_id in stale:
+            del self._queue[track_id]
+        for task, task_owner in self._running.items():
+            if task_owner == owner:
+                task.cancel()
+        metrics.PREFETCH_TRACKS.labels("cancelled").inc(len(stale))
+        return len(stale)
+
+    def stats(self) -> dict:
+        return {"queued": len(self._queue), "running": len(self._running), "workers": len(self._workers)}
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.wait()
+            if not self._queue:
+                self._ready.clear()
+                continue
+            owner, token, track_ids = self._take_batch()
+            task = asyncio.create_task(self._warm(track_ids, token))
+            self._running[task] = owner
+            try:
+                # wait() rather than await, so cancelling the batch doesn't cancel the worker
+                await asyncio.wait([task])
+            finally:
+                del self._running[task]
+            if task.cancelled():
+                metrics.PREFETCH_TRACKS.labels("cancelled").inc(len(track_ids))
+
+    def _take_batch(self) -> tuple[str, str, list[str]]:
+        """Pop up to batch_size ids from the front that share the first one's owner."""
+        owner, token = next(iter(self._queue.values()))
+        batch = [track_id for track_id, (o, _) in self._queue.items() if o == owner][:self.batch_size]
+        for track_id in batch:
+            del self._queue[track_id]
+        return owner, token, batch
+
+    async def _warm(self, track_ids: list[str], token: str) -> None:
+        try:
+            timelines, errors = await get_visual_timelines(track_ids, token, self.frame_rate, BACKGROUND)
+        except Exception as e:
+            logging.warning(f"Prefetch of {len(track_ids)} track(s) failed: {e}")
+            metrics.PREFETCH_TRACKS.labels("failed").inc(len(track_ids))
+            return
+        metrics.PREFETCH_TRACKS.labels("warmed").inc(len(timelines))
+        metrics.PREFETCH_TRACKS.labels("failed").inc(len(errors))
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14protos/spotify.proto\x12\x0cspotify_grpc\"\x1f\n\x0f\x41uthCodeRequest\x12\x0c\n\x04\x63ode\x18\x01 \x01(\t\"6\n\x0c\x41uthResponse\x12\x15\n\rsession_token\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\"9\n\x12LikedTracksRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\r\n\x05total\x18\x02 \x01(\x05\"b\n\x05Track\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0e\n\x06\x61rtist\x18\x02 \x01(\t\x12\"\n\x05\x61lbum\x18\x03 \x01(\x0b\x32\x13.spotify_grpc.Album\x12\n\n\x02id\x18\x04 \x01(\t\x12\x0b\n\x03uri\x18\x05 \x01(\t\"K\n\x13LikedTracksResponse\x12#\n\x06tracks\x18\x01 \x03(\x0b\x32\x13.spotify_grpc.Track\x12\x0f\n\x07success\x18\x02 \x01(\x08\"\x1a\n\x0b\x41lbumImages\x12\x0b\n\x03url\x18\x01 \x03(\t\"Y\n\x05\x41lbum\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0b\n\x03uri\x18\x02 \x01(\t\x12\n\n\x02id\x18\x03 \x01(\t\x12)\n\x06images\x18\x04 \x01(\x0b\x32\x19.spotify_grpc.AlbumImages\"U\n\x14PlayNextTrackRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x19\n\x11\x63urrent_track_uri\x18\x02 \x01(\t\x12\x0c\n\x04uris\x18\x03 \x03(\t\"(\n\x15PlayNextTrackResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"C\n\x19GetAudioVisualDataRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x10\n\x08track_id\x18\x02 \x01(\t\"\x91\x01\n\x1aGetAudioVisualDataResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0e\n\x06\x65nergy\x18\x02 \x01(\x02\x12\x0f\n\x07valence\x18\x03 \x01(\x02\x12\r\n\x05tempo\x18\x04 \x01(\x02\x12\x14\n\x0c\x64\x61nceability\x18\x05 \x01(\x02\x12\r\n\x05\x62\x65\x61ts\x18\x06 \x03(\x01\x12\r\n\x05mfccs\x18\x07 \x03(\x01\x32\xf8\x02\n\x0bSpotifyAuth\x12K\n\x0c\x45xchangeCode\x12\x1d.spotify_grpc.AuthCodeRequest\x1a\x1a.spotify_grpc.AuthResponse\"\x00\x12W\n\x0eGetLikedTracks\x12 .spotify_grpc.LikedTracksRequest\x1a!.spotify_grpc.LikedTracksResponse\"\x00\x12Z\n\rPlayNextTrack\x12\".spotify_grpc.PlayNextTrackRequest\x1a#.spotify_grpc.PlayNextTrackResponse\"\x00\x12g\n\x12GetAudioVisualData\x12\'.spotify_grpc.GetAudioVisualDataRequest\x1a(.spotify_grpc.GetAudioVisualDataResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14protos/spotify.proto\x12\x0cspotify_grpc\"\x1f\n\x0f\x41uthCodeRequest\x12\x0c\n\x04\x63ode\x18\x01 \x01(\t\"^\n\x0c\x41uthResponse\x12\x15\n\rsession_token\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\nsession_id\x18\x03 \x01(\t\x12\x12\n\nexpires_in\x18\x04 \x01(\x05\"u\n\x12LikedTracksRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\r\n\x05total\x18\x02 \x01(\x05\x12\x12\n\nsync_token\x18\x03 \x01(\t\x12\x12\n\nnormalized\x18\x04 \x01(\x08\x12\x12\n\nsession_id\x18\x05 \x01(\t\"\xb6\x01\n\x05Track\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0e\n\x06\x61rtist\x18\x02 \x01(\t\x12\"\n\x05\x61lbum\x18\x03 \x01(\x0b\x32\x13.spotify_grpc.Album\x12\n\n\x02id\x18\x04 \x01(\t\x12\x0b\n\x03uri\x18\x05 \x01(\t\x12%\n\x07\x61rtists\x18\x06 \x03(\x0b\x32\x14.spotify_grpc.Artist\x12\x13\n\x0b\x61lbum_index\x18\x07 \x01(\x05\x12\x16\n\x0e\x61rtist_indices\x18\x08 \x03(\x05\"/\n\x06\x41rtist\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x01(\t\x12\x0b\n\x03uri\x18\x03 \x01(\t\"\xc1\x01\n\x13LikedTracksResponse\x12#\n\x06tracks\x18\x01 \x03(\x0b\x32\x13.spotify_grpc.Track\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\nsync_token\x18\x03 \x01(\t\x12\x14\n\x0cnot_modified\x18\x04 \x01(\x08\x12#\n\x06\x61lbums\x18\x05 \x03(\x0b\x32\x13.spotify_grpc.Album\x12%\n\x07\x61rtists\x18\x06 \x03(\x0b\x32\x14.spotify_grpc.Artist\"\xa1\x01\n\x0fLikedTracksPage\x12#\n\x06tracks\x18\x01 \x03(\x0b\x32\x13.spotify_grpc.Track\x12\x0e\n\x06offset\x18\x02 \x01(\x05\x12\r\n\x05total\x18\x03 \x01(\x05\x12#\n\x06\x61lbums\x18\x04 \x03(\x0b\x32\x13.spotify_grpc.Album\x12%\n\x07\x61rtists\x18\x05 \x03(\x0b\x32\x14.spotify_grpc.Artist\"\x1a\n\x0b\x41lbumImages\x12\x0b\n\x03url\x18\x01 \x03(\t\"Y\n\x05\x41lbum\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0b\n\x03uri\x18\x02 \x01(\t\x12\n\n\x02id\x18\x03 \x01(\t\x12)\n\x06images\x18\x04 \x01(\x0b\x32\x19.spotify_grpc.AlbumImages\"i\n\x14PlayNextTrackRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x19\n\x11\x63urrent_track_uri\x18\x02 \x01(\t\x12\x0c\n\x04uris\x18\x03 \x03(\t\x12\x12\n\nsession_id\x18\x04 \x01(\t\"(\n\x15PlayNextTrackResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"6\n\x14RegisterQueueRequest\x12\x0c\n\x04uris\x18\x01 \x03(\t\x12\x10\n\x08queue_id\x18\x02 \x01(\t\"c\n\x12UpdateQueueRequest\x12\x10\n\x08queue_id\x18\x01 \x01(\t\x12\x10\n\x08\x61\x64\x64_uris\x18\x02 \x03(\t\x12\x13\n\x0bremove_uris\x18\x03 \x03(\t\x12\x14\n\x0c\x61\x64\x64_at_front\x18\x04 \x01(\x08\"S\n\rQueueResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x10\n\x08queue_id\x18\x02 \x01(\t\x12\x0e\n\x06length\x18\x03 \x01(\x05\x12\x0f\n\x07version\x18\x04 \x01(\x05\"t\n\x14PlayFromQueueRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\x10\n\x08queue_id\x18\x03 \x01(\t\x12\x11\n\ttrack_uri\x18\x04 \x01(\t\x12\r\n\x05index\x18\x05 \x01(\x05\"G\n\x15PlayFromQueueResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05index\x18\x02 \x01(\x05\x12\x0e\n\x06window\x18\x03 \x01(\x05\"n\n\x19GetAudioVisualDataRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x10\n\x08track_id\x18\x02 \x01(\t\x12\x15\n\rpacked_arrays\x18\x03 \x01(\x08\x12\x12\n\nsession_id\x18\x04 \x01(\t\"\xb7\x01\n\x1aGetAudioVisualDataResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0e\n\x06\x65nergy\x18\x02 \x01(\x02\x12\x0f\n\x07valence\x18\x03 \x01(\x02\x12\r\n\x05tempo\x18\x04 \x01(\x02\x12\x14\n\x0c\x64\x61nceability\x18\x05 \x01(\x02\x12\r\n\x05\x62\x65\x61ts\x18\x06 \x03(\x01\x12\r\n\x05mfccs\x18\x07 \x03(\x01\x12\x11\n\tbeats_f32\x18\x08 \x01(\x0c\x12\x11\n\tmfccs_f32\x18\t \x01(\x0c\"t\n\x1eGetAudioVisualDataBatchRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x11\n\ttrack_ids\x18\x02 \x03(\t\x12\x15\n\rpacked_arrays\x18\x03 \x01(\x08\x12\x12\n\nsession_id\x18\x04 \x01(\t\"p\n\x15\x41udioVisualDataResult\x12\x10\n\x08track_id\x18\x01 \x01(\t\x12\x36\n\x04\x64\x61ta\x18\x02 \x01(\x0b\x32(.spotify_grpc.GetAudioVisualDataResponse\x12\r\n\x05\x65rror\x18\x03 \x01(\t\"h\n\x1fGetAudioVisualDataBatchResponse\x12\x34\n\x07results\x18\x01 \x03(\x0b\x32#.spotify_grpc.AudioVisualDataResult\x12\x0f\n\x07success\x18\x02 \x01(\x08\"l\n\x19GetVisualTimelinesRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x11\n\ttrack_ids\x18\x02 \x03(\t\x12\x12\n\nframe_rate\x18\x03 \x01(\x02\x12\x12\n\nsession_id\x18\x04 \x01(\t\"\x8f\x01\n\x0eVisualTimeline\x12\x10\n\x08track_id\x18\x01 \x01(\t\x12\x0e\n\x06\x66rames\x18\x02 \x01(\x05\x12\r\n\x05pulse\x18\x03 \x01(\x0c\x12\r\n\x05phase\x18\x04 \x01(\x0c\x12\r\n\x05tempo\x18\x05 \x01(\x0c\x12\x0f\n\x07\x64\x65nsity\x18\x06 \x01(\x0c\x12\x0e\n\x06\x65nergy\x18\x07 \x01(\x0c\x12\r\n\x05\x65rror\x18\x08 \x01(\t\"r\n\x1aGetVisualTimelinesResponse\x12/\n\ttimelines\x18\x01 \x03(\x0b\x32\x1c.spotify_grpc.VisualTimeline\x12\x12\n\nframe_rate\x18\x02 \x01(\x02\x12\x0f\n\x07success\x18\x03 \x01(\x08\"_\n\x0fPrefetchRequest\x12\x14\n\x0c\x61\x63\x63\x65ss_token\x18\x01 \x01(\t\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\x11\n\ttrack_ids\x18\x03 \x03(\t\x12\x0f\n\x07replace\x18\x04 \x01(\x08\"3\n\x10PrefetchResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0e\n\x06queued\x18\x02 \x01(\x05\x32\x8b\x08\n\x0bSpotifyAuth\x12K\n\x0c\x45xchangeCode\x12\x1d.spotify_grpc.AuthCodeRequest\x1a\x1a.spotify_grpc.AuthResponse\"\x00\x12W\n\x0eGetLikedTracks\x12 .spotify_grpc.LikedTracksRequest\x1a!.spotify_grpc.LikedTracksResponse\"\x00\x12X\n\x11StreamLikedTracks\x12 .spotify_grpc.LikedTracksRequest\x1a\x1d.spotify_grpc.LikedTracksPage\"\x00\x30\x01\x12Z\n\rPlayNextTrack\x12\".spotify_grpc.PlayNextTrackRequest\x1a#.spotify_grpc.PlayNextTrackResponse\"\x00\x12R\n\rRegisterQueue\x12\".spotify_grpc.RegisterQueueRequest\x1a\x1b.spotify_grpc.QueueResponse\"\x00\x12N\n\x0bUpdateQueue\x12 .spotify_grpc.UpdateQueueRequest\x1a\x1b.spotify_grpc.QueueResponse\"\x00\x12Z\n\rPlayFromQueue\x12\".spotify_grpc.PlayFromQueueRequest\x1a#.spotify_grpc.PlayFromQueueResponse\"\x00\x12g\n\x12GetAudioVisualData\x12\'.spotify_grpc.GetAudioVisualDataRequest\x1a(.spotify_grpc.GetAudioVisualDataResponse\x12v\n\x17GetAudioVisualDataBatch\x12,.spotify_grpc.GetAudioVisualDataBatchRequest\x1a-.spotify_grpc.GetAudioVisualDataBatchResponse\x12g\n\x12GetVisualTimelines\x12\'.spotify_grpc.GetVisualTimelinesRequest\x1a(.spotify_grpc.GetVisualTimelinesResponse\x12V\n\x15PrefetchAudioFeatures\x12\x1d.spotify_grpc.PrefetchRequest\x1a\x1e.spotify_grpc.PrefetchResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,25 +34,55 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_AUTHCODEREQUEST']._serialized_start=38
   _globals['_AUTHCODEREQUEST']._serialized_end=69
   _globals['_AUTHRESPONSE']._serialized_start=71
-  _globals['_AUTHRESPONSE']._serialized_end=125
-  _globals['_LIKEDTRACKSREQUEST']._serialized_start=127
-  _globals['_LIKEDTRACKSREQUEST']._serialized_end=184
-  _globals['_TRACK']._serialized_start=186
-  _globals['_TRACK']._serialized_end=284
-  _globals['_LIKEDTRACKSRESPONSE']._serialized_start=286
-  _globals['_LIKEDTRACKSRESPONSE']._serialized_end=361
-  _globals['_ALBUMIMAGES']._serialized_start=363
-  _globals['_ALBUMIMAGES']._serialized_end=389
-  _globals['_ALBUM']._serialized_start=391
-  _globals['_ALBUM']._serialized_end=480
-  _globals['_PLAYNEXTTRACKREQUEST']._serialized_start=482
-  _globals['_PLAYNEXTTRACKREQUEST']._serialized_end=567
-  _globals['_PLAYNEXTTRACKRESPONSE']._serialized_start=569
-  _globals['_PLAYNEXTTRACKRESPONSE']._serialized_end=609
-  _globals['_GETAUDIOVISUALDATAREQUEST']._serialized_start=611
-  _globals['_GETAUDIOVISUALDATAREQUEST']._serialized_end=678
-  _globals['_GETAUDIOVISUALDATARESPONSE']._serialized_start=681
-  _globals['_GETAUDIOVISUALDATARESPONSE']._serialized_end=826
-  _globals['_SPOTIFYAUTH']._serialized_start=829
-  _globals['_SPOTIFYAUTH']._serialized_end=1205
+  _globals['_AUTHRESPONSE']._serialized_end=165
+  _globals['_LIKEDTRACKSREQUEST']._serialized_start=167
+  _globals['_LIKEDTRACKSREQUEST']._serialized_end=284
+  _globals['_TRACK']._serialized_start=287
+  _globals['_TRACK']._serialized_end=469
+  _globals['_ARTIST']._serialized_start=471
+  _globals['_ARTIST']._serialized_end=518
+  _globals['_LIKEDTRACKSRESPONSE']._serialized_start=521
+  _globals['_LIKEDTRACKSRESPONSE']._serialized_end=714
+  _globals['_LIKEDTRACKSPAGE']._serialized_start=717
+  _globals['_LIKEDTRACKSPAGE']._serialized_end=878
+  _globals['_ALBUMIMAGES']._serialized_start=880
+  _globals['_ALBUMIMAGES']._serialized_end=906
+  _globals['_ALBUM']._serialized_start=908
+  _globals['_ALBUM']._serialized_end=997
+  _globals['_PLAYNEXTTRACKREQUEST']._serialized_start=999
+  _globals['_PLAYNEXTTRACKREQUEST']._serialized_end=1104
+  _globals['_PLAYNEXTTRACKRESPONSE']._serialized_start=1106
+  _globals['_PLAYNEXTTRACKRESPONSE']._serialized_end=1146
+  _globals['_REGISTERQUEUEREQUEST']._serialized_start=1148
+  _globals['_REGISTERQUEUEREQUEST']._serialized_end=1202
+  _globals['_UPDATEQUEUEREQUEST']._serialized_start=1204
+  _globals['_UPDATEQUEUEREQUEST']._serialized_end=1303
+  _globals['_QUEUERESPONSE']._serialized_start=1305
+  _globals['_QUEUERESPONSE']._serialized_end=1388
+  _globals['_PLAYFROMQUEUEREQUEST']._serialized_start=1390
+  _globals['_PLAYFROMQUEUEREQUEST']._serialized_end=1506
+  _globals['_PLAYFROMQUEUERESPONSE']._serialized_start=1508
+  _globals['_PLAYFROMQUEUERESPONSE']._serialized_end=1579
+  _globals['_GETAUDIOVISUALDATAREQUEST']._serialized_start=1581
+  _globals['_GETAUDIOVISUALDATAREQUEST']._serialized_end=1691
+  _globals['_GETAUDIOVISUALDATARESPONSE']._serialized_start=1694
+  _globals['_GETAUDIOVISUALDATARESPONSE']._serialized_end=1877
+  _globals['_GETAUDIOVISUALDATABATCHREQUEST']._serialized_start=1879
+  _globals['_GETAUDIOVISUALDATABATCHREQUEST']._serialized_end=1995
+  _globals['_AUDIOVISUALDATARESULT']._serialized_start=1997
+  _globals['_AUDIOVISUALDATARESULT']._serialized_end=2109
+  _globals['_GETAUDIOVISUALDATABATCHRESPONSE']._serialized_start=2111
+  _globals['_GETAUDIOVISUALDATABATCHRESPONSE']._serialized_end=2215
+  _globals['_GETVISUALTIMELINESREQUEST']._serialized_start=2217
+  _globals['_GETVISUALTIMELINESREQUEST']._serialized_end=2325
+  _globals['_VISUALTIMELINE']._serialized_start=2328
+  _globals['_VISUALTIMELINE']._serialized_end=2471
+  _globals['_GETVISUALTIMELINESRESPONSE']._serialized_start=2473
+  _globals['_GETVISUALTIMELINESRESPONSE']._serialized_end=2587
+  _globals['_PREFETCHREQUEST']._serialized_start=2589
+  _globals['_PREFETCHREQUEST']._serialized_end=2684
+  _globals['_PREFETCHRESPONSE']._serialized_start=2686
+  _globals['_PREFETCHRESPONSE']._serialized_end=2737
+  _globals['_SPOTIFYAUTH']._serialized_start=2740
+  _globals['_SPOTIFYAUTH']._serialized_end=3775
 # @@protoc_insertion_point(module_scope)
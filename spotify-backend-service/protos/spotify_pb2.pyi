@@ -1,6 +1,7 @@
+from google.protobuf.internal import containers as _containers
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Optional as _Optional
+from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
@@ -11,9 +12,305 @@ class AuthCodeRequest(_message.Message):
     def __init__(self, code: _Optional[str] = ...) -> None: ...
 
 class AuthResponse(_message.Message):
-    __slots__ = ("session_token", "success")
+    __slots__ = ("session_token", "success", "session_id", "expires_in")
     SESSION_TOKEN_FIELD_NUMBER: _ClassVar[int]
     SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    EXPIRES_IN_FIELD_NUMBER: _ClassVar[int]
     session_token: str
     success: bool
-    def __init__(self, session_token: _Optional[str] = ..., success: bool = ...) -> None: ...
+    session_id: str
+    expires_in: int
+    def __init__(self, session_token: _Optional[str] = ..., success: bool = ..., session_id: _Optional[str] = ..., expires_in: _Optional[int] = ...) -> None: ...
+
+class LikedTracksRequest(_message.Message):
+    __slots__ = ("access_token", "total", "sync_token", "normalized", "session_id")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    TOTAL_FIELD_NUMBER: _ClassVar[int]
+    SYNC_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    NORMALIZED_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    total: int
+    sync_token: str
+    normalized: bool
+    session_id: str
+    def __init__(self, access_token: _Optional[str] = ..., total: _Optional[int] = ..., sync_token: _Optional[str] = ..., normalized: bool = ..., session_id: _Optional[str] = ...) -> None: ...
+
+class Track(_message.Message):
+    __slots__ = ("name", "artist", "album", "id", "uri", "artists", "album_index", "artist_indices")
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    ARTIST_FIELD_NUMBER: _ClassVar[int]
+    ALBUM_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    URI_FIELD_NUMBER: _ClassVar[int]
+    ARTISTS_FIELD_NUMBER: _ClassVar[int]
+    ALBUM_INDEX_FIELD_NUMBER: _ClassVar[int]
+    ARTIST_INDICES_FIELD_NUMBER: _ClassVar[int]
+    name: str
+    artist: str
+    album: Album
+    id: str
+    uri: str
+    artists: _containers.RepeatedCompositeFieldContainer[Artist]
+    album_index: int
+    artist_indices: _containers.RepeatedScalarFieldContainer[int]
+    def __init__(self, name: _Optional[str] = ..., artist: _Optional[str] = ..., album: _Optional[_Union[Album, _Mapping]] = ..., id: _Optional[str] = ..., uri: _Optional[str] = ..., artists: _Optional[_Iterable[_Union[Artist, _Mapping]]] = ..., album_index: _Optional[int] = ..., artist_indices: _Optional[_Iterable[int]] = ...) -> None: ...
+
+class Artist(_message.Message):
+    __slots__ = ("name", "id", "uri")
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    URI_FIELD_NUMBER: _ClassVar[int]
+    name: str
+    id: str
+    uri: str
+    def __init__(self, name: _Optional[str] = ..., id: _Optional[str] = ..., uri: _Optional[str] = ...) -> None: ...
+
+class LikedTracksResponse(_message.Message):
+    __slots__ = ("tracks", "success", "sync_token", "not_modified", "albums", "artists")
+    TRACKS_FIELD_NUMBER: _ClassVar[int]
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    SYNC_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    NOT_MODIFIED_FIELD_NUMBER: _ClassVar[int]
+    ALBUMS_FIELD_NUMBER: _ClassVar[int]
+    ARTISTS_FIELD_NUMBER: _ClassVar[int]
+    tracks: _containers.RepeatedCompositeFieldContainer[Track]
+    success: bool
+    sync_token: str
+    not_modified: bool
+    albums: _containers.RepeatedCompositeFieldContainer[Album]
+    artists: _containers.RepeatedCompositeFieldContainer[Artist]
+    def __init__(self, tracks: _Optional[_Iterable[_Union[Track, _Mapping]]] = ..., success: bool = ..., sync_token: _Optional[str] = ..., not_modified: bool = ..., albums: _Optional[_Iterable[_Union[Album, _Mapping]]] = ..., artists: _Optional[_Iterable[_Union[Artist, _Mapping]]] = ...) -> None: ...
+
+class LikedTracksPage(_message.Message):
+    __slots__ = ("tracks", "offset", "total", "albums", "artists")
+    TRACKS_FIELD_NUMBER: _ClassVar[int]
+    OFFSET_FIELD_NUMBER: _ClassVar[int]
+    TOTAL_FIELD_NUMBER: _ClassVar[int]
+    ALBUMS_FIELD_NUMBER: _ClassVar[int]
+    ARTISTS_FIELD_NUMBER: _ClassVar[int]
+    tracks: _containers.RepeatedCompositeFieldContainer[Track]
+    offset: int
+    total: int
+    albums: _containers.RepeatedCompositeFieldContainer[Album]
+    artists: _containers.RepeatedCompositeFieldContainer[Artist]
+    def __init__(self, tracks: _Optional[_Iterable[_Union[Track, _Mapping]]] = ..., offset: _Optional[int] = ..., total: _Optional[int] = ..., albums: _Optional[_Iterable[_Union[Album, _Mapping]]] = ..., artists: _Optional[_Iterable[_Union[Artist, _Mapping]]] = ...) -> None: ...
+
+class AlbumImages(_message.Message):
+    __slots__ = ("url",)
+    URL_FIELD_NUMBER: _ClassVar[int]
+    url: _containers.RepeatedScalarFieldContainer[str]
+    def __init__(self, url: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class Album(_message.Message):
+    __slots__ = ("name", "uri", "id", "images")
+    NAME_FIELD_NUMBER: _ClassVar[int]
+    URI_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    IMAGES_FIELD_NUMBER: _ClassVar[int]
+    name: str
+    uri: str
+    id: str
+    images: AlbumImages
+    def __init__(self, name: _Optional[str] = ..., uri: _Optional[str] = ..., id: _Optional[str] = ..., images: _Optional[_Union[AlbumImages, _Mapping]] = ...) -> None: ...
+
+class PlayNextTrackRequest(_message.Message):
+    __slots__ = ("access_token", "current_track_uri", "uris", "session_id")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    CURRENT_TRACK_URI_FIELD_NUMBER: _ClassVar[int]
+    URIS_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    current_track_uri: str
+    uris: _containers.RepeatedScalarFieldContainer[str]
+    session_id: str
+    def __init__(self, access_token: _Optional[str] = ..., current_track_uri: _Optional[str] = ..., uris: _Optional[_Iterable[str]] = ..., session_id: _Optional[str] = ...) -> None: ...
+
+class PlayNextTrackResponse(_message.Message):
+    __slots__ = ("success",)
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    def __init__(self, success: bool = ...) -> None: ...
+
+class RegisterQueueRequest(_message.Message):
+    __slots__ = ("uris", "queue_id")
+    URIS_FIELD_NUMBER: _ClassVar[int]
+    QUEUE_ID_FIELD_NUMBER: _ClassVar[int]
+    uris: _containers.RepeatedScalarFieldContainer[str]
+    queue_id: str
+    def __init__(self, uris: _Optional[_Iterable[str]] = ..., queue_id: _Optional[str] = ...) -> None: ...
+
+class UpdateQueueRequest(_message.Message):
+    __slots__ = ("queue_id", "add_uris", "remove_uris", "add_at_front")
+    QUEUE_ID_FIELD_NUMBER: _ClassVar[int]
+    ADD_URIS_FIELD_NUMBER: _ClassVar[int]
+    REMOVE_URIS_FIELD_NUMBER: _ClassVar[int]
+    ADD_AT_FRONT_FIELD_NUMBER: _ClassVar[int]
+    queue_id: str
+    add_uris: _containers.RepeatedScalarFieldContainer[str]
+    remove_uris: _containers.RepeatedScalarFieldContainer[str]
+    add_at_front: bool
+    def __init__(self, queue_id: _Optional[str] = ..., add_uris: _Optional[_Iterable[str]] = ..., remove_uris: _Optional[_Iterable[str]] = ..., add_at_front: bool = ...) -> None: ...
+
+class QueueResponse(_message.Message):
+    __slots__ = ("success", "queue_id", "length", "version")
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    QUEUE_ID_FIELD_NUMBER: _ClassVar[int]
+    LENGTH_FIELD_NUMBER: _ClassVar[int]
+    VERSION_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    queue_id: str
+    length: int
+    version: int
+    def __init__(self, success: bool = ..., queue_id: _Optional[str] = ..., length: _Optional[int] = ..., version: _Optional[int] = ...) -> None: ...
+
+class PlayFromQueueRequest(_message.Message):
+    __slots__ = ("access_token", "session_id", "queue_id", "track_uri", "index")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    QUEUE_ID_FIELD_NUMBER: _ClassVar[int]
+    TRACK_URI_FIELD_NUMBER: _ClassVar[int]
+    INDEX_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    session_id: str
+    queue_id: str
+    track_uri: str
+    index: int
+    def __init__(self, access_token: _Optional[str] = ..., session_id: _Optional[str] = ..., queue_id: _Optional[str] = ..., track_uri: _Optional[str] = ..., index: _Optional[int] = ...) -> None: ...
+
+class PlayFromQueueResponse(_message.Message):
+    __slots__ = ("success", "index", "window")
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    INDEX_FIELD_NUMBER: _ClassVar[int]
+    WINDOW_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    index: int
+    window: int
+    def __init__(self, success: bool = ..., index: _Optional[int] = ..., window: _Optional[int] = ...) -> None: ...
+
+class GetAudioVisualDataRequest(_message.Message):
+    __slots__ = ("access_token", "track_id", "packed_arrays", "session_id")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    TRACK_ID_FIELD_NUMBER: _ClassVar[int]
+    PACKED_ARRAYS_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    track_id: str
+    packed_arrays: bool
+    session_id: str
+    def __init__(self, access_token: _Optional[str] = ..., track_id: _Optional[str] = ..., packed_arrays: bool = ..., session_id: _Optional[str] = ...) -> None: ...
+
+class GetAudioVisualDataResponse(_message.Message):
+    __slots__ = ("success", "energy", "valence", "tempo", "danceability", "beats", "mfccs", "beats_f32", "mfccs_f32")
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    ENERGY_FIELD_NUMBER: _ClassVar[int]
+    VALENCE_FIELD_NUMBER: _ClassVar[int]
+    TEMPO_FIELD_NUMBER: _ClassVar[int]
+    DANCEABILITY_FIELD_NUMBER: _ClassVar[int]
+    BEATS_FIELD_NUMBER: _ClassVar[int]
+    MFCCS_FIELD_NUMBER: _ClassVar[int]
+    BEATS_F32_FIELD_NUMBER: _ClassVar[int]
+    MFCCS_F32_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    energy: float
+    valence: float
+    tempo: float
+    danceability: float
+    beats: _containers.RepeatedScalarFieldContainer[float]
+    mfccs: _containers.RepeatedScalarFieldContainer[float]
+    beats_f32: bytes
+    mfccs_f32: bytes
+    def __init__(self, success: bool = ..., energy: _Optional[float] = ..., valence: _Optional[float] = ..., tempo: _Optional[float] = ..., danceability: _Optional[float] = ..., beats: _Optional[_Iterable[float]] = ..., mfccs: _Optional[_Iterable[float]] = ..., beats_f32: _Optional[bytes] = ..., mfccs_f32: _Optional[bytes] = ...) -> None: ...
+
+class GetAudioVisualDataBatchRequest(_message.Message):
+    __slots__ = ("access_token", "track_ids", "packed_arrays", "session_id")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    TRACK_IDS_FIELD_NUMBER: _ClassVar[int]
+    PACKED_ARRAYS_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    track_ids: _containers.RepeatedScalarFieldContainer[str]
+    packed_arrays: bool
+    session_id: str
+    def __init__(self, access_token: _Optional[str] = ..., track_ids: _Optional[_Iterable[str]] = ..., packed_arrays: bool = ..., session_id: _Optional[str] = ...) -> None: ...
+
+class AudioVisualDataResult(_message.Message):
+    __slots__ = ("track_id", "data", "error")
+    TRACK_ID_FIELD_NUMBER: _ClassVar[int]
+    DATA_FIELD_NUMBER: _ClassVar[int]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    track_id: str
+    data: GetAudioVisualDataResponse
+    error: str
+    def __init__(self, track_id: _Optional[str] = ..., data: _Optional[_Union[GetAudioVisualDataResponse, _Mapping]] = ..., error: _Optional[str] = ...) -> None: ...
+
+class GetAudioVisualDataBatchResponse(_message.Message):
+    __slots__ = ("results", "success")
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[AudioVisualDataResult]
+    success: bool
+    def __init__(self, results: _Optional[_Iterable[_Union[AudioVisualDataResult, _Mapping]]] = ..., success: bool = ...) -> None: ...
+
+class GetVisualTimelinesRequest(_message.Message):
+    __slots__ = ("access_token", "track_ids", "frame_rate", "session_id")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    TRACK_IDS_FIELD_NUMBER: _ClassVar[int]
+    FRAME_RATE_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    track_ids: _containers.RepeatedScalarFieldContainer[str]
+    frame_rate: float
+    session_id: str
+    def __init__(self, access_token: _Optional[str] = ..., track_ids: _Optional[_Iterable[str]] = ..., frame_rate: _Optional[float] = ..., session_id: _Optional[str] = ...) -> None: ...
+
+class VisualTimeline(_message.Message):
+    __slots__ = ("track_id", "frames", "pulse", "phase", "tempo", "density", "energy", "error")
+    TRACK_ID_FIELD_NUMBER: _ClassVar[int]
+    FRAMES_FIELD_NUMBER: _ClassVar[int]
+    PULSE_FIELD_NUMBER: _ClassVar[int]
+    PHASE_FIELD_NUMBER: _ClassVar[int]
+    TEMPO_FIELD_NUMBER: _ClassVar[int]
+    DENSITY_FIELD_NUMBER: _ClassVar[int]
+    ENERGY_FIELD_NUMBER: _ClassVar[int]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    track_id: str
+    frames: int
+    pulse: bytes
+    phase: bytes
+    tempo: bytes
+    density: bytes
+    energy: bytes
+    error: str
+    def __init__(self, track_id: _Optional[str] = ..., frames: _Optional[int] = ..., pulse: _Optional[bytes] = ..., phase: _Optional[bytes] = ..., tempo: _Optional[bytes] = ..., density: _Optional[bytes] = ..., energy: _Optional[bytes] = ..., error: _Optional[str] = ...) -> None: ...
+
+class GetVisualTimelinesResponse(_message.Message):
+    __slots__ = ("timelines", "frame_rate", "success")
+    TIMELINES_FIELD_NUMBER: _ClassVar[int]
+    FRAME_RATE_FIELD_NUMBER: _ClassVar[int]
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    timelines: _containers.RepeatedCompositeFieldContainer[VisualTimeline]
+    frame_rate: float
+    success: bool
+    def __init__(self, timelines: _Optional[_Iterable[_Union[VisualTimeline, _Mapping]]] = ..., frame_rate: _Optional[float] = ..., success: bool = ...) -> None: ...
+
+class PrefetchRequest(_message.Message):
+    __slots__ = ("access_token", "session_id", "track_ids", "replace")
+    ACCESS_TOKEN_FIELD_NUMBER: _ClassVar[int]
+    SESSION_ID_FIELD_NUMBER: _ClassVar[int]
+    TRACK_IDS_FIELD_NUMBER: _ClassVar[int]
+    REPLACE_FIELD_NUMBER: _ClassVar[int]
+    access_token: str
+    session_id: str
+    track_ids: _containers.RepeatedScalarFieldContainer[str]
+    replace: bool
+    def __init__(self, access_token: _Optional[str] = ..., session_id: _Optional[str] = ..., track_ids: _Optional[_Iterable[str]] = ..., replace: bool = ...) -> None: ...
+
+class PrefetchResponse(_message.Message):
+    __slots__ = ("success", "queued")
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    QUEUED_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    queued: int
+    def __init__(self, success: bool = ..., queued: _Optional[int] = ...) -> None: ...
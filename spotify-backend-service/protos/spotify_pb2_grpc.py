@@ -44,16 +44,51 @@ class SpotifyAuthStub(object):
                 request_serializer=protos_dot_spotify__pb2.LikedTracksRequest.SerializeToString,
                 response_deserializer=protos_dot_spotify__pb2.LikedTracksResponse.FromString,
                 _registered_method=True)
+        self.StreamLikedTracks = channel.unary_stream(
+                '/spotify_grpc.SpotifyAuth/StreamLikedTracks',
+                request_serializer=protos_dot_spotify__pb2.LikedTracksRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.LikedTracksPage.FromString,
+                _registered_method=True)
         self.PlayNextTrack = channel.unary_unary(
                 '/spotify_grpc.SpotifyAuth/PlayNextTrack',
                 request_serializer=protos_dot_spotify__pb2.PlayNextTrackRequest.SerializeToString,
                 response_deserializer=protos_dot_spotify__pb2.PlayNextTrackResponse.FromString,
                 _registered_method=True)
+        self.RegisterQueue = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/RegisterQueue',
+                request_serializer=protos_dot_spotify__pb2.RegisterQueueRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.QueueResponse.FromString,
+                _registered_method=True)
+        self.UpdateQueue = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/UpdateQueue',
+                request_serializer=protos_dot_spotify__pb2.UpdateQueueRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.QueueResponse.FromString,
+                _registered_method=True)
+        self.PlayFromQueue = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/PlayFromQueue',
+                request_serializer=protos_dot_spotify__pb2.PlayFromQueueRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.PlayFromQueueResponse.FromString,
+                _registered_method=True)
         self.GetAudioVisualData = channel.unary_unary(
                 '/spotify_grpc.SpotifyAuth/GetAudioVisualData',
                 request_serializer=protos_dot_spotify__pb2.GetAudioVisualDataRequest.SerializeToString,
                 response_deserializer=protos_dot_spotify__pb2.GetAudioVisualDataResponse.FromString,
                 _registered_method=True)
+        self.GetAudioVisualDataBatch = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/GetAudioVisualDataBatch',
+                request_serializer=protos_dot_spotify__pb2.GetAudioVisualDataBatchRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.GetAudioVisualDataBatchResponse.FromString,
+                _registered_method=True)
+        self.GetVisualTimelines = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/GetVisualTimelines',
+                request_serializer=protos_dot_spotify__pb2.GetVisualTimelinesRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.GetVisualTimelinesResponse.FromString,
+                _registered_method=True)
+        self.PrefetchAudioFeatures = channel.unary_unary(
+                '/spotify_grpc.SpotifyAuth/PrefetchAudioFeatures',
+                request_serializer=protos_dot_spotify__pb2.PrefetchRequest.SerializeToString,
+                response_deserializer=protos_dot_spotify__pb2.PrefetchResponse.FromString,
+                _registered_method=True)
 
 
 class SpotifyAuthServicer(object):
@@ -71,18 +106,64 @@ class SpotifyAuthServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamLikedTracks(self, request, context):
+        """Yields liked tracks one Spotify page at a time, in library order.
+        A zero `total` streams the whole library.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def PlayNextTrack(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RegisterQueue(self, request, context):
+        """Queue sessions: register the ordered URI list once, then play by index or URI
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UpdateQueue(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PlayFromQueue(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetAudioVisualData(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetAudioVisualDataBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetVisualTimelines(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PrefetchAudioFeatures(self, request, context):
+        """Queues tracks for background warming of features and timelines; returns immediately.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_SpotifyAuthServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -96,16 +177,51 @@ def add_SpotifyAuthServicer_to_server(servicer, server):
                     request_deserializer=protos_dot_spotify__pb2.LikedTracksRequest.FromString,
                     response_serializer=protos_dot_spotify__pb2.LikedTracksResponse.SerializeToString,
             ),
+            'StreamLikedTracks': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamLikedTracks,
+                    request_deserializer=protos_dot_spotify__pb2.LikedTracksRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.LikedTracksPage.SerializeToString,
+            ),
             'PlayNextTrack': grpc.unary_unary_rpc_method_handler(
                     servicer.PlayNextTrack,
                     request_deserializer=protos_dot_spotify__pb2.PlayNextTrackRequest.FromString,
                     response_serializer=protos_dot_spotify__pb2.PlayNextTrackResponse.SerializeToString,
             ),
+            'RegisterQueue': grpc.unary_unary_rpc_method_handler(
+                    servicer.RegisterQueue,
+                    request_deserializer=protos_dot_spotify__pb2.RegisterQueueRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.QueueResponse.SerializeToString,
+            ),
+            'UpdateQueue': grpc.unary_unary_rpc_method_handler(
+                    servicer.UpdateQueue,
+                    request_deserializer=protos_dot_spotify__pb2.UpdateQueueRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.QueueResponse.SerializeToString,
+            ),
+            'PlayFromQueue': grpc.unary_unary_rpc_method_handler(
+                    servicer.PlayFromQueue,
+                    request_deserializer=protos_dot_spotify__pb2.PlayFromQueueRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.PlayFromQueueResponse.SerializeToString,
+            ),
             'GetAudioVisualData': grpc.unary_unary_rpc_method_handler(
                     servicer.GetAudioVisualData,
                     request_deserializer=protos_dot_spotify__pb2.GetAudioVisualDataRequest.FromString,
                     response_serializer=protos_dot_spotify__pb2.GetAudioVisualDataResponse.SerializeToString,
             ),
+            'GetAudioVisualDataBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetAudioVisualDataBatch,
+                    request_deserializer=protos_dot_spotify__pb2.GetAudioVisualDataBatchRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.GetAudioVisualDataBatchResponse.SerializeToString,
+            ),
+            'GetVisualTimelines': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetVisualTimelines,
+                    request_deserializer=protos_dot_spotify__pb2.GetVisualTimelinesRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.GetVisualTimelinesResponse.SerializeToString,
+            ),
+            'PrefetchAudioFeatures': grpc.unary_unary_rpc_method_handler(
+                    servicer.PrefetchAudioFeatures,
+                    request_deserializer=protos_dot_spotify__pb2.PrefetchRequest.FromString,
+                    response_serializer=protos_dot_spotify__pb2.PrefetchResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'spotify_grpc.SpotifyAuth', rpc_method_handlers)
@@ -171,6 +287,33 @@ class SpotifyAuth(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamLikedTracks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/StreamLikedTracks',
+            protos_dot_spotify__pb2.LikedTracksRequest.SerializeToString,
+            protos_dot_spotify__pb2.LikedTracksPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def PlayNextTrack(request,
             target,
@@ -198,6 +341,87 @@ class SpotifyAuth(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def RegisterQueue(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/RegisterQueue',
+            protos_dot_spotify__pb2.RegisterQueueRequest.SerializeToString,
+            protos_dot_spotify__pb2.QueueResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UpdateQueue(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/UpdateQueue',
+            protos_dot_spotify__pb2.UpdateQueueRequest.SerializeToString,
+            protos_dot_spotify__pb2.QueueResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PlayFromQueue(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/PlayFromQueue',
+            protos_dot_spotify__pb2.PlayFromQueueRequest.SerializeToString,
+            protos_dot_spotify__pb2.PlayFromQueueResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetAudioVisualData(request,
             target,
@@ -224,3 +448,84 @@ class SpotifyAuth(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetAudioVisualDataBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/GetAudioVisualDataBatch',
+            protos_dot_spotify__pb2.GetAudioVisualDataBatchRequest.SerializeToString,
+            protos_dot_spotify__pb2.GetAudioVisualDataBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetVisualTimelines(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/GetVisualTimelines',
+            protos_dot_spotify__pb2.GetVisualTimelinesRequest.SerializeToString,
+            protos_dot_spotify__pb2.GetVisualTimelinesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PrefetchAudioFeatures(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/spotify_grpc.SpotifyAuth/PrefetchAudioFeatures',
+            protos_dot_spotify__pb2.PrefetchRequest.SerializeToString,
+            protos_dot_spotify__pb2.PrefetchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -1,14 +1,57 @@
+import asyncio
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import grpc
 import protos.spotify_pb2 as pb2
-import protos.spotify_pb2_grpc as pb2_grpc
 from typing import List
-import httpx
-from utils import get_acousticbrainz_features
+import config
+from ab_index import get_ab_index
+from channel_pool import ChannelPool
+from compression import CompressionMiddleware
+import deadlines
+import local_features
+from etags import LibraryETags, etag_matches, make_etag
+import feature_cache
+from feature_cache import get_feature_cache
+from http_pool import async_clients
+from sessions import SessionError, get_session_manager
+import metrics
+import singleflight
+import tracing
+from timelines import CURVES as TIMELINE_CURVES
+from upstream import scheduler
+from utils import (
+    FEATURES_VERSION, get_acousticbrainz_features_batch, get_track_features, pack_f32,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = ThreadPoolExecutor(config.WORKER_THREADS, thread_name_prefix="proxy-worker")
+    asyncio.get_running_loop().set_default_executor(executor)
+    metrics.watch_executor("proxy-worker", executor)
+    tracing.setup("proxy")
+    # One pool of long-lived channels for the whole process
+    app.state.grpc_pool = ChannelPool(interceptors=tracing.client_interceptors())
+    await app.state.grpc_pool.start()
+    try:
+        yield
+    finally:
+        await app.state.grpc_pool.close()
+        # Upstream clients were opened lazily on this loop; close them here too
+        await async_clients.aclose()
+        local_features.shutdown()
+        feature_cache.shutdown()
+        tracing.shutdown()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +59,65 @@ app.add_middleware(
     allow_credentials=False,  # Must be False if using "*"
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # so the frontend can send it back in If-None-Match
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.RESPONSE_COMPRESSION_MIN_SIZE,
+    gzip_level=config.RESPONSE_GZIP_LEVEL,
+    zstd_level=config.RESPONSE_ZSTD_LEVEL,
+)
+app.add_middleware(tracing.HTTPTracingMiddleware)
+# Outermost, so latency covers tracing, compression and CORS too
+app.add_middleware(metrics.HTTPMetricsMiddleware)
+
+def grpc_stub():
+    return app.state.grpc_pool.stub()
+
+
+def route_deadline(route: str) -> float | None:
+    """Seconds `route` may take (PROXY_DEADLINES); sent as the gRPC deadline."""
+    return config.PROXY_DEADLINES.get(route)
+
+
+_HTTP_STATUS = {
+    grpc.StatusCode.INVALID_ARGUMENT: 400,
+    grpc.StatusCode.UNAUTHENTICATED: 401,
+    grpc.StatusCode.PERMISSION_DENIED: 403,
+    grpc.StatusCode.NOT_FOUND: 404,
+    grpc.StatusCode.FAILED_PRECONDITION: 409,
+    grpc.StatusCode.RESOURCE_EXHAUSTED: 503,  # shed by the server's admission control
+    grpc.StatusCode.UNAVAILABLE: 503,
+    grpc.StatusCode.DEADLINE_EXCEEDED: 504,
+}
+
+
+def http_status(code: grpc.StatusCode) -> int:
+    return _HTTP_STATUS.get(code, 500)
+
+
+def grpc_http_error(e: grpc.RpcError) -> HTTPException:
+    """The HTTP error for a failed gRPC call; overload (503) tells the client when to retry."""
+    status = http_status(e.code())
+    headers = {"Retry-After": str(config.PROXY_RETRY_AFTER)} if status == 503 else None
+    return HTTPException(status_code=status, detail=e.details(), headers=headers)
+
+
+async def spotify_token(request) -> str:
+    """Access token for a request that carries a session_id or a raw access_token."""
+    if request.session_id:
+        try:
+            return await get_session_manager().access_token(request.session_id)
+        except SessionError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+    return request.access_token
+
+
+@app.get("/health")
+async def health():
+    pool = app.state.grpc_pool.health()
+    return {"success": pool["healthy"] > 0, "grpc": pool}
+
 
 # Request model for the frontend to send an auth code
 class AuthCode(BaseModel):
@@ -24,108 +125,393 @@ class AuthCode(BaseModel):
 
 # Note for future self this is already working, don't fuck with it
 @app.post("/auth/exchange")
-def exchange_code(auth_code: AuthCode):
+async def exchange_code(auth_code: AuthCode):
     try:
-        with grpc.insecure_channel("127.0.0.1:50051") as channel:
-            stub = pb2_grpc.SpotifyAuthStub(channel)
-            request = pb2.AuthCodeRequest(code=auth_code.code)
-            response = stub.ExchangeCode(request)
-            if response.success:
-                return {"session_token": response.session_token, "success": True}
-            else:
-                return {"session_token": "", "success": False}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        request = pb2.AuthCodeRequest(code=auth_code.code)
+        response = await grpc_stub().ExchangeCode(request, timeout=route_deadline("auth"))
+        if response.success:
+            return {"session_token": response.session_token, "session_id": response.session_id,
+                    "expires_in": response.expires_in, "success": True}
+        else:
+            return {"session_token": "", "success": False}
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+
+def album_to_dict(album: pb2.Album) -> dict:
+    return {
+        "name": album.name,
+        "uri": album.uri,
+        "id": album.id,
+        "images": [{"url": url} for url in album.images.url]
+    }
+
+def artist_to_dict(artist: pb2.Artist) -> dict:
+    return {"name": artist.name, "id": artist.id, "uri": artist.uri}
+
+def track_to_dict(track: pb2.Track) -> dict:
+    return {
+        "name": track.name,
+        "artist": track.artist,
+        "artists": [artist_to_dict(artist) for artist in track.artists],
+        "id": track.id,
+        "album": album_to_dict(track.album),
+        "uri": track.uri
+    }
+
+def normalized_track_to_dict(track: pb2.Track) -> dict:
+    return {
+        "name": track.name,
+        "id": track.id,
+        "uri": track.uri,
+        "album_index": track.album_index,
+        "artist_indices": list(track.artist_indices)
+    }
+
+def normalized_tables(message) -> dict:
+    """albums/artists/tracks of a normalized LikedTracksResponse or LikedTracksPage."""
+    return {
+        "albums": [album_to_dict(album) for album in message.albums],
+        "artists": [artist_to_dict(artist) for artist in message.artists],
+        "tracks": [normalized_track_to_dict(track) for track in message.tracks]
+    }
 
 
 class LikedTracksRequest(BaseModel):
-    access_token: str
+    access_token: str = ""
+    session_id: str = ""  # preferred: the server keeps this session's token fresh
     total: int = 50
+    sync_token: str = ""
+    normalized: bool = False  # albums/artists once in lookup tables, tracks refer to them by index
+
+library_etags = LibraryETags()
 
 @app.post("/tracks/liked")
-def get_liked_tracks(request: LikedTracksRequest):
+async def get_liked_tracks(request: LikedTracksRequest, http_request: Request, http_response: Response):
+    """Liked tracks. The response carries an ETag; sending it back in
+    If-None-Match gets a bodiless 304 while the library is unchanged."""
     try:
-        with grpc.insecure_channel("127.0.0.1:50051") as channel:
-            stub = pb2_grpc.SpotifyAuthStub(channel)
-            grpc_request = pb2.LikedTracksRequest(
-                access_token=request.access_token,
-                total=request.total
-            )
-            response = stub.GetLikedTracks(grpc_request)
-            return {
-                "tracks": [
-                    {
-                        "name": track.name,
-                        "artist": track.artist,
-                        "id": track.id,
-                        "album": {
-                            "name": track.album.name,
-                            "uri": track.album.uri,
-                            "id": track.album.id,
-                            "images": [{"url": url} for url in track.album.images.url]
-                        },
-                        "uri": track.uri
-                    } for track in response.tracks
-                ],
-                "success": response.success
-            }
+        key = (request.session_id or request.access_token, request.total, request.normalized)
+        sync = request.sync_token
+        known = library_etags.lookup(key, http_request.headers.get("If-None-Match"))
+        if known is not None:
+            sync, fresh = known
+            if fresh:
+                # Checked moments ago; the server would answer from the same snapshot
+                return Response(status_code=304, headers={"ETag": LibraryETags.tag(sync, *key[1:])})
+            # Let the server confirm against the version the client already has
+
+        grpc_request = pb2.LikedTracksRequest(
+            access_token=request.access_token,
+            session_id=request.session_id,
+            total=request.total,
+            sync_token=sync,
+            normalized=request.normalized
+        )
+        response = await grpc_stub().GetLikedTracks(grpc_request, timeout=route_deadline("liked"))
+        if response.not_modified and known is not None:
+            etag = LibraryETags.tag(sync, *key[1:])
+            library_etags.store(key, etag, sync)
+            return Response(status_code=304, headers={"ETag": etag})
+        if request.normalized:
+            tracks = normalized_tables(response)
+        else:
+            tracks = {"tracks": [track_to_dict(track) for track in response.tracks]}
+        # No sync token while the server is still building the first snapshot
+        if response.success and not response.not_modified and response.sync_token:
+            etag = LibraryETags.tag(response.sync_token, *key[1:])
+            library_etags.store(key, etag, response.sync_token)
+            http_response.headers["ETag"] = etag
+        return {
+            **tracks,
+            "success": response.success,
+            "sync_token": response.sync_token,
+            "not_modified": response.not_modified
+        }
     except grpc.RpcError as e:
-        raise HTTPException(status_code=e.code().value[0], detail=e.details())
+        raise grpc_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/tracks/liked/stream")
+async def stream_liked_tracks(request: LikedTracksRequest):
+    """Liked tracks as newline-delimited JSON, one line per track, sent page by page.
+
+    With `normalized` each line is instead a whole page: {"albums", "artists",
+    "tracks"}, where albums and artists are appended to tables the client keeps
+    for the whole stream and tracks index into them.
+
+    `total` of 0 streams the whole library. The gRPC stream is only read as
+    fast as the client consumes the response, so neither process buffers the
+    library.
+    """
+    grpc_request = pb2.LikedTracksRequest(
+        access_token=request.access_token,
+        session_id=request.session_id,
+        total=request.total,
+        normalized=request.normalized
+    )
+    call = grpc_stub().StreamLikedTracks(grpc_request, timeout=route_deadline("liked-stream"))
+    try:
+        # Wait for the first page so auth/Spotify errors become a proper status
+        first = await call.read()
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+    async def ndjson():
+        try:
+            page = first
+            while page is not grpc.aio.EOF:
+                if request.normalized:
+                    yield json.dumps(normalized_tables(page)) + "\n"
+                else:
+                    yield "".join(json.dumps(track_to_dict(track)) + "\n" for track in page.tracks)
+                page = await call.read()
+        except grpc.RpcError as e:
+            # Headers are already sent; report the failure as the last line
+            yield json.dumps({"success": False, "error": e.details()}) + "\n"
+        finally:
+            call.cancel()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
     
 class PlayNextTrackRequest(BaseModel):
-    access_token: str
+    access_token: str = ""
+    session_id: str = ""
     current_track_uri: str
     uris: List[str]
 
 @app.post("/tracks/play-next")
-def play_next_track(request: PlayNextTrackRequest):
+async def play_next_track(request: PlayNextTrackRequest):
     try:
-        with grpc.insecure_channel("127.0.0.1:50051") as channel:
-            stub = pb2_grpc.SpotifyAuthStub(channel)
-            grpc_request = pb2.PlayNextTrackRequest(
-                access_token=request.access_token,
-                current_track_uri=request.current_track_uri,
-                uris=request.uris  # This is a list of strings
-            )
-            response = stub.PlayNextTrack(grpc_request)
-            return {"success": response.success}
+        grpc_request = pb2.PlayNextTrackRequest(
+            access_token=request.access_token,
+            session_id=request.session_id,
+            current_track_uri=request.current_track_uri,
+            uris=request.uris  # This is a list of strings
+        )
+        response = await grpc_stub().PlayNextTrack(grpc_request, timeout=route_deadline("play"))
+        return {"success": response.success}
     except grpc.RpcError as e:
-        raise HTTPException(status_code=e.code().value[0], detail=e.details())
+        raise grpc_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class RegisterQueueRequest(BaseModel):
+    uris: List[str]
+    queue_id: str = ""  # replace this queue's contents instead of creating a new one
+
+class UpdateQueueRequest(BaseModel):
+    queue_id: str
+    add_uris: List[str] = []
+    remove_uris: List[str] = []
+    add_at_front: bool = True  # liked songs are newest first
+
+class PlayFromQueueRequest(BaseModel):
+    access_token: str = ""
+    session_id: str = ""
+    queue_id: str
+    track_uri: str = ""  # used when set, otherwise index
+    index: int = 0
+
+
+def queue_to_dict(response: pb2.QueueResponse) -> dict:
+    return {"success": response.success, "queue_id": response.queue_id,
+            "length": response.length, "version": response.version}
+
+@app.post("/tracks/queue")
+async def register_queue(request: RegisterQueueRequest):
+    """Upload the play order once; later clicks only send the queue id and a track."""
+    try:
+        response = await grpc_stub().RegisterQueue(pb2.RegisterQueueRequest(
+            uris=request.uris, queue_id=request.queue_id,
+        ), timeout=route_deadline("queue"))
+        return queue_to_dict(response)
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+@app.post("/tracks/queue/update")
+async def update_queue(request: UpdateQueueRequest):
+    try:
+        response = await grpc_stub().UpdateQueue(pb2.UpdateQueueRequest(
+            queue_id=request.queue_id,
+            add_uris=request.add_uris,
+            remove_uris=request.remove_uris,
+            add_at_front=request.add_at_front,
+        ), timeout=route_deadline("queue"))
+        return queue_to_dict(response)
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+@app.post("/tracks/queue/play")
+async def play_from_queue(request: PlayFromQueueRequest):
+    try:
+        response = await grpc_stub().PlayFromQueue(pb2.PlayFromQueueRequest(
+            access_token=request.access_token,
+            session_id=request.session_id,
+            queue_id=request.queue_id,
+            track_uri=request.track_uri,
+            index=request.index,
+        ), timeout=route_deadline("play"))
+        return {"success": response.success, "index": response.index, "window": response.window}
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+AUDIO_FORMATS = ("json", "base64", "binary")
+
+
+def packed_features(features: dict) -> dict:
+    """Features with beats/mfccs as base64 little-endian float32 instead of number lists."""
+    packed = {k: v for k, v in features.items() if k not in ("beats", "mfccs")}
+    packed["beats_f32"] = base64.b64encode(pack_f32(features["beats"])).decode("ascii")
+    packed["mfccs_f32"] = base64.b64encode(pack_f32(features["mfccs"])).decode("ascii")
+    return packed
+
+
+def binary_features(features: dict) -> bytes:
+    """One float32 buffer: [energy, valence, tempo, danceability, n_beats, n_mfccs, *beats, *mfccs]."""
+    beats, mfccs = features["beats"], features["mfccs"]
+    header = [features["energy"], features["valence"], features["tempo"], features["danceability"],
+              len(beats), len(mfccs)]
+    return pack_f32([*header, *beats, *mfccs])
+
+
 class GetAudioVisualData(BaseModel):
-    access_token: str
+    access_token: str = ""
+    session_id: str = ""
     track_id: str
+    format: str = "json"  # "json", "base64" (packed arrays) or "binary" (application/octet-stream)
 
 @app.post("/audio-analysis")
-async def audio_analysis(request: GetAudioVisualData):
-    print(">>> /audio-analysis endpoint hit")
+async def audio_analysis(request: GetAudioVisualData, http_request: Request):
     track_id = request.track_id
-    access_token = request.access_token
-    if not track_id or not access_token:
+    if not track_id or not (request.access_token or request.session_id):
         return {"success": False, "error": "Missing track_id or access_token"}
+    if request.format not in AUDIO_FORMATS:
+        return {"success": False, "error": f"format must be one of {', '.join(AUDIO_FORMATS)}"}
+
+    # A track's features never change (AcousticBrainz is frozen), so the tag
+    # needs no lookup and a revalidation skips the whole pipeline
+    etag = make_etag("audio", track_id, FEATURES_VERSION, local_features.LOCAL_FEATURES_VERSION, request.format)
+    if etag_matches(http_request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    access_token = await spotify_token(request)
+    try:
+        # Served in-process, so the route's deadline bounds the pipeline directly
+        async with deadlines.within(route_deadline("audio-analysis")):
+            features = await get_track_features(track_id, access_token)
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    headers = {"ETag": etag}
+    if request.format == "binary":
+        return Response(binary_features(features), media_type="application/octet-stream", headers=headers)
+    return JSONResponse(packed_features(features) if request.format == "base64" else features, headers=headers)
 
-    async with httpx.AsyncClient() as client:
-        # Step 1: Get Spotify track metadata
-        track_url = f"https://api.spotify.com/v1/tracks/{track_id}"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        track_resp = await client.get(track_url, headers=headers)
-        if track_resp.status_code != 200:
-            return {"success": False, "error": f"Spotify track metadata error: {track_resp.text}"}
-        track_data = track_resp.json()
 
-    isrc = track_data.get("external_ids", {}).get("isrc")
-    print(isrc)
+class GetAudioVisualDataBatch(BaseModel):
+    access_token: str = ""
+    session_id: str = ""
+    track_ids: List[str]
+    format: str = "json"  # "json" or "base64"
 
-    if not isrc:
-        raise Exception("No ISRC found in Spotify metadata")
+@app.post("/audio-analysis/batch")
+async def audio_analysis_batch(request: GetAudioVisualDataBatch):
+    """Features for many tracks in one call, with per-track errors."""
+    if not request.track_ids or not (request.access_token or request.session_id):
+        return {"success": False, "error": "Missing track_ids or access_token"}
 
+    access_token = await spotify_token(request)
     try:
-        features = await get_acousticbrainz_features(isrc)
-        print(f"AcousticBrainz features: {features}")
-        return {"success": True, **features}
+        async with deadlines.within(route_deadline("audio-analysis-batch")):
+            results, errors = await get_acousticbrainz_features_batch(request.track_ids, access_token)
+        if request.format == "base64":
+            results = {track_id: packed_features(f) for track_id, f in results.items()}
+        return {"success": True, "results": results, "errors": errors}
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Deadline exceeded")
     except Exception as e:
         return {"success": False, "error": str(e)}
+
+
+class GetVisualTimelines(BaseModel):
+    access_token: str = ""
+    session_id: str = ""
+    track_ids: List[str]
+    frame_rate: float = 0  # 0 uses the server default
+
+@app.post("/audio-analysis/timelines")
+async def visual_timelines(request: GetVisualTimelines):
+    """Precomputed animation curves, each a base64 little-endian Float32Array."""
+    if not request.track_ids or not (request.access_token or request.session_id):
+        return {"success": False, "error": "Missing track_ids or access_token"}
+
+    try:
+        response = await grpc_stub().GetVisualTimelines(pb2.GetVisualTimelinesRequest(
+            access_token=request.access_token,
+            session_id=request.session_id,
+            track_ids=request.track_ids,
+            frame_rate=request.frame_rate,
+        ), timeout=route_deadline("timelines"))
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+
+    timelines, errors = {}, {}
+    for timeline in response.timelines:
+        if timeline.error:
+            errors[timeline.track_id] = timeline.error
+            continue
+        timelines[timeline.track_id] = {
+            "frames": timeline.frames,
+            **{name: base64.b64encode(getattr(timeline, name)).decode("ascii") for name in TIMELINE_CURVES},
+        }
+    return {"success": response.success, "frame_rate": response.frame_rate,
+            "timelines": timelines, "errors": errors}
+
+
+class PrefetchAudioFeatures(BaseModel):
+    access_token: str = ""
+    session_id: str = ""
+    track_ids: List[str]  # most urgent first
+    replace: bool = True  # drop this caller's earlier, still-pending prefetches
+
+@app.post("/audio-analysis/prefetch")
+async def prefetch_audio_features(request: PrefetchAudioFeatures):
+    """Warm features and timelines for tracks the client expects to show soon; returns immediately."""
+    if not request.track_ids or not (request.access_token or request.session_id):
+        return {"success": False, "error": "Missing track_ids or access_token"}
+
+    try:
+        response = await grpc_stub().PrefetchAudioFeatures(pb2.PrefetchRequest(
+            access_token=request.access_token,
+            session_id=request.session_id,
+            track_ids=request.track_ids,
+            replace=request.replace,
+        ), timeout=route_deadline("prefetch"))
+    except grpc.RpcError as e:
+        raise grpc_http_error(e)
+    return {"success": response.success, "queued": response.queued}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**get_feature_cache().stats(), "ab_index": get_ab_index().stats()}
+
+
+@app.get("/singleflight/stats")
+async def singleflight_stats():
+    return singleflight.stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    return scheduler.stats()
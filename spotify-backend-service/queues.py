@@ -0,0 +1,190 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS play_queues (
+    queue_id TEXT PRIMARY KEY,
+    uris TEXT NOT NULL,          -- newline-separated, in play order
+    version INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS play_queues_used ON play_queues (used_at);
+"""
+
+# used_at is only written back when it is at least this stale
+_TOUCH_INTERVAL = 60.0
+
+
+class QueueError(Exception):
+    """Unknown queue, or a track that is not in it."""
+
+
+class PlayQueue:
+    """An ordered URI list with a URI -> position index.
+
+    Lookups and windows are O(1)/O(window); edits rebuild the index, which is
+    fine because they only happen when the library changes.
+    """
+
+    __slots__ = ("queue_id", "uris", "version", "used_at", "_index")
+
+    def __init__(self, queue_id: str, uris: list[str], version: int = 1, used_at: float = 0.0):
+        self.queue_id = queue_id
+        self.uris = uris
+        self.version = version
+        self.used_at = used_at
+        self._reindex()
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+    def index_of(self, uri: str) -> int:
+        try:
+            return self._index[uri]
+        except KeyError:
+            raise QueueError(f"{uri} is not in queue") from None
+
+    def window(self, start: int, size: int) -> list[str]:
+        """Up to `size` URIs from `start`, wrapping around so the rest of the queue still follows."""
+        n = len(self.uris)
+        if n == 0:
+            return []
+        start %= n
+        window = self.uris[start:start + size]
+        if len(window) < size and start:
+            window += self.uris[:min(start, size - len(window))]
+        return window
+
+    def update(self, add_uris: list[str], remove_uris: list[str], at_front: bool) -> None:
+        removed = set(remove_uris)
+        added = [uri for uri in dict.fromkeys(add_uris) if uri not in self._index or uri in removed]
+        moved = removed.union(added)
+        kept = [uri for uri in self.uris if uri not in moved]
+        self.uris = added + kept if at_front else kept + added
+        self.version += 1
+        self._reindex()
+
+    def _reindex(self) -> None:
+        # First occurrence wins, like list.remove() in PlayNextTrack
+        self._index = {}
+        for position, uri in enumerate(self.uris):
+            self._index.setdefault(uri, position)
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+class QueueStore:
+    """Registered play queues in SQLite, so a queue id outlives a server restart."""
+
+    def __init__(self, path: str = config.QUEUE_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, queue_id: str) -> PlayQueue | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uris, version, used_at FROM play_queues WHERE queue_id = ?", (queue_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        uris, version, used_at = row
+        return PlayQueue(queue_id, uris.split("\n") if uris else [], version, used_at)
+
+    def version(self, queue_id: str) -> int | None:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM play_queues WHERE queue_id = ?", (queue_id,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, queue: PlayQueue) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO play_queues (queue_id, uris, version, used_at) VALUES (?, ?, ?, ?)",
+                (queue.queue_id, "\n".join(queue.uris), queue.version, queue.used_at),
+            )
+
+    def touch(self, queue_id: str, now: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE play_queues SET used_at = ? WHERE queue_id = ?", (now, queue_id))
+
+    def purge(self, used_before: float) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM play_queues WHERE used_at < ?", (used_before,)).rowcount
+
+
+# ── Manager ──────────────────────────────────────────────────────────────────
+
+class QueueManager:
+    """Play queues by id: recently used ones in memory, all of them in SQLite.
+
+    The in-memory copy is checked against the stored version on every use,
+    so processes sharing the store never play from a stale queue.
+    """
+
+    def __init__(self, store: QueueStore | None = None,
+                 cache_size: int = config.QUEUE_CACHE_SIZE,
+                 idle_timeout: float = config.QUEUE_IDLE_TIMEOUT):
+        self.store = store or QueueStore()
+        self.cache_size = cache_size
+        self.idle_timeout = idle_timeout
+        self._queues: OrderedDict[str, PlayQueue] = OrderedDict()
+
+    def register(self, uris: list[str], queue_id: str = "") -> PlayQueue:
+        """Store a new queue, or replace the contents of `queue_id` when given."""
+        now = time.time()
+        self.store.purge(now - self.idle_timeout)
+        version = 1
+        if queue_id:
+            previous = self._queues.get(queue_id) or self.store.get(queue_id)
+            version = previous.version + 1 if previous else 1
+        queue = PlayQueue(queue_id or secrets.token_urlsafe(16), list(uris), version, now)
+        self.store.put(queue)
+        self._remember(queue)
+        return queue
+
+    def get(self, queue_id: str) -> PlayQueue:
+        queue = self._queues.get(queue_id)
+        if queue is not None and self.store.version(queue_id) != queue.version:
+            queue = None  # edited by another server process
+        if queue is None:
+            queue = self.store.get(queue_id)
+            if queue is None:
+                raise QueueError("Unknown or expired queue")
+        self._remember(queue)
+        now = time.time()
+        if now - queue.used_at > _TOUCH_INTERVAL:
+            queue.used_at = now
+            self.store.touch(queue_id, now)
+        return queue
+
+    def update(self, queue_id: str, add_uris: list[str], remove_uris: list[str], at_front: bool) -> PlayQueue:
+        queue = self.get(queue_id)
+        queue.update(add_uris, remove_uris, at_front)
+        self.store.put(queue)
+        return queue
+
+    def _remember(self, queue: PlayQueue) -> None:
+        self._queues[queue.queue_id] = queue
+        self._queues.move_to_end(queue.queue_id)
+        while len(self._queues) > self.cache_size:
+            self._queues.popitem(last=False)
+
+
+_manager: QueueManager | None = None
+
+
+def get_queue_manager() -> QueueManager:
+    """Process-wide QueueManager, opened on first use."""
+    global _manager
+    if _manager is None:
+        _manager = QueueManager()
+    return _manager
@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import config
+from leases import Lease
+from singleflight import SingleFlight
+from upstream import BACKGROUND, INTERACTIVE, scheduler
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    access_token TEXT NOT NULL,
+    refresh_token TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at);
+"""
+
+# used_at is only written back when it is at least this stale
+_TOUCH_INTERVAL = 60.0
+# A refresh holds its session's lease this long at most, so a crashed holder can't block the session
+_REFRESH_LEASE_TTL = 30.0
+# How often a process waiting on another's refresh looks for the new token
+_REFRESH_POLL = 0.1
+
+
+class SessionError(Exception):
+    """Unknown session, or Spotify refused its refresh token; the user must log in again."""
+
+
+@dataclass
+class Session:
+    session_id: str
+    access_token: str
+    refresh_token: str
+    expires_at: float
+    used_at: float
+
+    def expires_in(self, now: float | None = None) -> int:
+        return max(0, int(self.expires_at - (now or time.time())))
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+class SessionStore:
+    """Sessions in SQLite, so they survive restarts and are shared by the
+    gRPC server and the proxy."""
+
+    def __init__(self, path: str = config.SESSION_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT session_id, access_token, refresh_token, expires_at, used_at FROM sessions "
+                "WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return Session(*row) if row else None
+
+    def put(self, session: Session) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, access_token, refresh_token, expires_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session.session_id, session.access_token, session.refresh_token,
+                 session.expires_at, session.used_at),
+            )
+
+    def touch(self, session_id: str, now: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE sessions SET used_at = ? WHERE session_id = ?", (now, session_id))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def due(self, expires_before: float, used_after: float) -> list[str]:
+        """Sessions in recent use whose access token runs out before `expires_before`."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session_id FROM sessions WHERE expires_at < ? AND used_at > ?",
+                (expires_before, used_after),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, used_before: float) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM sessions WHERE used_at < ?", (used_before,)).rowcount
+
+
+# ── Manager ──────────────────────────────────────────────────────────────────
+
+class SessionManager:
+    """Hands out a valid Spotify access token for an opaque session id.
+
+    Tokens are renewed with the session's refresh token once they are within
+    SESSION_REFRESH_MARGIN of expiring: lazily by whichever request notices
+    first, and ahead of time by run(). Concurrent refreshes of one session
+    share a single token request: within a process through SingleFlight,
+    across processes through a per-session lease, whose holder re-reads the
+    stored session before spending its refresh token (Spotify may rotate it,
+    and a second use of the old one is refused). If a refresh fails while
+    the old token is still valid, callers keep using the old token; the
+    session is only dropped when Spotify answers invalid_grant.
+    """
+
+    def __init__(self, store: SessionStore | None = None,
+                 client_id: str | None = config.SPOTIFY_CLIENT_ID,
+                 client_secret: str | None = config.SPOTIFY_CLIENT_SECRET,
+                 refresh_margin: float = config.SESSION_REFRESH_MARGIN,
+                 idle_timeout: float = config.SESSION_IDLE_TIMEOUT,
+                 lease_path: str = config.LEASE_STORE_PATH):
+        self.store = store or SessionStore()
+        self.lease_path = lease_path
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self._sessions: dict[str, Session] = {}
+        self._refreshes = SingleFlight("session_refresh")
+
+    def create(self, token_data: dict) -> Session:
+        """Start a session from a Spotify authorization-code token response."""
+        now = time.time()
+        session = Session(
+            session_id=secrets.token_urlsafe(32),
+            access_token=token_data["access_token"],
+            refresh_token=token_data.get("refresh_token", ""),
+            expires_at=now + float(token_data.get("expires_in", 3600)),
+            used_at=now,
+        )
+        self.store.put(session)
+        self._sessions[session.session_id] = session
+        return session
+
+    async def access_token(self, session_id: str) -> str:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None or session.expires_at - now < self.refresh_margin:
+            # Another process may have refreshed it already
+            session = self._load(session_id)
+        if session.expires_at - now < self.refresh_margin:
+            try:
+                session = await self.refresh(session_id)
+            except SessionError:
+                raise
+            except Exception:
+                if session.expires_at <= now:
+                    raise
+                logging.warning(f"Early refresh of session {session_id[:8]} failed; using the current token")
+
+        if now - session.used_at > _TOUCH_INTERVAL:
+            session.used_at = now
+            self.store.touch(session_id, now)
+        return session.access_token
+
+    async def refresh(self, session_id: str, priority: int = INTERACTIVE) -> Session:
+        return await self._refreshes.do(session_id, lambda: self._refresh(session_id, priority))
+
+    async def run(self, interval: float = config.SESSION_REFRESH_INTERVAL) -> None:
+        """Renew tokens of recently used sessions before they expire, forever.
+
+        `interval` should be well under the refresh margin so every token is
+        seen at least once inside it. When several processes share the store,
+        only the holder of the sweep lease does the work.
+        """
+        lease = Lease("session_refresh", ttl=3 * interval, path=self.lease_path)
+        try:
+            while True:
+                if lease.acquire():
+                    await self._sweep()
+                await asyncio.sleep(interval)
+        finally:
+            lease.release()
+
+    async def _sweep(self) -> None:
+        now = time.time()
+        purged = self.store.purge(now - self.idle_timeout)
+        if purged:
+            logging.info(f"Dropped {purged} idle session(s)")
+        due = self.store.due(now + self.refresh_margin, now - self.idle_timeout)
+        results = await asyncio.gather(
+            *(self.refresh(session_id, BACKGROUND) for session_id in due), return_exceptions=True
+        )
+        for session_id, result in zip(due, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Background refresh of session {session_id[:8]} failed: {result}")
+
+    def _load(self, session_id: str) -> Session:
+        session = self.store.get(session_id)
+        if session is None:
+            self._sessions.pop(session_id, None)
+            raise SessionError("Unknown or expired session")
+        self._sessions[session_id] = session
+        return session
+
+    async def _refresh(self, session_id: str, priority: int) -> Session:
+        lease = Lease(f"session_refresh:{session_id}", ttl=_REFRESH_LEASE_TTL, path=self.lease_path,
+                      holder=secrets.token_hex(8))
+        give_up = time.monotonic() + _REFRESH_LEASE_TTL
+        while not await asyncio.to_thread(lease.acquire):
+            # Another process is refreshing this session; its token lands in the store
+            await asyncio.sleep(_REFRESH_POLL)
+            session = self._load(session_id)
+            if session.expires_at - time.time() >= self.refresh_margin:
+                return session
+            if time.monotonic() > give_up:
+                raise Exception("Timed out waiting for another process to refresh the session")
+        try:
+            return await self._refresh_locked(session_id, priority)
+        finally:
+            await asyncio.to_thread(lease.release)
+
+    async def _refresh_locked(self, session_id: str, priority: int) -> Session:
+        # Re-read under the lease: the refresh token may have been spent and rotated elsewhere
+        session = self._load(session_id)
+        if session.expires_at - time.time() >= self.refresh_margin:
+            return session  # refreshed elsewhere since the caller looked
+        if not session.refresh_token:
+            raise SessionError("Session has no refresh token")
+
+        basic = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        response = await scheduler.request(
+            "POST", f"{config.SPOTIFY_ACCOUNTS_URL}/api/token",
+            headers={"Authorization": f"Basic {basic}", "Content-Type": "application/x-www-form-urlencoded"},
+            data={"grant_type": "refresh_token", "refresh_token": session.refresh_token},
+            priority=priority,
+        )
+        if response.status_code in (400, 401) and _token_error(response) == "invalid_grant":
+            # The user revoked access or the refresh token expired; nothing will revive this session
+            self.store.delete(session_id)
+            self._sessions.pop(session_id, None)
+            raise SessionError(f"Spotify refused the refresh token: {response.text}")
+        if response.status_code != 200:
+            raise Exception(f"Spotify token refresh failed: {response.text}")
+
+        token_data = response.json()
+        now = time.time()
+        session = Session(
+            session_id=session_id,
+            access_token=token_data["access_token"],
+            # Spotify only sometimes rotates the refresh token
+            refresh_token=token_data.get("refresh_token") or session.refresh_token,
+            expires_at=now + float(token_data.get("expires_in", 3600)),
+            used_at=session.used_at,
+        )
+        self.store.put(session)
+        self._sessions[session_id] = session
+        return session
+
+
+def _token_error(response) -> str | None:
+    """The OAuth `error` code of a token endpoint response, if it has one."""
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body.get("error") if isinstance(body, dict) else None
+
+
+_manager: SessionManager | None = None
+
+
+def get_session_manager() -> SessionManager:
+    """Process-wide SessionManager, opened on first use."""
+    global _manager
+    if _manager is None:
+        _manager = SessionManager()
+    return _manager
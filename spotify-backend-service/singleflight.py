@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+import deadlines
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight task.
+
+    The first caller for a key starts `fn()` as a task; callers arriving while
+    it runs await the same task and get the same result or exception. Each
+    caller waits through a shield, so cancelling one caller never cancels the
+    work under the others, and the task is cancelled only once every caller
+    has gone. Joining callers inherit whatever the first caller's `fn` does
+    (e.g. its priority lane or access token), but not its deadline: each
+    caller stops waiting at its own.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+        self.started = 0    # calls that ran fn()
+        self.coalesced = 0  # calls that joined one already in flight
+        self.failed = 0     # started calls that raised
+        self.abandoned = 0  # started calls cancelled because every caller left
+        groups.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.get_running_loop().create_task(fn(), context=deadlines.detached()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last interested caller was cancelled; stop the upstream work
+                # and let the next caller for this key start afresh
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+        }
+
+    def _finished(self, key, call):
+        self._forget(key, call)
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self.failed += 1
+
+    def _forget(self, key, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+groups: list[SingleFlight] = []
+
+
+def stats() -> dict:
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,13 @@
+import pytest
+
+import feature_cache
+from feature_cache import FeatureCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh FeatureCache on disk under tmp_path, installed as the process-wide one."""
+    fresh = FeatureCache(path=str(tmp_path / "features.sqlite3"))
+    monkeypatch.setattr(feature_cache, "_cache", fresh)
+    yield fresh
+    fresh.close()
@@ -0,0 +1,162 @@
+import io
+import json
+import os
+import tarfile
+import uuid
+
+import pytest
+
+import ab_ingest
+import config
+from ab_index import ABIndex, ABIndexWriter
+
+MBID = "9d3ab1f4-4b1a-4f5e-9e8a-0c1f6a9b2d11"
+OTHER = "3f1c2e44-7a6b-4c1d-8e2f-5a4b3c2d1e00"
+FEATURES = {"energy": 0.8, "danceability": 0.6, "valence": 0.25, "tempo": 0.6,
+            "beats": [0.5, 1.0, 1.5], "mfccs": [1.0, -2.5, 3.25], "length": 180.0}
+
+
+@pytest.fixture(autouse=True)
+def recheck_every_lookup(monkeypatch):
+    monkeypatch.setattr(config, "AB_INDEX_RECHECK_INTERVAL", 0.0)
+
+
+def build(path, features=None, isrcs=None):
+    writer = ABIndexWriter(features_version=1, path=path)
+    for mbid, values in (features or {MBID: FEATURES}).items():
+        writer.add_features(mbid, values)
+    for isrc, mbid in (isrcs or {"USRC17607839": MBID}).items():
+        writer.add_isrc(isrc, mbid)
+    return writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "ab_index")
+    build(path)
+    index = ABIndex(path)
+    assert index.features_version() == 1
+    assert index.mbid("usrc17607839") == MBID
+    assert index.mbid("GBAYE0601498") is None
+    assert index.features(MBID) == FEATURES
+    assert index.features(OTHER) is None
+    assert index.features("not-an-mbid") is None
+
+
+def test_missing_index_is_not_remembered(tmp_path):
+    path = str(tmp_path / "ab_index")
+    index = ABIndex(path)
+    assert not index.available()
+    assert index.stats() == {"available": False}
+    build(path)
+    assert index.features(MBID) == FEATURES
+
+
+def test_rebuild_is_published_through_a_link(tmp_path):
+    path = str(tmp_path / "ab_index")
+    build(path)
+    index = ABIndex(path)
+    assert index.features(OTHER) is None
+    first = os.path.realpath(path)
+
+    build(path, features={OTHER: FEATURES}, isrcs={"USRC17607839": OTHER})
+    assert os.path.islink(path)
+    assert not os.path.exists(first)  # previous build cleaned up
+    assert index.features(OTHER) == FEATURES
+    assert index.features(MBID) is None
+    assert index.mbid("USRC17607839") == OTHER
+
+
+def test_replaces_an_index_directory_from_before_links(tmp_path):
+    path = str(tmp_path / "ab_index")
+    os.makedirs(path)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        f.write('{"version": 0}')
+    build(path)
+    assert os.path.islink(path)
+    assert ABIndex(path).features(MBID) == FEATURES
+    assert set(os.listdir(tmp_path)) == {"ab_index", os.path.basename(os.path.realpath(path))}
+
+
+def test_abort_leaves_no_trace(tmp_path):
+    path = str(tmp_path / "ab_index")
+    writer = ABIndexWriter(features_version=1, path=path)
+    writer.add_features(MBID, FEATURES)
+    writer.abort()
+    assert os.listdir(tmp_path) == []
+
+
+def test_first_entry_wins_for_repeated_keys(tmp_path):
+    path = str(tmp_path / "ab_index")
+    build(path, features={MBID: FEATURES}, isrcs={"USRC17607839": MBID})
+    writer = ABIndexWriter(features_version=1, path=path)
+    writer.add_features(MBID, FEATURES)
+    writer.add_features(MBID, {**FEATURES, "energy": 0.1})
+    writer.add_isrc("USRC17607839", MBID)
+    writer.add_isrc("USRC17607839", OTHER)
+    meta = writer.close()
+    assert (meta["recordings"], meta["isrcs"]) == (1, 1)
+    index = ABIndex(path)
+    assert index.features(MBID)["energy"] == 0.8
+    assert index.mbid("USRC17607839") == MBID
+
+
+def test_many_keys_are_all_found(tmp_path):
+    path = str(tmp_path / "ab_index")
+    mbids = [str(uuid.UUID(int=i + 1)) for i in range(2000)]
+    build(path, features={mbid: {**FEATURES, "length": float(i)} for i, mbid in enumerate(mbids)},
+          isrcs={f"USRC1{i:07d}": mbid for i, mbid in enumerate(mbids)})
+    index = ABIndex(path)
+    for i, mbid in enumerate(mbids):
+        assert index.mbid(f"USRC1{i:07d}") == mbid
+        assert index.features(mbid)["length"] == i
+
+
+def test_ingest_joins_high_and_low_level_dumps(tmp_path):
+    highlevel, lowlevel = tmp_path / "highlevel", tmp_path / "lowlevel"
+    highlevel.mkdir()
+    lowlevel.mkdir()
+    for mbid in (MBID, OTHER):
+        (highlevel / f"{mbid}-0.json").write_text(json.dumps(
+            {"highlevel": {"mood_relaxed": {"probability": 0.2}}}))
+    (lowlevel / f"{MBID}-0.json").write_text(json.dumps(
+        {"rhythm": {"beats_position": [0.5, 1.0]}, "metadata": {"audio_properties": {"length": 90.0}}}))
+    (lowlevel / f"{MBID}-1.json").write_text("{}")  # only submission 0 counts
+
+    path = str(tmp_path / "ab_index")
+    writer = ABIndexWriter(features_version=1, path=path)
+    ab_ingest.ingest_acousticbrainz(writer, [str(highlevel)], [str(lowlevel)])
+    writer.close()
+
+    index = ABIndex(path)
+    assert index.features(MBID)["energy"] == 0.8
+    assert index.features(MBID)["beats"] == [0.5, 1.0]
+    assert index.features(OTHER) is None  # no low-level document
+    assert not any(name.startswith(".ab_ingest-") for name in os.listdir(tmp_path))
+
+
+MBDUMP = {
+    "recording": f"1\t{MBID}\tSong\n2\t{OTHER}\tOther song\n",
+    "isrc": "10\t1\tUSRC17607839\t0\n11\t2\tGBAYE0000351\t0\n12\t3\tUSXXX0000001\t0\n",
+}
+
+
+@pytest.mark.parametrize("order", [("recording", "isrc"), ("isrc", "recording")])
+def test_mbdump_archive_is_joined_in_stream_order(tmp_path, order):
+    path = tmp_path / "mbdump.tar.bz2"
+    with tarfile.open(path, "w:bz2") as tar:
+        for table in ("COPYING", *order):
+            data = MBDUMP.get(table, "").encode()
+            info = tarfile.TarInfo(f"mbdump/{table}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    pairs = sorted(ab_ingest.iter_isrc_pairs(str(path), str(tmp_path)))
+    assert pairs == [("GBAYE0000351", OTHER), ("USRC17607839", MBID)]  # recording 3 is unknown
+    assert not any(name.startswith(".ab_ingest-") for name in os.listdir(tmp_path))
+
+
+def test_mbdump_directory_is_joined(tmp_path):
+    (tmp_path / "mbdump").mkdir()
+    for table, text in MBDUMP.items():
+        (tmp_path / "mbdump" / table).write_text(text)
+    assert sorted(ab_ingest.iter_isrc_pairs(str(tmp_path))) == [("GBAYE0000351", OTHER), ("USRC17607839", MBID)]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+from starlette.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from fake_upstreams import Faults, Library, fault_injector, musicbrainz_app, spotify_api_app  # noqa: E402
+from loadtest import Workload, percentile  # noqa: E402
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50, 99, 100)
+    assert percentile([], 95) == 0.0
+    assert percentile([7.0], 1) == 7.0
+
+
+def test_library_ids_map_back_to_their_track():
+    library = Library(100)
+    for i in (0, 42, 99):
+        assert Library.index(Library.track_id(i)) == Library.index(Library.isrc(i)) == Library.index(Library.mbid(i)) == i
+    assert Library.index("not-ours") is None
+    assert not library.valid(100)
+    assert library.track(3) == Library(100).track(3)  # the same data on every run
+
+
+def test_workloads_repeat_for_a_seed():
+    a, b = Workload(500, seed=1), Workload(500, seed=1)
+    assert [a.request("audio-analysis") for _ in range(5)] == [b.request("audio-analysis") for _ in range(5)]
+    with pytest.raises(ValueError):
+        a.request("nope")
+
+
+def test_fake_spotify_pages_and_revalidates():
+    client = TestClient(spotify_api_app(Library(120)))
+    page = client.get("/v1/me/tracks", params={"limit": 50, "offset": 100})
+    assert page.json()["total"] == 120 and len(page.json()["items"]) == 20
+    again = client.get("/v1/me/tracks", params={"limit": 50, "offset": 100},
+                       headers={"If-None-Match": page.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_fake_musicbrainz_answers_or_queries():
+    client = TestClient(musicbrainz_app(Library(10)))
+    query = " OR ".join(f"isrc:{isrc}" for isrc in (Library.isrc(1), Library.isrc(2), Library.isrc(50)))
+    body = client.get("/ws/2/recording/", params={"query": query}).json()
+    assert [r["id"] for r in body["recordings"]] == [Library.mbid(1), Library.mbid(2)]
+
+
+def test_fault_injection_rates():
+    app = fault_injector(spotify_api_app(Library(10)), Faults(error_rate=0.2, throttle_rate=0.1, retry_after=2))
+    statuses = [TestClient(app).get("/v1/me").status_code for _ in range(300)]
+    assert 0.05 < statuses.count(429) / 300 < 0.18
+    assert 0.12 < statuses.count(503) / 300 < 0.3
+    throttled = next(r for r in (TestClient(app).get("/v1/me") for _ in range(100)) if r.status_code == 429)
+    assert throttled.headers["Retry-After"] == "2"
@@ -0,0 +1,34 @@
+import asyncio
+
+import grpc
+import pytest
+
+from channel_pool import ChannelPool, compression_algorithm
+
+
+def test_compression_names():
+    assert compression_algorithm("GZIP") == grpc.Compression.Gzip
+    with pytest.raises(ValueError, match="Unknown gRPC compression"):
+        compression_algorithm("brotli")
+
+
+def test_stubs_rotate_over_healthy_channels():
+    async def run():
+        pool = ChannelPool(target="127.0.0.1:1", size=3, health_check_interval=60)
+        with pytest.raises(RuntimeError):
+            pool.stub()
+        await pool.start()
+        try:
+            assert len({id(pool.stub()) for _ in range(3)}) == 3  # one connection per channel, in turn
+
+            pool._states[1] = grpc.ChannelConnectivity.TRANSIENT_FAILURE
+            assert all(pool.stub() is not pool._stubs[1] for _ in range(6))
+            assert pool.health()["healthy"] == 2
+
+            pool._states[:] = [grpc.ChannelConnectivity.TRANSIENT_FAILURE] * 3
+            assert pool.stub() in pool._stubs  # none healthy: still hands one out
+        finally:
+            await pool.close()
+        assert pool.health()["size"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,76 @@
+import base64
+import struct
+
+import numpy as np
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import main
+import proxy
+from compression import CompressionMiddleware, negotiate_encoding, zstandard
+from utils import pack_f32
+
+FEATURES = {"energy": 0.5, "valence": 0.25, "tempo": 0.6, "danceability": 0.75,
+            "beats": [0.5, 1.0, 1.5], "mfccs": [1.0, -2.5]}
+
+
+def test_pack_f32_is_what_a_float32array_reads():
+    assert np.frombuffer(pack_f32([0.5, -2.25, 3.0]), dtype="<f4").tolist() == [0.5, -2.25, 3.0]
+
+
+def test_packed_and_binary_layouts():
+    packed = proxy.packed_features(FEATURES)
+    assert "beats" not in packed and packed["energy"] == 0.5
+    assert np.frombuffer(base64.b64decode(packed["beats_f32"]), dtype="<f4").tolist() == FEATURES["beats"]
+
+    values = struct.unpack("<11f", proxy.binary_features(FEATURES))
+    assert values == (0.5, 0.25, 0.6000000238418579, 0.75, 3.0, 2.0, 0.5, 1.0, 1.5, 1.0, -2.5)
+
+    response = main.audio_response(FEATURES, packed=True)
+    assert not response.beats and response.beats_f32 == pack_f32(FEATURES["beats"])
+    assert list(main.audio_response(FEATURES, packed=False).mfccs) == FEATURES["mfccs"]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("br", None),
+    ("", None),
+    ("zstd, gzip", "zstd" if zstandard else "gzip"),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.fixture
+def client():
+    async def big(request):
+        return PlainTextResponse("x" * 2000)
+
+    async def small(request):
+        return PlainTextResponse("tiny")
+
+    async def stream(request):
+        async def chunks():
+            for i in range(3):
+                yield f"line {i}\n"
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/stream", stream)])
+    return TestClient(CompressionMiddleware(app, minimum_size=500))
+
+
+def test_large_and_streamed_bodies_are_compressed(client):
+    for path, text in [("/big", "x" * 2000), ("/stream", "line 0\nline 1\nline 2\n")]:
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.text == text  # the test client decodes gzip
+
+
+def test_small_bodies_and_plain_clients_are_left_alone(client):
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
@@ -0,0 +1,91 @@
+import asyncio
+
+import grpc
+import pytest
+from fastapi.testclient import TestClient
+
+import deadlines
+import proxy
+from admission import AdmissionController
+
+
+def test_no_deadline_by_default():
+    assert deadlines.remaining() is None
+
+
+def test_nested_deadline_never_extends_the_outer_one():
+    async def main():
+        async with deadlines.within(0.5):
+            async with deadlines.within(10):
+                return deadlines.remaining()
+
+    assert 0 < asyncio.run(main()) <= 0.5
+
+
+def test_passing_the_deadline_raises_timeout():
+    async def main():
+        async with deadlines.within(0.05):
+            await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(main())
+
+
+def test_detached_work_has_no_deadline():
+    async def main():
+        async with deadlines.within(0.5):
+            return deadlines.detached().run(deadlines.remaining)
+
+    assert asyncio.run(main()) is None
+
+
+def test_admission_queues_then_times_out():
+    async def main():
+        controller = AdmissionController(max_in_flight=1, max_queued=4, queue_timeout=0.05)
+        assert await controller.acquire(1) is None
+        return await controller.acquire(1)
+
+    assert asyncio.run(main()) == "queue_timeout"
+
+
+def test_admission_sheds_less_urgent_waiters():
+    async def main():
+        controller = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=1)
+        await controller.acquire(0)
+        background = asyncio.create_task(controller.acquire(2))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(controller.acquire(0))
+        await asyncio.sleep(0)
+        controller.release()
+        return await background, await interactive
+
+    assert asyncio.run(main()) == ("shed", None)
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code, details):
+        self._code, self._details = code, details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+
+@pytest.mark.parametrize("code, status", [
+    (grpc.StatusCode.RESOURCE_EXHAUSTED, 503),
+    (grpc.StatusCode.DEADLINE_EXCEEDED, 504),
+    (grpc.StatusCode.UNAUTHENTICATED, 401),
+    (grpc.StatusCode.INTERNAL, 500),
+])
+def test_auth_exchange_maps_grpc_errors(monkeypatch, code, status):
+    class Stub:
+        async def ExchangeCode(self, request, timeout=None):
+            raise FakeRpcError(code, "nope")
+
+    monkeypatch.setattr(proxy, "grpc_stub", Stub)
+    response = TestClient(proxy.app).post("/auth/exchange", json={"code": "abc"})
+    assert response.status_code == status
+    assert response.json()["detail"] == "nope"
+    assert ("retry-after" in response.headers) == (status == 503)
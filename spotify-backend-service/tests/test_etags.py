@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import proxy
+import protos.spotify_pb2 as pb2
+from etags import LibraryETags, etag_matches, make_etag
+
+
+def test_etags_are_stable_and_distinct():
+    assert make_etag("audio", "t1", 3) == make_etag("audio", "t1", 3)
+    assert make_etag("audio", "t1", 3) != make_etag("audio", "t1", 4)
+    assert make_etag("audio", "t1").startswith('W/"')
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('W/"abc"', True),
+    ('"abc"', True),  # weak comparison ignores the W/ prefix
+    ('"other", W/"abc"', True),
+    ('W/"abcd"', False),
+])
+def test_if_none_match(header, matches):
+    assert etag_matches(header, 'W/"abc"') == matches
+
+
+def test_library_etags_expire_and_evict(monkeypatch):
+    tags = LibraryETags(ttl=60, max_entries=2)
+    tags.store(("a",), 'W/"1"', "sync-1")
+    assert tags.lookup(("a",), 'W/"1"') == ("sync-1", True)
+    assert tags.lookup(("a",), 'W/"2"') is None
+    tags.ttl = 0
+    assert tags.lookup(("a",), 'W/"1"') == ("sync-1", False)
+    tags.store(("b",), 'W/"2"', "sync-2")
+    tags.store(("c",), 'W/"3"', "sync-3")
+    assert tags.lookup(("a",), 'W/"1"') is None  # least recently stored goes first
+
+
+class LibraryStub:
+    """gRPC stub whose library stays at one sync token."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def GetLikedTracks(self, request, timeout=None):
+        self.requests.append(request)
+        if request.sync_token == "sync-1":
+            return pb2.LikedTracksResponse(success=True, sync_token="sync-1", not_modified=True)
+        return pb2.LikedTracksResponse(success=True, sync_token="sync-1")
+
+
+@pytest.fixture
+def library(monkeypatch):
+    stub = LibraryStub()
+    monkeypatch.setattr(proxy, "grpc_stub", lambda: stub)
+    monkeypatch.setattr(proxy, "library_etags", LibraryETags(ttl=60))
+    return stub
+
+
+def test_liked_tracks_revalidate_with_the_etag(library):
+    client = TestClient(proxy.app)
+    body = {"session_id": "s", "total": 50}
+    first = client.post("/tracks/liked", json=body)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    # Fresh: answered by the proxy alone
+    again = client.post("/tracks/liked", json=body, headers={"If-None-Match": etag})
+    assert (again.status_code, again.headers["ETag"], len(library.requests)) == (304, etag, 1)
+
+    # Stale: the server confirms with the sync token behind the ETag
+    proxy.library_etags.ttl = 0
+    again = client.post("/tracks/liked", json=body, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert library.requests[-1].sync_token == "sync-1"
+
+    # An unknown tag gets the full library
+    assert client.post("/tracks/liked", json=body, headers={"If-None-Match": 'W/"x"'}).status_code == 200
+
+
+def test_audio_analysis_answers_a_matching_etag_without_work(monkeypatch):
+    monkeypatch.setattr(proxy, "grpc_stub", lambda: pytest.fail("should not be called"))
+    client = TestClient(proxy.app)
+    etag = make_etag("audio", "t1", proxy.FEATURES_VERSION, proxy.local_features.LOCAL_FEATURES_VERSION, "json")
+    response = client.post("/audio-analysis", json={"access_token": "tok", "track_id": "t1"},
+                           headers={"If-None-Match": etag})
+    assert (response.status_code, response.headers["ETag"]) == (304, etag)
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import httpx
+
+import utils
+from feature_cache import FeatureCache, LRUCache
+
+
+def test_writes_reach_disk_in_the_background(cache, tmp_path):
+    cache.put_isrc("t1", "USRC17607839")
+    cache.put_features("m1", {"energy": 0.5})
+    assert cache.flush(timeout=5)
+    reopened = FeatureCache(path=cache.path)
+    try:
+        assert reopened.get_isrc("t1") == "USRC17607839"
+        assert asyncio.run(reopened.get_many("features", ["m1", "m2"])) == {"m1": {"energy": 0.5}}
+        assert reopened.stats()["features"]["disk_hits"] == 1
+        assert reopened.stats()["features"]["misses"] == 1
+    finally:
+        reopened.close()
+
+
+def test_get_many_reads_memory_pending_and_disk(cache):
+    cache.put_mbid("USRC17607839", "m1")
+    assert cache.flush(timeout=5)
+    cache._memory = type(cache._memory)(cache._memory.max_bytes)  # forget the memory tier
+    cache.put_mbid("GBAYE0601498", "m2")
+    found = asyncio.run(cache.get_many("isrc_mbid", ["USRC17607839", "GBAYE0601498", "nope"]))
+    assert found == {"USRC17607839": "m1", "GBAYE0601498": "m2"}
+
+
+def test_a_locked_database_never_blocks_the_event_loop(cache):
+    # Another process holds the write lock: puts return at once, reads still work
+    other = sqlite3.connect(cache.path, isolation_level=None, timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        cache.put_timeline("k", b"\x00" * 16)
+        assert time.perf_counter() - started < 0.05
+        assert not cache.flush(timeout=0.1)
+        assert asyncio.run(cache.lookup("timelines", "k")) == b"\x00" * 16
+    finally:
+        other.execute("COMMIT")
+        other.close()
+    assert cache.flush(timeout=10)
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    lru = LRUCache(max_bytes=10)
+    lru.put("a", 1, 4)
+    lru.put("b", 2, 4)
+    lru.get("a")  # now the most recently used
+    lru.put("c", 3, 4)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    lru.put("huge", 4, 11)  # larger than the whole tier: not kept
+    assert lru.get("huge") is None and lru.bytes == 8
+
+
+def test_repeat_lookups_skip_every_upstream(cache, monkeypatch):
+    monkeypatch.setattr(utils, "_ab_index", lambda: None)
+    calls = []
+
+    async def upstream(method, url, **kwargs):
+        calls.append(url)
+        if "/v1/tracks/" in url:
+            body = {"id": "t1", "external_ids": {"isrc": "USRC17607839"}}
+        elif "/ws/2/recording" in url:
+            body = {"recordings": [{"id": "m1"}]}
+        elif "/high-level" in url:
+            body = {"highlevel": {}}
+        else:
+            body = {"rhythm": {"beats_position": [0.5]}, "metadata": {"audio_properties": {"length": 90.0}}}
+        return httpx.Response(200, content=json.dumps(body).encode())
+
+    monkeypatch.setattr(utils.scheduler, "request", upstream)
+    first = asyncio.run(utils.get_track_features("t1", "token"))
+    upstream_calls = len(calls)
+    assert asyncio.run(utils.get_track_features("t1", "token")) == first
+    assert len(calls) == upstream_calls == 4
+    assert cache.stats()["features"]["memory_hits"] >= 1
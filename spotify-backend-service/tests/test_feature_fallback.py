@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import config
+import local_features
+import utils
+
+TRACK = "track00000000000000001"
+MBID = "00000000-0000-4000-8000-000000000001"
+
+
+class FakeUpstream:
+    """Stands in for scheduler.request, answering by URL substring."""
+
+    def __init__(self, routes: dict):
+        self.routes = routes  # substring -> list of (status, body), consumed in order
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append(url)
+        for part, replies in self.routes.items():
+            if part in url:
+                status, body = replies.pop(0) if len(replies) > 1 else replies[0]
+                return httpx.Response(status, content=json.dumps(body).encode())
+        raise AssertionError(f"unexpected request to {url}")
+
+
+@pytest.fixture
+def upstream(monkeypatch, cache):
+    monkeypatch.setattr(utils, "_ab_index", lambda: None)
+    monkeypatch.setattr(config, "LOCAL_FEATURES_ENABLED", True)
+    analysed = []
+
+    async def fake_local(track_id, access_token, priority=None):
+        analysed.append(track_id)
+        features = {"energy": 0.5, "danceability": 0.5, "valence": 0.5, "tempo": 0.6,
+                    "beats": [0.5, 1.0], "mfccs": [1.0], "length": 30.0}
+        cache.put_features(local_features.local_key(track_id), features)
+        return features
+
+    async def fake_analyse_tracks(track_ids, access_token, priority=None):
+        return {track_id: await fake_local(track_id, access_token) for track_id in track_ids}, {}
+
+    monkeypatch.setattr(local_features, "get_local_features", fake_local)
+    monkeypatch.setattr(local_features, "analyse_tracks", fake_analyse_tracks)
+
+    def install(routes):
+        fake = FakeUpstream(routes)
+        monkeypatch.setattr(utils.scheduler, "request", fake.request)
+        fake.analysed = analysed
+        return fake
+
+    return install
+
+
+def spotify_track(isrc="QZB000000001"):
+    return {"id": TRACK, "external_ids": {"isrc": isrc} if isrc else {}}
+
+
+HIGHLEVEL = {"highlevel": {"bpm": {"value": 120.0}}}
+LOWLEVEL = {"rhythm": {"beats_position": [0.5]}, "lowlevel": {"mfcc": {"mean": [1.0]}},
+            "metadata": {"audio_properties": {"length": 200.0}}}
+
+
+def test_transient_musicbrainz_error_does_not_pin_local_features(upstream):
+    fake = upstream({
+        "/v1/tracks/": [(200, spotify_track())],
+        "/ws/2/recording": [(503, {"error": "busy"}), (200, {"recordings": [{"id": MBID}]})],
+        "/high-level": [(200, HIGHLEVEL)],
+        "/low-level": [(200, LOWLEVEL)],
+    })
+    with pytest.raises(Exception, match="MusicBrainz ISRC search failed"):
+        asyncio.run(utils.get_track_features(TRACK, "token"))
+    assert fake.analysed == []
+
+    features = asyncio.run(utils.get_track_features(TRACK, "token"))
+    assert features["length"] == 200.0  # AcousticBrainz's, not a local analysis
+    assert fake.analysed == []
+
+
+def test_acousticbrainz_server_error_propagates(upstream):
+    fake = upstream({
+        "/v1/tracks/": [(200, spotify_track())],
+        "/ws/2/recording": [(200, {"recordings": [{"id": MBID}]})],
+        "/high-level": [(503, {})],
+    })
+    with pytest.raises(Exception, match="HTTP 503"):
+        asyncio.run(utils.get_track_features(TRACK, "token"))
+    assert fake.analysed == []
+
+
+@pytest.mark.parametrize("routes", [
+    {"/v1/tracks/": [(200, spotify_track(isrc=None))]},
+    {"/v1/tracks/": [(200, spotify_track())], "/ws/2/recording": [(200, {"recordings": []})]},
+    {"/v1/tracks/": [(200, spotify_track())], "/ws/2/recording": [(200, {"recordings": [{"id": MBID}]})],
+     "/high-level": [(404, {"message": "Not found"})]},
+])
+def test_missing_data_falls_back_to_local_analysis_once(upstream, routes):
+    fake = upstream(routes)
+    first = asyncio.run(utils.get_track_features(TRACK, "token"))
+    assert first["success"] and first["length"] == 30.0
+    calls = len(fake.calls)
+
+    again = asyncio.run(utils.get_track_features(TRACK, "token"))
+    assert again == first
+    assert fake.analysed == [TRACK]
+    assert len(fake.calls) == calls  # served from the cached local result
+
+
+def test_batch_only_falls_back_for_missing_data(upstream):
+    other = "track00000000000000002"
+    fake = upstream({
+        "/v1/tracks": [(200, {"tracks": [spotify_track("QZB000000001"), {**spotify_track("QZB000000002"), "id": other}]})],
+        "/ws/2/recording": [(200, {"recordings": [{"id": MBID, "isrcs": ["QZB000000001"]}]})],
+        "/high-level": [(503, {})],
+    })
+    results, errors = asyncio.run(utils.get_acousticbrainz_features_batch([TRACK, other], "token"))
+    assert fake.analysed == [other]  # no MusicBrainz recording: definite
+    assert other in results
+    assert "HTTP 503" in errors[TRACK]  # transient: reported, not analysed
+
+
+def test_cancelled_lookup_is_not_taken_for_features(upstream, monkeypatch):
+    upstream({
+        "/v1/tracks": [(200, {"tracks": [spotify_track()]})],
+        "/ws/2/recording": [(200, {"recordings": [{"id": MBID, "isrcs": ["QZB000000001"]}]})],
+    })
+
+    async def cancelled(mbid, priority=None):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(utils, "fetch_ab_features", cancelled)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(utils.get_acousticbrainz_features_batch([TRACK], "token"))
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import config
+from http_pool import HTTP2_AVAILABLE, AsyncClientPool
+
+
+def test_one_client_per_host():
+    async def run():
+        pool = AsyncClientPool()
+        a = pool.for_url("https://api.spotify.com/v1/me")
+        assert pool.for_url("https://api.spotify.com/v1/tracks?ids=1") is a
+        b = pool.for_url("https://musicbrainz.org/ws/2/recording")
+        assert b is not a
+        assert a.headers["User-Agent"] == config.USER_AGENT
+        await pool.aclose()
+        assert a.is_closed and b.is_closed
+        assert pool.for_url("https://api.spotify.com/v1/me") is not a  # a fresh client after aclose
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def server():
+    peers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            peers.append(self.client_address)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", peers
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_are_kept_alive_between_calls(server):
+    url, peers = server
+
+    async def run():
+        pool = AsyncClientPool()
+        for _ in range(3):
+            assert (await pool.for_url(url).get(f"{url}/ping")).text == "ok"
+        await pool.aclose()
+
+    asyncio.run(run())
+    assert len(peers) == 3 and len(set(peers)) == 1  # one TCP connection served all three
+
+
+@pytest.mark.skipif(not HTTP2_AVAILABLE, reason="h2 is not installed")
+def test_http2_only_for_listed_hosts(monkeypatch):
+    monkeypatch.setattr(config, "UPSTREAM_HTTP2_HOSTS", {"api.spotify.com"})
+
+    async def run():
+        pool = AsyncClientPool()
+        spotify = pool.for_url("https://api.spotify.com/v1/me")
+        musicbrainz = pool.for_url("https://musicbrainz.org/ws/2/recording")
+        http2 = (spotify._transport._pool._http2, musicbrainz._transport._pool._http2)
+        await pool.aclose()
+        return http2
+
+    assert asyncio.run(run()) == (True, False)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+import json_stream
+from json_stream import select_paths
+from utils import LOWLEVEL_PATHS
+
+DOC = {
+    "lowlevel": {"mfcc": {"mean": [1.5, -2.0], "cov": [[1.0] * 13] * 13}, "spectral": {"x": 1}},
+    "metadata": {"audio_properties": {"length": 213.5, "codec": "mp3"}},
+    "rhythm": {"bpm": 120.0, "beats_position": [0.5, 1.0, 1.5]},
+    "tonal": {"key": "C"},
+}
+SELECTED = {
+    "lowlevel": {"mfcc": {"mean": [1.5, -2.0]}},
+    "metadata": {"audio_properties": {"length": 213.5}},
+    "rhythm": {"beats_position": [0.5, 1.0, 1.5]},
+}
+
+
+class Chunks:
+    """The document in `size`-byte chunks, counting how many were read."""
+
+    def __init__(self, doc, size=7):
+        body = json.dumps(doc).encode()
+        self.chunks = [body[i:i + size] for i in range(0, len(body), size)]
+        self.read = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self.chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        return self.chunks[self.read - 1]
+
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_stream, "ijson", None)
+    elif json_stream.ijson is None:
+        pytest.skip("ijson is not installed")
+    return request.param
+
+
+def test_only_the_selected_paths_are_kept(parser):
+    assert asyncio.run(select_paths(Chunks(DOC), LOWLEVEL_PATHS)) == SELECTED
+
+
+def test_missing_paths_are_left_out(parser):
+    doc = {"rhythm": {"beats_position": []}}
+    assert asyncio.run(select_paths(Chunks(doc), LOWLEVEL_PATHS)) == doc
+
+
+def test_parsing_stops_once_every_path_is_seen():
+    if json_stream.ijson is None:
+        pytest.skip("ijson is not installed")
+    doc = {"rhythm": {"beats_position": [0.5]}, "tail": ["x" * 50] * 100}
+    chunks = Chunks(doc)
+    assert asyncio.run(select_paths(chunks, ["rhythm.beats_position"])) == {"rhythm": {"beats_position": [0.5]}}
+    assert chunks.read < len(chunks.chunks) // 2
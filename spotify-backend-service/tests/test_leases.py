@@ -0,0 +1,37 @@
+import time
+
+from leases import Lease
+
+
+def test_only_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    a = Lease("sweep", ttl=30, path=path, holder="a")
+    b = Lease("sweep", ttl=30, path=path, holder="b")
+    assert a.acquire()
+    assert not b.acquire()
+    assert a.acquire()  # renewing is fine
+
+
+def test_release_frees_the_lease(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    a = Lease("sweep", ttl=30, path=path, holder="a")
+    b = Lease("sweep", ttl=30, path=path, holder="b")
+    assert a.acquire()
+    a.release()
+    assert b.acquire()
+
+
+def test_expired_lease_can_be_taken_over(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    a = Lease("sweep", ttl=0.05, path=path, holder="a")
+    b = Lease("sweep", ttl=30, path=path, holder="b")
+    assert a.acquire()
+    time.sleep(0.1)
+    assert b.acquire()
+    assert not a.acquire()
+
+
+def test_leases_are_independent_by_name(tmp_path):
+    path = str(tmp_path / "leases.sqlite3")
+    assert Lease("sweep", ttl=30, path=path, holder="a").acquire()
+    assert Lease("refresh", ttl=30, path=path, holder="b").acquire()
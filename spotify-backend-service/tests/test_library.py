@@ -0,0 +1,136 @@
+import asyncio
+import gc
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+import config
+import library
+import main
+import protos.spotify_pb2 as pb2
+from library import LibraryStore, LibrarySync
+
+
+class FakeSavedTracks:
+    """/v1/me and /v1/me/tracks for one user, newest track first."""
+
+    def __init__(self, size):
+        self.uris = [f"spotify:track:{i}" for i in reversed(range(size))]
+        self.pages = []  # offsets requested, in order
+        self.later_pages_delay = 0.0
+
+    def add(self, count):
+        start = len(self.uris)
+        self.uris[:0] = [f"spotify:track:{i}" for i in reversed(range(start, start + count))]
+
+    def added_at(self, uri):
+        return f"2024-01-01T00:00:{int(uri.rsplit(':', 1)[1]):05d}Z"
+
+    async def request(self, method, url, headers=None, **kwargs):
+        await asyncio.sleep(0)
+        parts = urlsplit(url)
+        request = httpx.Request(method, url)
+        if parts.path == "/v1/me":
+            return httpx.Response(200, json={"id": "user"}, request=request)
+        query = parse_qs(parts.query)
+        offset, limit = int(query["offset"][0]), int(query["limit"][0])
+        self.pages.append(offset)
+        if offset:
+            await asyncio.sleep(self.later_pages_delay)
+        items = [
+            {"added_at": self.added_at(uri), "track": {"name": uri, "id": uri.rsplit(":", 1)[1], "uri": uri,
+                                                      "album": {"id": "al", "name": "Album"},
+                                                      "artists": [{"id": "ar", "name": "Artist"}]}}
+            for uri in self.uris[offset:offset + limit]
+        ]
+        return httpx.Response(200, json={"items": items, "total": len(self.uris)}, request=request)
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    fake = FakeSavedTracks(size=120)
+    monkeypatch.setattr(library.scheduler, "request", fake.request)
+    return fake
+
+
+@pytest.fixture
+def sync(tmp_path):
+    return LibrarySync(LibraryStore(path=str(tmp_path / "library.sqlite3")))
+
+
+def stored_uris(sync):
+    return [pb2.Track.FromString(blob).uri for blob in sync.store.tracks("user")]
+
+
+def test_first_sync_builds_the_snapshot_in_the_background(spotify, sync):
+    async def run():
+        first = await sync.sync("token")
+        while sync._builds:
+            await asyncio.sleep(0.01)
+        return first, await sync.sync("token")
+
+    first, second = asyncio.run(run())
+    assert first == ("user", None)
+    assert second == ("user", 1)
+    assert stored_uris(sync) == spotify.uris
+
+
+def test_delta_sync_reads_only_the_new_pages(spotify, sync, monkeypatch):
+    monkeypatch.setattr(config, "LIBRARY_MIN_SYNC_INTERVAL", 0)
+
+    async def run():
+        await sync.sync("token")
+        while sync._builds:
+            await asyncio.sleep(0.01)
+        spotify.add(3)
+        spotify.pages.clear()
+        return await sync.sync("token")
+
+    assert asyncio.run(run()) == ("user", 2)
+    assert spotify.pages == [0]
+    assert stored_uris(sync) == spotify.uris
+
+
+def test_removals_trigger_a_full_reconcile(spotify, sync, monkeypatch):
+    monkeypatch.setattr(config, "LIBRARY_MIN_SYNC_INTERVAL", 0)
+
+    async def run():
+        await sync.sync("token")
+        while sync._builds:
+            await asyncio.sleep(0.01)
+        del spotify.uris[60]
+        return await sync.sync("token")
+
+    assert asyncio.run(run()) == ("user", 2)
+    assert stored_uris(sync) == spotify.uris
+
+
+def test_idle_users_locks_are_dropped(spotify, sync):
+    async def run():
+        await asyncio.gather(sync.sync("token"), sync.sync("token"))
+        while sync._builds:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    gc.collect()
+    assert len(sync._locks) == 0
+
+
+def test_first_liked_tracks_call_does_not_wait_for_the_whole_library(spotify, sync):
+    spotify.later_pages_delay = 0.1
+    servicer = object.__new__(main.SpotifyAuthServicer)
+    servicer.library = sync
+
+    async def run():
+        response = await servicer.GetLikedTracks(pb2.LikedTracksRequest(access_token="token", total=20), None)
+        building = "user" in sync._builds
+        while sync._builds:
+            await asyncio.sleep(0.01)
+        return response, building
+
+    response, building = asyncio.run(run())
+    assert response.success and response.sync_token == ""
+    assert [track.uri for track in response.tracks] == spotify.uris[:20]
+    assert building
+    assert stored_uris(sync) == spotify.uris  # the background reconcile still ran
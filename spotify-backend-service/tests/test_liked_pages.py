@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import aclosing
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+import config
+import library
+import protos.spotify_pb2 as pb2
+from library import append_tracks, iter_liked_pages
+
+
+class SlowSavedTracks:
+    """/v1/me/tracks where earlier pages take longer, counting requests in flight."""
+
+    def __init__(self, size):
+        self.size = size
+        self.in_flight = self.peak = 0
+        self.offsets = []
+
+    async def request(self, method, url, **kwargs):
+        offset = int(parse_qs(urlsplit(url).query)["offset"][0])
+        self.offsets.append(offset)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.002 * (self.size - offset) / config.SPOTIFY_PAGE_SIZE)
+        finally:
+            self.in_flight -= 1
+        items = [{"track": {"uri": f"spotify:track:{i}", "album": {"id": f"al{i % 3}"}}}
+                 for i in range(offset, min(offset + config.SPOTIFY_PAGE_SIZE, self.size))]
+        return httpx.Response(200, json={"items": items, "total": self.size}, request=httpx.Request(method, url))
+
+
+@pytest.fixture
+def spotify(monkeypatch):
+    fake = SlowSavedTracks(size=1000)
+    monkeypatch.setattr(library.scheduler, "request", fake.request)
+    monkeypatch.setattr(config, "LIKED_TRACKS_FANOUT", 4)
+    return fake
+
+
+def test_pages_come_back_in_order_with_bounded_fanout(spotify):
+    async def run():
+        out = []
+        async with aclosing(iter_liked_pages("token")) as pages:
+            async for offset, total, page in pages:
+                out.append((offset, total, len(page["items"])))
+        return out
+
+    pages = asyncio.run(run())
+    assert [offset for offset, _, _ in pages] == list(range(0, 1000, config.SPOTIFY_PAGE_SIZE))
+    assert sum(count for _, _, count in pages) == 1000
+    assert 1 < spotify.peak <= config.LIKED_TRACKS_FANOUT
+
+
+def test_wanted_limits_pages_and_items(spotify):
+    async def run():
+        async with aclosing(iter_liked_pages("token", wanted=120)) as pages:
+            return [(offset, total, len(page["items"])) async for offset, total, page in pages]
+
+    assert asyncio.run(run()) == [(0, 120, 50), (50, 120, 50), (100, 120, 20)]
+    assert spotify.offsets == [0, 50, 100]
+
+
+def test_stopping_early_cancels_queued_pages(spotify):
+    async def run():
+        async with aclosing(iter_liked_pages("token")) as pages:
+            async for offset, _, _ in pages:
+                if offset:
+                    break
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert spotify.in_flight == 0
+    assert len(spotify.offsets) <= 2 + config.LIKED_TRACKS_FANOUT
+
+
+def test_append_tracks_builds_each_album_once():
+    items = [{"track": {"uri": f"spotify:track:{i}", "name": str(i), "album": {"id": "al", "name": "Album"},
+                        "artists": [{"name": "Artist"}]}} for i in range(3)]
+    albums = {}
+    response = pb2.LikedTracksResponse()
+    append_tracks(response, items, albums)
+    assert list(albums) == ["al"]
+    assert [track.album.name for track in response.tracks] == ["Album"] * 3
+    assert response.tracks[0].artist == "Artist"
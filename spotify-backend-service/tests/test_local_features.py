@@ -0,0 +1,53 @@
+import numpy as np
+
+import local_features
+
+RATE = 22050
+
+
+def click_track(seconds, bpm, offset=0.25):
+    """Short noise bursts on every beat."""
+    samples = np.zeros(int(seconds * RATE), dtype=np.float32)
+    burst = np.random.default_rng(0).uniform(-1, 1, int(0.02 * RATE)).astype(np.float32)
+    for t in np.arange(offset, seconds - 0.05, 60.0 / bpm):
+        start = int(t * RATE)
+        samples[start:start + len(burst)] += burst
+    return samples
+
+
+def test_preview_beats_are_not_extended_over_the_track():
+    features = local_features.analyse(click_track(10.0, 120.0), RATE, duration=200.0)
+    assert features["length"] == 200.0
+    assert features["beats"] and max(features["beats"]) <= 10.0
+    assert abs(np.median(np.diff(features["beats"])) - 0.5) < 0.05
+
+
+def reference_track_beats(onsets, period, tightness=100.0):
+    """track_beats' recursion one frame at a time, as Ellis (2007) writes it."""
+    n = len(onsets)
+    norm = onsets / (onsets.std() or 1.0)
+    gaps = np.arange(max(1, int(round(period / 2))), int(round(2 * period)) + 1)
+    penalty = -tightness * np.log(gaps / period) ** 2
+    score, backlink = norm.copy(), np.full(n, -1, dtype=np.int64)
+    for t in range(int(gaps[0]), n):
+        usable = gaps[gaps <= t]
+        candidates = score[t - usable] + penalty[: len(usable)]
+        best = int(np.argmax(candidates))
+        if candidates[best] > 0:
+            score[t] += candidates[best]
+            backlink[t] = t - usable[best]
+    tail = score[max(0, n - int(round(period))):]
+    t = n - len(tail) + int(np.argmax(tail))
+    beats = []
+    while t >= 0:
+        beats.append(t)
+        t = backlink[t]
+    return np.array(beats[::-1], dtype=np.int64)
+
+
+def test_block_dp_matches_the_frame_by_frame_recursion():
+    rng = np.random.default_rng(1)
+    for n, period in [(2000, 21.5), (500, 43.0), (60, 1.2), (7, 30.0)]:
+        onsets = rng.exponential(size=n)
+        np.testing.assert_array_equal(local_features.track_beats(onsets, period),
+                                      reference_track_beats(onsets, period))
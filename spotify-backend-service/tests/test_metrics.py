@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import grpc
+import httpx
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import metrics
+import protos.spotify_pb2 as pb2
+import proxy
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_proxy_requests_are_timed_per_route(monkeypatch):
+    class Stub:
+        async def GetLikedTracks(self, request, timeout=None):
+            return pb2.LikedTracksResponse(success=True, sync_token="u:1")
+
+    monkeypatch.setattr(proxy, "grpc_stub", Stub)
+    route = {"method": "POST", "route": "/tracks/liked", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **route)
+    unmatched = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+
+    client = TestClient(proxy.app)
+    client.post("/tracks/liked", json={"session_id": "s"})
+    client.get("/no/such/route")
+
+    assert sample("http_request_duration_seconds_count", **route) == before + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") == unmatched + 1
+    exposition = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="POST",route="/tracks/liked",status="200"}' in exposition
+
+
+def test_upstream_bytes_and_latency():
+    labels = {"host": "metrics.test", "direction": "received"}
+    before = sample("upstream_bytes_total", **labels)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=httpx.ByteStream(b"x" * 100)))
+    response = httpx.Client(transport=transport).get("https://metrics.test/")
+    metrics.observe_upstream("metrics.test", response, 0.02, streamed=False)
+    assert sample("upstream_bytes_total", **labels) == before + 100
+    assert sample("upstream_request_duration_seconds_count", host="metrics.test", status="200") >= 1
+
+
+class Context:
+    def __init__(self, code=None):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def time_remaining(self):
+        return None
+
+
+def intercepted(handler):
+    async def continuation(details):
+        return handler
+
+    details = SimpleNamespace(method="/spotify.SpotifyAuth/Probe")
+    return asyncio.run(metrics.MetricsInterceptor().intercept_service(continuation, details))
+
+
+def test_rpcs_are_timed_with_the_status_the_servicer_set():
+    async def probe(request, context):
+        return request
+
+    handler = intercepted(grpc.unary_unary_rpc_method_handler(probe))
+    before = sample("grpc_server_handling_seconds_count", method="Probe", code="NOT_FOUND")
+    assert asyncio.run(handler.unary_unary("ping", Context(grpc.StatusCode.NOT_FOUND))) == "ping"
+    assert sample("grpc_server_handling_seconds_count", method="Probe", code="NOT_FOUND") == before + 1
+
+
+def test_streams_are_timed_to_the_last_message():
+    async def probe(request, context):
+        for i in range(3):
+            yield i
+
+    handler = intercepted(grpc.unary_stream_rpc_method_handler(probe))
+    before = sample("grpc_server_handling_seconds_count", method="Probe", code="OK")
+
+    async def consume():
+        return [message async for message in handler.unary_stream("ping", Context())]
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert sample("grpc_server_handling_seconds_count", method="Probe", code="OK") == before + 1
@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+import config
+import utils
+from utils import NoFeaturesError
+
+
+class FakeMusicBrainz:
+    """Recording search that pages `recordings` two at a time, like a small `limit` would."""
+
+    page_size = 2
+
+    def __init__(self, recordings):
+        self.recordings = recordings
+        self.offsets = []
+        self.fail_at = None  # offset to answer with a 503
+
+    async def request(self, method, url, params=None, **kwargs):
+        offset = params["offset"]
+        self.offsets.append(offset)
+        if offset == self.fail_at:
+            return httpx.Response(503, text="busy")
+        page = self.recordings[offset:offset + self.page_size]
+        return httpx.Response(200, json={"count": len(self.recordings), "offset": offset, "recordings": page})
+
+
+def recording(n, *isrcs):
+    return {"id": f"00000000-0000-4000-8000-{n:012d}", "isrcs": list(isrcs)}
+
+
+@pytest.fixture
+def musicbrainz(monkeypatch, cache):
+    monkeypatch.setattr(utils, "_ab_index", lambda: None)
+    monkeypatch.setattr(config, "MUSICBRAINZ_ISRC_BATCH_SIZE", 20)
+
+    def install(recordings):
+        fake = FakeMusicBrainz(recordings)
+        monkeypatch.setattr(utils.scheduler, "request", fake.request)
+        return fake
+
+    return install
+
+
+def test_isrcs_past_the_first_page_are_found(musicbrainz):
+    fake = musicbrainz([recording(1, "A"), recording(2, "A"), recording(3, "A"), recording(4, "B")])
+    mbids, errors = asyncio.run(utils.get_mbids(["A", "B", "C"]))
+    assert mbids == {"A": recording(1)["id"], "B": recording(4)["id"]}
+    assert isinstance(errors["C"], NoFeaturesError)
+    assert fake.offsets == [0, 2]
+
+
+def test_paging_stops_once_every_isrc_is_matched(musicbrainz):
+    fake = musicbrainz([recording(1, "A"), recording(2, "B"), recording(3, "A"), recording(4, "B")])
+    mbids, errors = asyncio.run(utils.get_mbids(["A", "B"]))
+    assert set(mbids) == {"A", "B"} and not errors
+    assert fake.offsets == [0]
+
+
+def test_failed_page_is_not_a_miss(musicbrainz):
+    fake = musicbrainz([recording(1, "A"), recording(2, "A"), recording(3, "B")])
+    fake.fail_at = 2
+    mbids, errors = asyncio.run(utils.get_mbids(["A", "B"]))
+    assert mbids == {"A": recording(1)["id"]}
+    assert not isinstance(errors["B"], NoFeaturesError)
+    assert "MusicBrainz ISRC search failed" in str(errors["B"])
+
+
+def test_isrcs_match_whatever_their_case(musicbrainz):
+    musicbrainz([recording(1, "USRC17607839")])
+    mbids, errors = asyncio.run(utils.get_mbids(["usrc17607839"]))
+    assert mbids == {"usrc17607839": recording(1)["id"]} and not errors
@@ -0,0 +1,46 @@
+import protos.spotify_pb2 as pb2
+import proxy
+from library import TrackTables, append_tracks
+
+
+def item(n, album, *artists):
+    return {"track": {"name": f"t{n}", "id": f"t{n}", "uri": f"spotify:track:t{n}",
+                      "album": {"id": album, "name": album.upper(), "images": [{"url": f"{album}.jpg"}]},
+                      "artists": [{"id": a, "name": a.upper()} for a in artists]}}
+
+
+def test_stream_tables_only_carry_new_entries():
+    tables, albums = TrackTables(), {}
+    first, second = pb2.LikedTracksPage(), pb2.LikedTracksPage()
+    append_tracks(first, [item(1, "a", "x"), item(2, "a", "x", "y")], albums, tables)
+    append_tracks(second, [item(3, "a", "y"), item(4, "b", "z")], albums, tables)
+
+    assert [album.id for album in first.albums] == ["a"]
+    assert [artist.id for artist in first.artists] == ["x", "y"]
+    assert [album.id for album in second.albums] == ["b"]  # "a" was sent on the first page
+    assert [artist.id for artist in second.artists] == ["z"]
+
+    # Indexes run over the whole stream's tables
+    assert [(t.album_index, list(t.artist_indices)) for t in [*first.tracks, *second.tracks]] == [
+        (0, [0]), (0, [0, 1]), (0, [1]), (1, [2])]
+    assert not first.tracks[0].HasField("album") and not first.tracks[0].artists
+
+
+def test_full_tracks_are_moved_into_the_tables():
+    full = pb2.LikedTracksResponse()
+    append_tracks(full, [item(1, "a", "x"), item(2, "a", "x")], {})
+    normalized, tables = pb2.LikedTracksResponse(), TrackTables()
+    for track in full.tracks:
+        copy = normalized.tracks.add()
+        copy.CopyFrom(track)
+        tables.normalize(copy, normalized)
+
+    assert len(normalized.albums) == 1 and normalized.albums[0].images.url == ["a.jpg"]
+    assert [artist.name for artist in normalized.artists] == ["X"]
+    track = normalized.tracks[1]
+    assert (track.artist, track.HasField("album"), track.album_index, list(track.artist_indices)) == ("", False, 0, [0])
+
+    body = proxy.normalized_tables(normalized)
+    assert body["albums"][0]["name"] == "A"
+    assert body["tracks"][1] == {"name": "t2", "id": "t2", "uri": "spotify:track:t2",
+                                 "album_index": 0, "artist_indices": [0]}
@@ -0,0 +1,84 @@
+import asyncio
+
+import prefetch
+from prefetch import Prefetcher, track_ids_from_uris
+from upstream import BACKGROUND
+
+
+class FakeTimelines:
+    """get_visual_timelines that records each batch and can be held open."""
+
+    def __init__(self):
+        self.batches = []
+        self.cancelled = []
+        self.gate = None  # an Event to wait on before answering
+
+    async def __call__(self, track_ids, token, frame_rate, priority):
+        assert priority == BACKGROUND
+        self.batches.append((token, list(track_ids)))
+        try:
+            if self.gate:
+                await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(list(track_ids))
+            raise
+        return {track_id: b"" for track_id in track_ids}, {}
+
+
+def fake_timelines(monkeypatch):
+    fake = FakeTimelines()
+    monkeypatch.setattr(prefetch, "get_visual_timelines", fake)
+    return fake
+
+
+async def settle(prefetcher):
+    while prefetcher.stats()["queued"] or prefetcher.stats()["running"]:
+        await asyncio.sleep(0.01)
+
+
+def test_track_ids_skip_local_files_and_episodes():
+    uris = ["spotify:track:abc", "spotify:local:Artist:Album:Song:200", "spotify:episode:xyz", "spotify:track:def"]
+    assert track_ids_from_uris(uris) == ["abc", "def"]
+
+
+def test_queue_skips_duplicates_and_drops_the_oldest():
+    prefetcher = Prefetcher(max_queued=3)
+    assert prefetcher.schedule(["a", "b"], "tok", owner="u1") == 2
+    assert prefetcher.schedule(["b", "c", "d"], "tok", owner="u2") == 2
+    assert list(prefetcher._queue) == ["b", "c", "d"]  # "a" dropped; "b" was already waiting
+    assert prefetcher.cancel("u2") == 2  # "b" is still u1's
+
+
+def test_workers_warm_each_owners_tracks_in_batches(monkeypatch):
+    fake = fake_timelines(monkeypatch)
+
+    async def run():
+        prefetcher = Prefetcher(concurrency=1, batch_size=2)
+        prefetcher.start()
+        prefetcher.schedule(["a", "b", "c"], "tok1", owner="u1")
+        prefetcher.schedule(["x"], "tok2", owner="u2")
+        await settle(prefetcher)
+        await prefetcher.close()
+
+    asyncio.run(run())
+    assert fake.batches == [("tok1", ["a", "b"]), ("tok1", ["c"]), ("tok2", ["x"])]
+
+
+def test_a_new_queue_cancels_the_old_ones_work(monkeypatch):
+    fake = fake_timelines(monkeypatch)
+
+    async def run():
+        fake.gate = asyncio.Event()
+        prefetcher = Prefetcher(concurrency=1, batch_size=2)
+        prefetcher.start()
+        prefetcher.schedule(["a", "b", "c", "d"], "tok", owner="u1")
+        while not fake.batches:
+            await asyncio.sleep(0.01)
+        prefetcher.schedule(["y", "z"], "tok", owner="u1")  # replaces the queue
+        fake.gate.set()
+        await settle(prefetcher)
+        await prefetcher.close()
+
+    asyncio.run(run())
+    assert fake.cancelled == [["a", "b"]]
+    assert fake.batches == [("tok", ["a", "b"]), ("tok", ["y", "z"])]
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from queues import PlayQueue, QueueError, QueueManager, QueueStore
+
+URIS = [f"spotify:track:{n}" for n in "abcde"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return QueueStore(path=str(tmp_path / "queues.sqlite3"))
+
+
+def test_window_wraps_around():
+    queue = PlayQueue("q", URIS)
+    assert queue.window(3, 4) == URIS[3:] + URIS[:2]
+    assert queue.window(0, 10) == URIS
+    assert queue.window(7, 1) == [URIS[2]]
+    assert PlayQueue("q", []).window(0, 3) == []
+
+
+def test_update_adds_moves_and_removes():
+    queue = PlayQueue("q", URIS)
+    queue.update(add_uris=["spotify:track:z", URIS[4]], remove_uris=[URIS[0]], at_front=True)
+    assert queue.uris == ["spotify:track:z", URIS[1], URIS[2], URIS[3], URIS[4]]
+    assert queue.index_of("spotify:track:z") == 0
+    assert queue.version == 2
+    with pytest.raises(QueueError):
+        queue.index_of(URIS[0])
+
+
+def test_queues_outlive_a_restart(store, tmp_path):
+    queue = QueueManager(store=store).register(URIS)
+    restarted = QueueManager(store=QueueStore(path=str(tmp_path / "queues.sqlite3")))
+    assert restarted.get(queue.queue_id).uris == URIS
+
+
+def test_edits_in_another_process_are_seen(store):
+    ours, theirs = QueueManager(store=store), QueueManager(store=store)
+    queue = ours.register(URIS)
+    assert theirs.get(queue.queue_id).version == 1
+    ours.update(queue.queue_id, ["spotify:track:z"], [], at_front=False)
+    assert theirs.get(queue.queue_id).uris[-1] == "spotify:track:z"
+
+
+def test_reregistering_replaces_contents_and_bumps_version(store):
+    manager = QueueManager(store=store)
+    queue = manager.register(URIS)
+    replaced = manager.register(URIS[:2], queue_id=queue.queue_id)
+    assert (replaced.queue_id, replaced.version, manager.get(queue.queue_id).uris) == (queue.queue_id, 2, URIS[:2])
+
+
+def test_idle_queues_expire(store):
+    manager = QueueManager(store=store, idle_timeout=60)
+    stale = PlayQueue("stale", URIS, used_at=time.time() - 120)
+    store.put(stale)
+    manager.register(URIS)  # registering purges idle queues
+    with pytest.raises(QueueError):
+        manager.get("stale")
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+import protos.spotify_pb2 as pb2
+import sessions
+from sessions import Session, SessionError, SessionManager, SessionStore
+
+
+class FakeSpotifyAccounts:
+    """Token endpoint that rotates the refresh token on every use, like Spotify may."""
+
+    def __init__(self, refresh_token="r1", delay=0.05):
+        self.valid = refresh_token
+        self.delay = delay
+        self.calls = 0
+        self.response = None  # (status, body) to answer with instead
+
+    async def request(self, method, url, data=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        request = httpx.Request(method, url)
+        if self.response:
+            status, body = self.response
+            return httpx.Response(status, json=body, request=request)
+        if data["refresh_token"] != self.valid:
+            return httpx.Response(400, json={"error": "invalid_grant"}, request=request)
+        self.valid = f"r{self.calls + 1}"
+        return httpx.Response(200, json={"access_token": f"a{self.calls}", "refresh_token": self.valid,
+                                         "expires_in": 3600}, request=request)
+
+
+@pytest.fixture
+def accounts(monkeypatch):
+    fake = FakeSpotifyAccounts()
+    monkeypatch.setattr(sessions.scheduler, "request", fake.request)
+    return fake
+
+
+@pytest.fixture
+def managers(tmp_path):
+    """Two managers on one store and lease file, standing in for two server processes."""
+    store_path, lease_path = str(tmp_path / "sessions.sqlite3"), str(tmp_path / "leases.sqlite3")
+    return [SessionManager(store=SessionStore(path=store_path), client_id="id", client_secret="secret",
+                           lease_path=lease_path) for _ in range(2)]
+
+
+def expiring_session(manager):
+    session = Session("s1", "a0", "r1", expires_at=time.time() + 10, used_at=time.time())
+    manager.store.put(session)
+    return session
+
+
+def test_processes_refreshing_together_spend_the_refresh_token_once(accounts, managers):
+    expiring_session(managers[0])
+
+    async def main():
+        return await asyncio.gather(*(m.access_token("s1") for m in managers))
+
+    tokens = asyncio.run(main())
+    assert accounts.calls == 1
+    assert tokens == ["a1", "a1"]
+    assert managers[1].store.get("s1").refresh_token == "r2"
+
+
+def test_invalid_grant_ends_the_session(accounts, managers):
+    expiring_session(managers[0])
+    accounts.valid = "revoked"
+    with pytest.raises(SessionError):
+        asyncio.run(managers[0].refresh("s1"))
+    assert managers[0].store.get("s1") is None
+
+
+def test_other_refusals_keep_the_session(accounts, managers):
+    expiring_session(managers[0])
+    accounts.response = (400, {"error": "invalid_request"})
+    # The current token is still valid, so callers keep it
+    assert asyncio.run(managers[0].access_token("s1")) == "a0"
+    assert managers[0].store.get("s1") is not None
+
+
+def test_unknown_session(managers):
+    with pytest.raises(SessionError):
+        asyncio.run(managers[0].access_token("nope"))
+
+
+def test_sessions_outlive_the_process_that_made_them(accounts, managers):
+    session = managers[0].create({"access_token": "a0", "refresh_token": "r1", "expires_in": 3600})
+    assert session.expires_in() > 3500
+    assert asyncio.run(managers[1].access_token(session.session_id)) == "a0"
+    assert accounts.calls == 0  # fresh: no refresh
+
+
+def test_refresh_keeps_the_refresh_token_spotify_did_not_rotate(accounts, managers):
+    expiring_session(managers[0])
+    accounts.response = (200, {"access_token": "a9", "expires_in": 3600})
+    assert asyncio.run(managers[0].access_token("s1")) == "a9"
+    assert managers[0].store.get("s1").refresh_token == "r1"
+
+
+def test_expired_token_with_a_failed_refresh_is_an_error(accounts, managers):
+    session = expiring_session(managers[0])
+    session.expires_at = time.time() - 1
+    managers[0].store.put(session)
+    accounts.response = (500, {"error": "server_error"})
+    with pytest.raises(Exception, match="token refresh failed"):
+        asyncio.run(managers[0].access_token("s1"))
+
+
+def test_sweep_renews_active_sessions_and_drops_idle_ones(accounts, managers):
+    manager = managers[0]
+    expiring_session(manager)
+    manager.store.put(Session("idle", "b0", "q1", expires_at=time.time() + 10,
+                              used_at=time.time() - manager.idle_timeout - 1))
+    asyncio.run(manager._sweep())
+    assert manager.store.get("s1").access_token == "a1"
+    assert manager.store.get("idle") is None
+    assert accounts.calls == 1
+
+
+def test_exchange_code_returns_a_session(accounts, managers, monkeypatch):
+    accounts.response = (200, {"access_token": "a1", "refresh_token": "r1", "expires_in": 3600})
+    monkeypatch.setattr(main, "CLIENT_ID", "id")
+    monkeypatch.setattr(main, "CLIENT_SECRET", "secret")
+    servicer = object.__new__(main.SpotifyAuthServicer)
+    servicer.sessions = managers[0]
+
+    response = asyncio.run(servicer.ExchangeCode(pb2.AuthCodeRequest(code="code"), None))
+    assert response.success and response.session_token == "a1"
+    assert managers[1].store.get(response.session_id).refresh_token == "r1"
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import deadlines
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "features"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("track", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["features"] * 5
+    assert len(calls) == 1
+    assert (flight.started, flight.coalesced, flight.in_flight()) == (1, 4, 0)
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(flight.do("track", fail), flight.do("track", fail), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        return await flight.do("track", lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(main()) == "ok"
+    assert flight.failed == 1
+
+
+def test_one_caller_cancelling_leaves_the_others_waiting():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "features"
+
+    async def main():
+        first = asyncio.create_task(flight.do("track", fetch))
+        second = asyncio.create_task(flight.do("track", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "features"
+    assert flight.abandoned == 0
+
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    flight = SingleFlight("test")
+
+    async def main():
+        stopped = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        caller = asyncio.create_task(flight.do("track", fetch))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+        return flight.in_flight()
+
+    assert asyncio.run(main()) == 0
+    assert flight.abandoned == 1
+
+
+def test_shared_work_ignores_the_first_callers_deadline():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        return deadlines.remaining()
+
+    async def main():
+        async with deadlines.within(5):
+            return await flight.do("track", fetch)
+
+    assert asyncio.run(main()) is None
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import grpc
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import library
+import main
+import protos.spotify_pb2 as pb2
+import proxy
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code, details):
+        self._code, self._details = code, details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+
+class FakeCall:
+    """A StreamLikedTracks call that yields `pages`, then EOF or `error`."""
+
+    def __init__(self, pages, error=None):
+        self.pages, self.error = list(pages), error
+        self.cancelled = False
+
+    async def read(self):
+        if self.pages:
+            return self.pages.pop(0)
+        if self.error:
+            raise self.error
+        return grpc.aio.EOF
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def page(offset, *names):
+    out = pb2.LikedTracksPage(offset=offset, total=3)
+    for name in names:
+        out.tracks.add(name=name, uri=f"spotify:track:{name}", album=pb2.Album(name="Album"))
+    return out
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    calls = []
+
+    def install(call):
+        class Stub:
+            def StreamLikedTracks(self, request, timeout=None):
+                calls.append(request)
+                return call
+
+        monkeypatch.setattr(proxy, "grpc_stub", Stub)
+        return calls
+
+    return install
+
+
+def test_ndjson_has_one_line_per_track(stream):
+    call = FakeCall([page(0, "a", "b"), page(2, "c")])
+    stream(call)
+    response = TestClient(proxy.app).post("/tracks/liked/stream", json={"session_id": "s", "total": 0})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["name"] for line in lines] == ["a", "b", "c"]
+    assert call.cancelled  # the call is always released
+
+
+def test_failure_before_the_first_page_is_an_http_error(stream):
+    stream(FakeCall([], FakeRpcError(grpc.StatusCode.UNAUTHENTICATED, "expired")))
+    response = TestClient(proxy.app).post("/tracks/liked/stream", json={"session_id": "s"})
+    assert (response.status_code, response.json()["detail"]) == (401, "expired")
+
+
+def test_failure_mid_stream_is_the_last_line(stream):
+    stream(FakeCall([page(0, "a")], FakeRpcError(grpc.StatusCode.INTERNAL, "Spotify API error")))
+    lines = TestClient(proxy.app).post("/tracks/liked/stream", json={"session_id": "s"}).text.splitlines()
+    assert json.loads(lines[0])["name"] == "a"
+    assert json.loads(lines[-1]) == {"success": False, "error": "Spotify API error"}
+
+
+class Context:
+    def __init__(self):
+        self.code = self.details = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+
+def test_server_streams_a_page_per_message(monkeypatch):
+    async def saved_tracks(method, url, **kwargs):
+        offset = int(parse_qs(urlsplit(url).query)["offset"][0])
+        items = [{"track": {"name": str(i), "uri": f"spotify:track:{i}"}}
+                 for i in range(offset, min(offset + config.SPOTIFY_PAGE_SIZE, 120))]
+        return httpx.Response(200, json={"items": items, "total": 120}, request=httpx.Request(method, url))
+
+    monkeypatch.setattr(library.scheduler, "request", saved_tracks)
+    servicer = object.__new__(main.SpotifyAuthServicer)
+    context = Context()
+
+    async def run():
+        request = pb2.LikedTracksRequest(access_token="token", total=0)
+        return [(p.offset, p.total, len(p.tracks)) async for p in servicer.StreamLikedTracks(request, context)]
+
+    assert asyncio.run(run()) == [(0, 120, 50), (50, 120, 50), (100, 120, 20)]
+    assert context.code is None
@@ -0,0 +1,40 @@
+import numpy as np
+
+import timelines
+from timelines import CURVES, compute_timelines
+
+TRACKS = [
+    {"length": 8.0, "beats": [0.5, 1.0, 1.5, 2.0], "energy": 0.5},
+    {"length": 2.0, "beats": [0.25, 0.75, 1.25], "energy": 1.0},
+    {"length": 0.0, "beats": [0.5, 1.0, 1.5]},  # length from the beats
+    {"length": 4.0, "beats": []},
+]
+
+
+def test_curves_follow_the_beats():
+    pulse_track = compute_timelines(TRACKS, frame_rate=4.0)[0]
+    assert pulse_track["frames"] == 32
+    assert pulse_track["pulse"][2] == 1.0  # frame at 0.5s is on a beat
+    assert pulse_track["tempo"][3] == 120.0
+    assert pulse_track["phase"][3] == 0.5
+    assert all(pulse_track[name].dtype == np.dtype("<f4") for name in CURVES)
+
+
+def test_groups_match_a_single_pass_in_input_order(monkeypatch):
+    whole = compute_timelines(TRACKS, frame_rate=10.0, max_cells=10**9)
+
+    grids = []
+    compute_group = timelines._compute_group
+    monkeypatch.setattr(timelines, "_compute_group",
+                        lambda tracks, *args: grids.append(len(tracks)) or compute_group(tracks, *args))
+    grouped = compute_timelines(TRACKS, frame_rate=10.0, max_cells=60)
+
+    assert len(grids) > 1
+    assert [t["frames"] for t in grouped] == [80, 20, 20, 40]
+    for a, b in zip(whole, grouped):
+        for name in CURVES:
+            np.testing.assert_allclose(a[name], b[name], atol=1e-6)
+
+
+def test_no_tracks():
+    assert compute_timelines([], frame_rate=30.0) == []
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import grpc
+import pytest
+from fastapi.testclient import TestClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import protos.spotify_pb2 as pb2
+import proxy
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Spans recorded by a private provider, swapped in for tracing's tracer."""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def test_proxy_span_continues_the_callers_trace(spans, monkeypatch):
+    class Stub:
+        async def GetLikedTracks(self, request, timeout=None):
+            return pb2.LikedTracksResponse(success=True, sync_token="u:1")
+
+    monkeypatch.setattr(proxy, "grpc_stub", Stub)
+    TestClient(proxy.app).post("/tracks/liked", json={"session_id": "s"}, headers={"traceparent": TRACEPARENT})
+
+    (span,) = spans.get_finished_spans()
+    assert span.name == "POST /tracks/liked"
+    assert format(span.context.trace_id, "032x") == TRACE_ID
+    assert span.attributes["http.status_code"] == 200
+
+
+def test_grpc_metadata_carries_the_current_span(spans):
+    details = grpc.aio.ClientCallDetails("/spotify.SpotifyAuth/GetLikedTracks", 5.0, None, None, None)
+    with tracing.tracer.start_as_current_span("outer") as span:
+        metadata = dict(tracing._with_trace_metadata(details).metadata)
+    assert metadata["traceparent"].split("-")[2] == format(span.context.span_id, "016x")
+
+
+def test_server_span_is_a_child_of_the_callers(spans):
+    class Context:
+        def code(self):
+            return grpc.StatusCode.INTERNAL
+
+    async def servicer(request, context):
+        return request
+
+    async def continuation(details):
+        return grpc.unary_unary_rpc_method_handler(servicer)
+
+    async def run():
+        details = SimpleNamespace(method="/spotify.SpotifyAuth/GetLikedTracks",
+                                  invocation_metadata=(("traceparent", TRACEPARENT),))
+        handler = await tracing.ServerTracingInterceptor().intercept_service(continuation, details)
+        return await handler.unary_unary("ping", Context())
+
+    assert asyncio.run(run()) == "ping"
+    (span,) = spans.get_finished_spans()
+    assert span.name == "rpc GetLikedTracks" and span.kind == trace.SpanKind.SERVER
+    assert format(span.parent.span_id, "016x") == "00f067aa0ba902b7"
+    assert span.status.status_code == trace.StatusCode.ERROR
+
+
+def test_waterfall_nests_children_under_parents():
+    spans = [
+        {"trace_id": TRACE_ID, "span_id": "a", "parent_id": None, "name": "POST /tracks/liked",
+         "service": "proxy", "start_ns": 0, "end_ns": 10_000_000, "status": "UNSET"},
+        {"trace_id": TRACE_ID, "span_id": "b", "parent_id": "a", "name": "rpc GetLikedTracks",
+         "service": "grpc-server", "start_ns": 1_000_000, "end_ns": 9_000_000, "status": "ERROR"},
+    ]
+    lines = tracing.waterfall(spans).splitlines()
+    assert lines[0] == f"trace {TRACE_ID}  10.0 ms"
+    assert lines[1].startswith("POST /tracks/liked [proxy]")
+    assert lines[2].startswith("  rpc GetLikedTracks [grpc-server]") and lines[2].endswith("8.0 ms !")
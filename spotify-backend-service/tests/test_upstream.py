@@ -0,0 +1,166 @@
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+
+import deadlines
+from upstream import HostLimiter, SharedTokenBucket, TokenBucket, UpstreamScheduler
+
+
+def test_shared_bucket_is_one_budget_across_processes(tmp_path):
+    # Two buckets on one store stand in for two worker processes
+    path = str(tmp_path / "buckets.sqlite3")
+    a = SharedTokenBucket("musicbrainz.org", rate=1.0, burst=1.0, path=path)
+    b = SharedTokenBucket("musicbrainz.org", rate=1.0, burst=1.0, path=path)
+    assert a.reserve() == 0.0
+    assert b.reserve() == pytest.approx(1.0, abs=0.05)
+    assert a.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_shared_bucket_hosts_are_separate(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    assert SharedTokenBucket("musicbrainz.org", rate=1.0, burst=1.0, path=path).reserve() == 0.0
+    assert SharedTokenBucket("api.spotify.com", rate=1.0, burst=1.0, path=path).reserve() == 0.0
+
+
+def test_shared_pause_applies_to_every_process(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    a = SharedTokenBucket("musicbrainz.org", rate=100.0, burst=10.0, path=path)
+    b = SharedTokenBucket("musicbrainz.org", rate=100.0, burst=10.0, path=path)
+    a.pause(5.0)
+    assert b.reserve() == pytest.approx(5.0, abs=0.1)
+
+
+def test_local_bucket_bursts_then_paces():
+    bucket = TokenBucket(rate=10.0, burst=2.0)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+class FakeClient:
+    """Plays back a script of responses (status codes) and exceptions, recording each call."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, kwargs.get("timeout")))
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, request=httpx.Request(method, url))
+
+
+def scheduler(concurrency=8):
+    sched = UpstreamScheduler(max_retries=2, backoff_base=0.0)
+    sched._limiters["api.test"] = HostLimiter("api.test", rate=1000.0, burst=1000.0, concurrency=concurrency,
+                                              shared=False)
+    return sched
+
+
+def send(sched, client, method="GET"):
+    return asyncio.run(sched.request(method, "https://api.test/v1/x", client=client))
+
+
+def test_limit_halves_on_throttle_and_creeps_back():
+    limiter = HostLimiter("api.test", rate=1.0, burst=1.0, concurrency=8, shared=False)
+    limiter.record(throttled=True)
+    assert limiter.limit == 4.0
+    limiter.record(throttled=True)
+    limiter.record(throttled=True)
+    limiter.record(throttled=True)
+    assert limiter.limit == 1.0  # never below one
+    limiter.record(throttled=False)
+    assert limiter.limit == 2.0
+    for _ in range(100):
+        limiter.record(throttled=False)
+    assert limiter.limit == 8.0  # never above the configured concurrency
+
+
+def test_throttling_status_is_retried_and_cuts_the_limit():
+    sched, client = scheduler(), FakeClient(503, 200)
+    assert send(sched, client).status_code == 200
+    assert len(client.calls) == 2
+    assert sched.limiter("api.test").limit == pytest.approx(4.25)
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_gateway_errors_are_retried_without_cutting_the_limit(status):
+    sched, client = scheduler(), FakeClient(status, 200)
+    assert send(sched, client).status_code == 200
+    assert len(client.calls) == 2
+    assert sched.limiter("api.test").limit == 8.0
+
+
+def test_connection_errors_are_retried_without_cutting_the_limit():
+    sched, client = scheduler(), FakeClient(httpx.ConnectError("refused"), 200)
+    assert send(sched, client, method="POST").status_code == 200
+    assert len(client.calls) == 2
+    assert sched.limiter("api.test").limit == 8.0
+
+
+def test_connection_retries_are_bounded():
+    sched, client = scheduler(), FakeClient(*[httpx.ConnectError("refused")] * 3)
+    with pytest.raises(httpx.ConnectError):
+        send(sched, client)
+    assert len(client.calls) == 3
+    assert sched.limiter("api.test").in_flight == 0
+
+
+def test_failures_after_sending_are_retried_only_for_idempotent_methods():
+    sched, client = scheduler(), FakeClient(httpx.ReadError("reset"), 200)
+    assert send(sched, client, method="GET").status_code == 200
+    sched, client = scheduler(), FakeClient(httpx.ReadError("reset"), 200)
+    with pytest.raises(httpx.ReadError):
+        send(sched, client, method="POST")
+    assert len(client.calls) == 1
+
+
+def test_timeouts_shrink_to_the_deadline():
+    sched, client = scheduler(), FakeClient(200)
+
+    async def call():
+        async with deadlines.within(0.5):
+            return await sched.request("GET", "https://api.test/v1/x", client=client)
+
+    asyncio.run(call())
+    timeout = client.calls[0][1]
+    assert 0 < timeout.read <= 0.5 and 0 < timeout.connect <= 0.5
+
+
+def test_no_time_left_raises_before_sending(monkeypatch):
+    sched, client = scheduler(), FakeClient(200)
+    monkeypatch.setattr(deadlines, "remaining", lambda: -0.1)
+    with pytest.raises(TimeoutError):
+        send(sched, client)
+    assert client.calls == []
+    assert sched.limiter("api.test").in_flight == 0
+
+
+def test_shared_bucket_waits_for_a_locked_store_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    bucket = SharedTokenBucket("musicbrainz.org", rate=1.0, burst=1.0, path=path)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        reservation = asyncio.create_task(bucket.areserve())
+        await asyncio.sleep(0.2)
+        other.execute("COMMIT")
+        await reservation
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) > 5
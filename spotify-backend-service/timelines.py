@@ -0,0 +1,215 @@
+import asyncio
+import math
+
+import numpy as np
+
+import config
+from feature_cache import get_feature_cache
+from local_features import cached_features, local_key
+from upstream import BACKGROUND
+from utils import analyse_failed_locally, fetch_ab_features_many, resolve_mbids
+
+# Bump whenever compute_timelines changes so stale cached timelines are ignored
+TIMELINE_VERSION = 1
+
+# Curves in every timeline, in the order they are packed into cache blobs
+CURVES = ("pulse", "phase", "tempo", "density", "energy")
+
+_MAX_SECONDS = 3600.0
+
+
+def track_length(features: dict) -> float:
+    """Track duration in seconds, falling back to just past the last beat."""
+    length = float(features.get("length") or 0.0)
+    beats = features.get("beats") or []
+    if length <= 0 and beats:
+        gap = beats[-1] - beats[-2] if len(beats) > 1 else 0.5
+        length = beats[-1] + gap
+    return min(length, _MAX_SECONDS)
+
+
+def compute_timelines(tracks: list[dict], frame_rate: float,
+                      pulse_decay: float = config.TIMELINE_PULSE_DECAY,
+                      density_window: float = config.TIMELINE_DENSITY_WINDOW,
+                      max_cells: int = config.TIMELINE_MAX_GRID_CELLS) -> list[dict]:
+    """Fixed-rate animation curves for a batch of tracks in vectorized passes.
+
+    Every track's beat positions are shifted onto its own stretch of one
+    sorted axis, so a single searchsorted call over a padded
+    (tracks x frames) grid finds the surrounding beats for every frame of
+    every track. Tracks are grouped by length, a pass per group, so short
+    tracks aren't padded to the longest one and no grid exceeds `max_cells`
+    (except a single track longer than that). Returns, per track in input
+    order, float32 arrays of `frames` samples:
+
+    pulse    1 on each beat, decaying exponentially until the next
+    phase    position between the surrounding beats, 0 -> 1
+    tempo    local tempo in BPM from the current beat interval
+    density  beats per second around the frame, scaled to 0..1 per track
+    energy   the track's energy metric weighted by density
+    """
+    frames = [math.ceil(track_length(f) * frame_rate) for f in tracks]
+    out = [None] * len(tracks)
+    group = []
+
+    def flush():
+        for i, timeline in zip(group, _compute_group([tracks[i] for i in group], frame_rate,
+                                                     pulse_decay, density_window)):
+            out[i] = timeline
+        group.clear()
+
+    # Shortest first, so each track added is its group's widest row
+    for i in sorted(range(len(tracks)), key=frames.__getitem__):
+        if group and (len(group) + 1) * frames[i] > max_cells:
+            flush()
+        group.append(i)
+    if group:
+        flush()
+    return out
+
+
+def _compute_group(tracks: list[dict], frame_rate: float, pulse_decay: float, density_window: float) -> list[dict]:
+    # Positions in time stay float64 (the shared axis runs to tracks x span
+    # seconds); the curve grids are float32, the precision they are sent at
+    lengths = np.array([track_length(f) for f in tracks])
+    frames = np.ceil(lengths * frame_rate).astype(np.int64)
+    beats = [np.asarray(f.get("beats") or [], dtype=np.float64) for f in tracks]
+    counts = np.array([len(b) for b in beats])
+    starts = np.cumsum(counts) - counts
+    energy = np.array([float(f.get("energy", 0.0)) for f in tracks], dtype=np.float32)
+
+    # Rows are spaced further apart than any beat, frame or density window can reach
+    span = max(lengths.max(), max((b[-1] for b in beats if len(b)), default=0.0)) + density_window + 1.0
+    offsets = np.arange(len(tracks)) * span
+    axis = np.concatenate([b + off for b, off in zip(beats, offsets)] + [np.empty(0)])
+
+    t = np.arange(frames.max()) / frame_rate
+    valid = t[None, :] < lengths[:, None]
+    ft = t[None, :] + offsets[:, None]
+    pulse = np.zeros(ft.shape, dtype=np.float32)
+    phase = np.zeros(ft.shape, dtype=np.float32)
+    tempo = np.zeros(ft.shape, dtype=np.float32)
+    density = np.zeros(ft.shape, dtype=np.float32)
+
+    if len(axis):
+        last = len(axis) - 1
+        prev = np.searchsorted(axis, ft, side="right") - 1
+        has_prev = prev >= starts[:, None]
+        since = ft - axis[np.clip(prev, 0, last)]
+        pulse = np.where(has_prev, np.exp(-np.maximum(since, 0.0) / pulse_decay), 0.0).astype(np.float32)
+        del since
+
+        # Interval around each frame; the first/last interval extends past the ends
+        ends = (starts + counts)[:, None]
+        lo = np.clip(prev, starts[:, None], ends - 2)
+        gridded = (counts >= 2)[:, None] & np.ones(ft.shape, dtype=bool)
+        lo = np.where(gridded, lo, 0)
+        interval = axis[np.clip(lo + 1, 0, last)] - axis[lo]
+        ok = gridded & (interval > 0)
+        safe = np.where(ok, interval, 1.0)
+        phase = np.where(ok, np.mod((ft - axis[lo]) / safe, 1.0), 0.0).astype(np.float32)
+        tempo = np.where(ok, 60.0 / safe, 0.0).astype(np.float32)
+        del lo, interval, ok, safe
+
+        half = density_window / 2
+        count = (np.searchsorted(axis, ft + half, side="right")
+                 - np.searchsorted(axis, ft - half, side="left"))
+        density = (count / density_window).astype(np.float32)
+
+    density = np.where(valid, density, np.float32(0.0))
+    peak = density.max(axis=1, keepdims=True, initial=0.0)
+    density = np.divide(density, peak, out=np.zeros_like(density), where=peak > 0)
+    curves = {
+        "pulse": pulse,
+        "phase": phase,
+        "tempo": tempo,
+        "density": density,
+        "energy": energy[:, None] * density,
+    }
+
+    out = []
+    for row, n in enumerate(frames):
+        timeline = {name: np.ascontiguousarray(curve[row, :n], dtype="<f4") for name, curve in curves.items()}
+        timeline["frames"] = int(n)
+        out.append(timeline)
+    return out
+
+
+def pack_timeline(timeline: dict) -> bytes:
+    return b"".join(timeline[name].tobytes() for name in CURVES)
+
+
+def unpack_timeline(blob: bytes) -> dict:
+    values = np.frombuffer(blob, dtype="<f4")
+    frames = len(values) // len(CURVES)
+    timeline = {name: values[i * frames:(i + 1) * frames] for i, name in enumerate(CURVES)}
+    timeline["frames"] = frames
+    return timeline
+
+
+def timeline_key(mbid: str, frame_rate: float) -> str:
+    return f"v{TIMELINE_VERSION}:{mbid}:{frame_rate:g}"
+
+
+def clamp_frame_rate(frame_rate: float) -> float:
+    if not frame_rate or math.isnan(frame_rate) or frame_rate <= 0:
+        return config.TIMELINE_FRAME_RATE
+    return min(float(frame_rate), config.TIMELINE_MAX_FRAME_RATE)
+
+
+async def get_visual_timelines(track_ids: list[str], access_token: str, frame_rate: float,
+                               priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Timelines for many Spotify tracks, as (timelines, errors) keyed by track id.
+
+    Cached timelines are served as-is; the rest are computed together in one
+    compute_timelines call off the event loop and cached by MBID, or by
+    track for tracks whose features were computed locally.
+    """
+    cache = get_feature_cache()
+    local, pending = await cached_features(track_ids)
+    track_mbids, errors = await resolve_mbids(pending, access_token, priority)
+
+    mbids = list(dict.fromkeys(track_mbids.values()))
+    blobs = await cache.get_many("timelines", [timeline_key(mbid, frame_rate) for mbid in mbids])
+    by_mbid, missing = {}, []
+    for mbid in mbids:
+        blob = blobs.get(timeline_key(mbid, frame_rate))
+        if blob is not None:
+            by_mbid[mbid] = unpack_timeline(blob)
+        else:
+            missing.append(mbid)
+
+    fetched = await fetch_ab_features_many(missing, priority)
+    for track_id, mbid in track_mbids.items():
+        if mbid in missing and isinstance(fetched[mbid], Exception):
+            errors[track_id] = fetched[mbid]
+    analysed, errors = await analyse_failed_locally(errors, access_token, priority)
+    local.update(analysed)
+
+    # Everything left to compute, keyed as its timeline is cached
+    todo = {timeline_key(mbid, frame_rate): fetched[mbid]
+            for mbid in missing if not isinstance(fetched[mbid], Exception)}
+    local_timelines = {}
+    blobs = await cache.get_many("timelines", [timeline_key(local_key(track_id), frame_rate) for track_id in local])
+    for track_id, features in local.items():
+        key = timeline_key(local_key(track_id), frame_rate)
+        blob = blobs.get(key)
+        if blob is not None:
+            local_timelines[track_id] = unpack_timeline(blob)
+        else:
+            todo[key] = features
+
+    computed = await asyncio.to_thread(compute_timelines, list(todo.values()), frame_rate)
+    by_key = dict(zip(todo, computed))
+    for key, timeline in by_key.items():
+        cache.put_timeline(key, pack_timeline(timeline))
+
+    results = {}
+    for track_id, mbid in track_mbids.items():
+        if mbid in by_mbid:
+            results[track_id] = by_mbid[mbid]
+        elif track_id not in errors and track_id not in local:
+            results[track_id] = by_key[timeline_key(mbid, frame_rate)]
+    for track_id in local:
+        results[track_id] = local_timelines.get(track_id) or by_key[timeline_key(local_key(track_id), frame_rate)]
+    return results, errors
@@ -0,0 +1,296 @@
+"""Request tracing across the proxy, the gRPC server and upstream calls.
+
+The proxy opens a span per HTTP request, the trace context rides to the gRPC
+server in W3C `traceparent` metadata, and every upstream call becomes a child
+span, so one slow request reads as a waterfall of stages:
+
+    python tracing.py traces.jsonl --slowest 5
+    python tracing.py traces.jsonl --trace 4bf92f3577b34da6a3ce929d0e0e4736
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+import grpc
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, SimpleSpanProcessor, SpanExporter, SpanExportResult,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+import config
+
+# Spans are no-ops until setup() installs a provider
+tracer = trace.get_tracer("idle-annie")
+memory_exporter: InMemorySpanExporter | None = None
+
+
+def span_record(span) -> dict:
+    """Flatten a finished span into the JSON shape the file exporter writes."""
+    parent = span.parent
+    return {
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(parent.span_id, "016x") if parent else None,
+        "name": span.name,
+        "service": span.resource.attributes.get("service.name", ""),
+        "kind": span.kind.name,
+        "start_ns": span.start_time,
+        "end_ns": span.end_time,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends one JSON line per span; both processes can share one file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        lines = "".join(json.dumps(span_record(span)) + "\n" for span in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def setup(service_name: str, exporter: str = config.TRACING_EXPORTER,
+          sample_ratio: float = config.TRACING_SAMPLE_RATIO, path: str = config.TRACING_FILE) -> None:
+    """Install a tracer provider for this process.
+
+    Root spans are kept with probability `sample_ratio`; child spans (and the
+    gRPC server's spans) follow their parent's decision, so a trace is either
+    recorded end to end or not at all.
+    """
+    global memory_exporter
+    if exporter == "none":
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    if exporter == "file":
+        provider.add_span_processor(BatchSpanProcessor(JsonlSpanExporter(path)))
+    elif exporter == "memory":
+        memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER {exporter!r}; expected none, file or memory")
+    trace.set_tracer_provider(provider)
+
+
+def shutdown() -> None:
+    """Flush buffered spans; call before the process exits."""
+    provider = trace.get_tracer_provider()
+    if isinstance(provider, TracerProvider):
+        provider.shutdown()
+
+
+def _error(span, message: str) -> None:
+    span.set_status(Status(StatusCode.ERROR, message))
+
+
+# ── Proxy ────────────────────────────────────────────────────────────────────
+
+class HTTPTracingMiddleware:
+    """ASGI middleware opening a server span per request, named by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        with tracer.start_as_current_span(
+            scope["path"], context=propagate.extract(headers), kind=SpanKind.SERVER,
+        ) as span:
+            status = 500
+
+            async def send_wrapper(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                span.update_name(f"{scope['method']} {route}")
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status)
+                if status >= 500:
+                    _error(span, f"HTTP {status}")
+
+
+def _with_trace_metadata(details: grpc.aio.ClientCallDetails) -> grpc.aio.ClientCallDetails:
+    carrier = {}
+    propagate.inject(carrier)
+    metadata = grpc.aio.Metadata(*(details.metadata or ()), *carrier.items())
+    return grpc.aio.ClientCallDetails(
+        details.method, details.timeout, metadata, details.credentials, details.wait_for_ready
+    )
+
+
+def _method_name(details) -> str:
+    method = details.method.decode() if isinstance(details.method, bytes) else details.method
+    return method.rsplit("/", 1)[-1]
+
+
+class UnaryUnaryTracingInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        with tracer.start_as_current_span(
+            f"grpc {_method_name(client_call_details)}", kind=SpanKind.CLIENT
+        ) as span:
+            call = await continuation(_with_trace_metadata(client_call_details), request)
+            try:
+                return await call
+            except grpc.RpcError as e:
+                _error(span, e.code().name)
+                raise
+
+
+class UnaryStreamTracingInterceptor(grpc.aio.UnaryStreamClientInterceptor):
+    """Hands the call straight back so callers keep read()/cancel(); the span
+    ends when the stream does."""
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        span = tracer.start_span(f"grpc {_method_name(client_call_details)}", kind=SpanKind.CLIENT)
+        with trace.use_span(span, end_on_exit=False):
+            call = await continuation(_with_trace_metadata(client_call_details), request)
+
+        async def finish(ended_ns):
+            code = await call.code()
+            if code != grpc.StatusCode.OK:
+                _error(span, code.name)
+            span.end(end_time=ended_ns)
+
+        call.add_done_callback(lambda _: asyncio.ensure_future(finish(time.time_ns())))
+        return call
+
+
+def client_interceptors() -> list:
+    return [UnaryUnaryTracingInterceptor(), UnaryStreamTracingInterceptor()]
+
+
+# ── gRPC server ──────────────────────────────────────────────────────────────
+
+class ServerTracingInterceptor(grpc.aio.ServerInterceptor):
+    """Continues the caller's trace around every unary and server-streaming RPC."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        name = f"rpc {handler_call_details.method.rsplit('/', 1)[-1]}"
+        parent = propagate.extract(dict(handler_call_details.invocation_metadata or ()))
+
+        if handler.unary_unary:
+            inner = handler.unary_unary
+
+            async def unary_unary(request, context):
+                with tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER) as span:
+                    response = await inner(request, context)
+                    if context.code() not in (None, grpc.StatusCode.OK):
+                        _error(span, context.code().name)
+                    return response
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary, handler.request_deserializer, handler.response_serializer
+            )
+
+        if handler.unary_stream:
+            inner = handler.unary_stream
+
+            async def unary_stream(request, context):
+                with tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER) as span:
+                    pages = 0
+                    async for response in inner(request, context):
+                        pages += 1
+                        yield response
+                    span.set_attribute("rpc.messages_sent", pages)
+                    if context.code() not in (None, grpc.StatusCode.OK):
+                        _error(span, context.code().name)
+
+            return grpc.unary_stream_rpc_method_handler(
+                unary_stream, handler.request_deserializer, handler.response_serializer
+            )
+
+        return handler
+
+
+# ── Waterfall ────────────────────────────────────────────────────────────────
+
+def load_spans(path: str) -> dict:
+    """Spans from a JSONL file grouped by trace id."""
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                traces[record["trace_id"]].append(record)
+    return traces
+
+
+def waterfall(spans: list, width: int = 48) -> str:
+    """Render one trace as an indented timeline, children under their parents."""
+    start = min(s["start_ns"] for s in spans)
+    end = max(s["end_ns"] for s in spans)
+    total = max(end - start, 1)
+    ids = {s["span_id"] for s in spans}
+    children = defaultdict(list)
+    for s in spans:
+        children[s["parent_id"] if s["parent_id"] in ids else None].append(s)
+
+    lines = [f"trace {spans[0]['trace_id']}  {total / 1e6:.1f} ms"]
+
+    def walk(parent_id, depth):
+        for s in sorted(children[parent_id], key=lambda s: s["start_ns"]):
+            offset = int((s["start_ns"] - start) / total * width)
+            length = max(1, int((s["end_ns"] - s["start_ns"]) / total * width))
+            bar = " " * offset + "█" * min(length, width - offset)
+            label = f"{'  ' * depth}{s['name']} [{s['service']}]"
+            flag = " !" if s["status"] == "ERROR" else ""
+            lines.append(f"{label:<52.52} {bar:<{width}} {(s['end_ns'] - s['start_ns']) / 1e6:9.1f} ms{flag}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print latency waterfalls from a trace file.")
+    parser.add_argument("path", nargs="?", default=config.TRACING_FILE)
+    parser.add_argument("--trace", help="trace id to show")
+    parser.add_argument("--slowest", type=int, default=3, help="show the N slowest traces")
+    args = parser.parse_args()
+
+    traces = load_spans(args.path)
+    if args.trace:
+        selected = [traces[args.trace]] if args.trace in traces else []
+    else:
+        def duration(spans):
+            return max(s["end_ns"] for s in spans) - min(s["start_ns"] for s in spans)
+        selected = sorted(traces.values(), key=duration, reverse=True)[:args.slowest]
+    if not selected:
+        raise SystemExit("no matching traces")
+    print("\n\n".join(waterfall(spans) for spans in selected))
+
+
+if __name__ == "__main__":
+    main()
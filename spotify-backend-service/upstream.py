@@ -0,0 +1,391 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+from opentelemetry.trace import SpanKind
+
+import config
+import deadlines
+import metrics
+from http_pool import async_clients
+from tracing import tracer
+
+# Priority lanes: lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Statuses that mean "slow down / try again" rather than "this request is wrong"
+RETRY_STATUSES = {429, 502, 503, 504}
+# Of those, the ones where the host itself asks for less traffic; only these cut the concurrency limit
+THROTTLE_STATUSES = {429, 503}
+# Methods safe to resend after a failure that may have reached the host
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def retry_after_seconds(headers) -> float | None:
+    """Parse a Retry-After header given as delta-seconds or an HTTP date."""
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    reserve() always takes a token (going into debt if needed) and returns how
+    long the caller must sleep before using it. It is thread-safe, so callers
+    on different event loops can share one bucket per host. Code on an event
+    loop uses areserve()/apause(), which a bucket backed by storage runs off
+    the loop.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every new reservation back for `seconds` (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def areserve(self) -> float:
+        return self.reserve()
+
+    async def apause(self, seconds: float) -> None:
+        self.pause(seconds)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose tokens live in SQLite, shared by every process using `path`.
+
+    Prefork workers and the proxy each send to the same hosts, so per-process
+    buckets would multiply the configured rate by the number of processes.
+    Each reservation and pause is a single UPSERT, so concurrent processes
+    never hand out the same token. If the store can't be reached, the
+    bucket falls back to pacing this process alone rather than failing.
+    The async methods run the statements on a worker thread, so another
+    process holding the database's write lock never stalls the event loop.
+    """
+
+    def __init__(self, host: str, rate: float, burst: float, path: str = config.UPSTREAM_BUCKET_STORE_PATH):
+        super().__init__(rate, burst)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.host = host
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, paused_until REAL NOT NULL)"
+        )
+
+    def reserve(self) -> float:
+        now = time.time()
+        try:
+            with self._lock:
+                tokens, paused_until = self._db.execute(
+                    "INSERT INTO rate_buckets (host, tokens, updated_at, paused_until) VALUES (:host, :burst - 1, :now, 0) "
+                    "ON CONFLICT (host) DO UPDATE SET "
+                    "tokens = min(:burst, tokens + max(0, :now - updated_at) * :rate) - 1, "
+                    "updated_at = max(updated_at, :now) "
+                    "RETURNING tokens, paused_until",
+                    {"host": self.host, "burst": self.burst, "rate": self.rate, "now": now},
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Shared rate limit for {self.host} unavailable ({e}); pacing this process alone")
+            return super().reserve()
+        delay = -tokens / self.rate if tokens < 0 else 0.0
+        return max(delay, paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT INTO rate_buckets (host, tokens, updated_at, paused_until) VALUES (:host, :burst, :now, :until) "
+                    "ON CONFLICT (host) DO UPDATE SET paused_until = max(paused_until, :until)",
+                    {"host": self.host, "burst": self.burst, "now": now, "until": now + seconds},
+                )
+        except sqlite3.Error:
+            super().pause(seconds)
+
+    async def areserve(self) -> float:
+        return await asyncio.to_thread(self.reserve)
+
+    async def apause(self, seconds: float) -> None:
+        await asyncio.to_thread(self.pause, seconds)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "cancelled")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class HostLimiter:
+    """Per-host pacing: a token bucket plus a priority-ordered concurrency gate.
+
+    The concurrency limit adapts AIMD-style: it creeps up by 1/limit on every
+    successful call and halves when the host throttles us, so a struggling
+    host sees fewer parallel requests instead of an error storm. The bucket
+    is shared across processes (SharedTokenBucket) unless `shared` is off;
+    the concurrency gate is per process.
+    """
+
+    def __init__(self, host: str, rate: float, burst: float, concurrency: int,
+                 shared: bool = config.UPSTREAM_SHARED_RATE_LIMITS):
+        self.host = host
+        self.bucket = SharedTokenBucket(host, rate, burst) if shared else TokenBucket(rate, burst)
+        self.max_concurrency = max(1, concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._waiters = []  # heap of (priority, seq, _Waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # ── concurrency gate ────────────────────────────────────────────────────
+    async def acquire(self, priority: int) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(priority, wake)
+        if waiter is None:
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._grant_locked()
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(not w.cancelled for _, _, w in self._waiters)
+
+    def _enqueue(self, priority, wake):
+        """Take a slot immediately (returns None) or queue a waiter for one."""
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return None
+            waiter = _Waiter(wake)
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            return waiter
+
+    def _grant_locked(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+    # ── adaptive limit ──────────────────────────────────────────────────────
+    def record(self, throttled: bool) -> None:
+        with self._lock:
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                self._grant_locked()
+
+
+class UpstreamScheduler:
+    """Shared outbound request scheduler for every upstream host.
+
+    Each call waits for a concurrency slot (interactive before background),
+    then for a token from the host's bucket, then sends. Throttling responses
+    are retried with Retry-After when the host gives one, otherwise with
+    jittered exponential backoff, and a Retry-After also pauses the whole host.
+    Only 429 and 503 cut the host's concurrency limit. Connection failures are
+    retried with the same backoff (any transport failure, for idempotent
+    methods). Under a request deadline (see deadlines.py) each attempt's
+    timeouts shrink to the time left, a retry that could not finish in time
+    is skipped, and an attempt with no time left raises TimeoutError unsent.
+    """
+
+    def __init__(self, host_limits: dict = config.UPSTREAM_HOST_LIMITS,
+                 max_retries: int = config.UPSTREAM_MAX_RETRIES,
+                 backoff_base: float = config.UPSTREAM_BACKOFF_BASE,
+                 backoff_max: float = config.UPSTREAM_BACKOFF_MAX):
+        self.host_limits = host_limits
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, host: str) -> HostLimiter:
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limits = self.host_limits.get(host, self.host_limits["default"])
+                limiter = HostLimiter(host, limits["rate"], limits["burst"], limits["concurrency"])
+                self._limiters[host] = limiter
+            return limiter
+
+    async def request(self, method: str, url: str, *, priority: int = INTERACTIVE,
+                      max_retries: int | None = None, client=None, stream: bool = False, **kwargs):
+        """Send `client.request(method, url, **kwargs)` under the host's limits.
+
+        `client` defaults to the pooled httpx.AsyncClient for the URL's host.
+        With `stream=True` only the headers have been read when this returns;
+        the caller reads the body and must `aclose()` the response.
+        """
+        client = client or async_clients.for_url(url)
+        parts = urlsplit(url)
+        limiter = self.limiter(parts.netloc)
+        retries = self.max_retries if max_retries is None else max_retries
+        with tracer.start_as_current_span(f"{method} {limiter.host}", kind=SpanKind.CLIENT) as span:
+            span.set_attribute("http.url", f"{parts.scheme}://{parts.netloc}{parts.path}")
+            span.set_attribute("upstream.priority", priority)
+            for attempt in range(retries + 1):
+                queued_at = time.perf_counter()
+                with tracer.start_as_current_span("wait"):
+                    await self._take_slot(limiter, priority)
+                sent_at = time.perf_counter()
+                metrics.UPSTREAM_WAIT.labels(limiter.host).observe(sent_at - queued_at)
+                left = deadlines.remaining()
+                if left is not None:
+                    if left <= 0:
+                        limiter.release()
+                        raise TimeoutError(f"Deadline passed before calling {limiter.host}")
+                    kwargs["timeout"] = httpx.Timeout(
+                        min(config.UPSTREAM_READ_TIMEOUT, left), connect=min(config.UPSTREAM_CONNECT_TIMEOUT, left)
+                    )
+                response = None
+                try:
+                    with tracer.start_as_current_span("send") as send_span:
+                        if stream:
+                            response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+                        else:
+                            response = await client.request(method, url, **kwargs)
+                        send_span.set_attribute("http.status_code", response.status_code)
+                except Exception as e:
+                    metrics.UPSTREAM_LATENCY.labels(limiter.host, "error").observe(time.perf_counter() - sent_at)
+                    delay = self._after_error(limiter, method, e, attempt, retries)
+                    if delay is None:
+                        raise
+                finally:
+                    limiter.release()
+
+                if response is not None:
+                    metrics.observe_upstream(limiter.host, response, time.perf_counter() - sent_at, stream)
+                    span.set_attribute("http.status_code", response.status_code)
+                    span.set_attribute("upstream.attempts", attempt + 1)
+                    delay = await self._after_response(limiter, response, attempt, retries)
+                    if delay is None:
+                        return response
+                    if stream:
+                        await response.aclose()
+                with tracer.start_as_current_span("backoff"):
+                    await asyncio.sleep(delay)
+            return response
+
+    async def _take_slot(self, limiter: HostLimiter, priority: int) -> None:
+        """Wait for a concurrency slot, then for a token; the caller must release() the slot."""
+        await limiter.acquire(priority)
+        try:
+            await asyncio.sleep(await limiter.bucket.areserve())
+        except BaseException:
+            limiter.release()
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {
+            l.host: {"in_flight": l.in_flight, "queued": l.queued(), "limit": round(l.limit, 2)}
+            for l in limiters
+        }
+
+    async def _after_response(self, limiter, response, attempt, retries):
+        """Update the limiter and return a retry delay, or None to hand the response back."""
+        limiter.record(response.status_code in THROTTLE_STATUSES)
+        if response.status_code not in RETRY_STATUSES or attempt >= retries:
+            return None
+
+        retry_after = retry_after_seconds(response.headers)
+        if retry_after is not None:
+            await limiter.bucket.apause(retry_after)
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            delay = self._backoff(attempt)
+        return self._retry(limiter, f"returned {response.status_code}", str(response.status_code),
+                           delay, attempt, retries)
+
+    def _after_error(self, limiter, method, error, attempt, retries):
+        """Return a retry delay for a failed send, or None to raise the error.
+
+        A failure says nothing about the host's capacity, so the limiter is
+        left alone. Errors before the request reached the host are retried
+        for any method; other transport errors only for idempotent ones.
+        """
+        if attempt >= retries or not isinstance(error, httpx.TransportError):
+            return None
+        unsent = isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+        resendable = isinstance(error, (httpx.NetworkError, httpx.RemoteProtocolError))
+        if not (unsent or (resendable and method.upper() in IDEMPOTENT_METHODS)):
+            return None
+        return self._retry(limiter, f"failed with {type(error).__name__}", type(error).__name__,
+                           self._backoff(attempt), attempt, retries)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry(self, limiter, what, reason, delay, attempt, retries):
+        left = deadlines.remaining()
+        if left is not None and delay >= left:
+            return None  # the retry would land after the caller gave up
+        metrics.UPSTREAM_RETRIES.labels(limiter.host, reason).inc()
+        logging.warning(f"{limiter.host} {what}; retry {attempt + 1}/{retries} in {delay:.2f}s")
+        return delay
+
+
+scheduler = UpstreamScheduler()
@@ -1,7 +1,35 @@
-import httpx
+import asyncio
+import itertools
+import sys
+from array import array
+from contextlib import aclosing
 
-MUSICBRAINZ_SEARCH_URL = "https://musicbrainz.org/ws/2/recording"
-ACOUSTICBRAINZ_URL = "https://acousticbrainz.org/api/v1"
+import config
+import local_features
+from ab_index import get_ab_index
+from feature_cache import get_feature_cache
+from json_stream import select_paths
+from singleflight import SingleFlight
+from tracing import tracer
+from upstream import BACKGROUND, INTERACTIVE, scheduler
+
+MUSICBRAINZ_SEARCH_URL = f"{config.MUSICBRAINZ_URL}/ws/2/recording"
+ACOUSTICBRAINZ_URL = f"{config.ACOUSTICBRAINZ_URL}/api/v1"
+_MB_SEARCH_LIMIT = 100  # the most results MusicBrainz returns per search page
+
+# The only parts of an AcousticBrainz low-level document extract_ab_features reads
+LOWLEVEL_PATHS = ["rhythm.beats_position", "lowlevel.mfcc.mean", "metadata.audio_properties.length"]
+
+# Bump when extract_ab_features' output changes, so clients holding an ETag for
+# the old output get the new one instead of a 304
+FEATURES_VERSION = 1
+
+class NoFeaturesError(Exception):
+    """The upstream services answered, and have no features for this track.
+
+    Unlike a failed request, this is final: AcousticBrainz is frozen, so only
+    these tracks are worth analysing locally.
+    """
 
 def extract_ab_metrics(hl: dict) -> dict:
     """Return (energy, danceability, valence, tempo) as floats ∈ [0,1]."""
@@ -31,41 +59,309 @@ def extract_ab_metrics(hl: dict) -> dict:
         "tempo": round(tempo, 3),
     }
 
-async def get_acousticbrainz_features(isrc: str) -> dict:
-    async with httpx.AsyncClient(headers={"User-Agent": "YourAppName/1.0"}) as client:
-        # MusicBrainz search
-        params = {"query": f"isrc:{isrc}", "fmt": "json", "limit": 1}
-        mb_resp = await client.get("https://musicbrainz.org/ws/2/recording/", params=params)
-        if mb_resp.status_code != 200:
-            raise Exception(f"MusicBrainz ISRC search failed: {mb_resp.text}")
-        recordings = mb_resp.json().get("recordings", [])
-        if not recordings:
-            raise Exception("No MusicBrainz recordings found")
-
-        mbid = recordings[0]["id"]
-
-        # High-level data
-        ab_high_resp = await client.get(f"https://acousticbrainz.org/api/v1/{mbid}/high-level")
-        if ab_high_resp.status_code != 200:
-            raise Exception("No AcousticBrainz high-level data found")
-        highlevel = ab_high_resp.json().get("highlevel", {})
-
-        # Low-level data
-        ab_low_resp = await client.get(f"https://acousticbrainz.org/api/v1/{mbid}/low-level")
+def extract_ab_features(highlevel: dict, lowlevel: dict) -> dict:
+    """Everything the visualizer needs from the AcousticBrainz high/low-level docs."""
+    return {
+        **extract_ab_metrics(highlevel),
+        "beats": lowlevel.get("rhythm", {}).get("beats_position", []),
+        "mfccs": lowlevel.get("lowlevel", {}).get("mfcc", {}).get("mean", []),
+        "length": lowlevel.get("metadata", {}).get("audio_properties", {}).get("length", 0.0),
+    }
+
+def pack_f32(values) -> bytes:
+    """Pack numbers as little-endian float32, the layout a JS Float32Array reads."""
+    packed = array("f", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+def _ab_index():
+    """The offline AcousticBrainz index, if one was built with this FEATURES_VERSION."""
+    index = get_ab_index()
+    return index if index.features_version() == FEATURES_VERSION else None
+
+# Concurrent lookups for the same key share one upstream fetch, per stage
+_isrc_flights = SingleFlight("track_isrc")
+_mbid_flights = SingleFlight("isrc_mbid")
+_feature_flights = SingleFlight("features")
+
+async def get_spotify_isrc(track_id: str, access_token: str) -> str:
+    isrc = await get_feature_cache().lookup("track_isrc", track_id)
+    if isrc:
+        return isrc
+    return await _isrc_flights.do(track_id, lambda: _fetch_spotify_isrc(track_id, access_token))
+
+async def _fetch_spotify_isrc(track_id: str, access_token: str) -> str:
+    track_url = f"{config.SPOTIFY_API_URL}/v1/tracks/{track_id}"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    track_resp = await scheduler.request("GET", track_url, headers=headers)
+    if track_resp.status_code != 200:
+        raise Exception(f"Spotify track metadata error: {track_resp.text}")
+
+    isrc = track_resp.json().get("external_ids", {}).get("isrc")
+    if not isrc:
+        raise NoFeaturesError("No ISRC found in Spotify metadata")
+    get_feature_cache().put_isrc(track_id, isrc)
+    return isrc
+
+async def get_mbid(isrc: str) -> str:
+    mbid = await get_feature_cache().lookup("isrc_mbid", isrc)
+    if mbid:
+        return mbid
+    index = _ab_index()
+    mbid = index and index.mbid(isrc)
+    if mbid:
+        return mbid
+    return await _mbid_flights.do(isrc, lambda: _search_mbid(isrc))
+
+async def _search_mbid(isrc: str) -> str:
+    params = {"query": f"isrc:{isrc}", "fmt": "json", "limit": 1}
+    mb_resp = await scheduler.request("GET", f"{MUSICBRAINZ_SEARCH_URL}/", params=params)
+    if mb_resp.status_code != 200:
+        raise Exception(f"MusicBrainz ISRC search failed: {mb_resp.text}")
+    recordings = mb_resp.json().get("recordings", [])
+    if not recordings:
+        raise NoFeaturesError("No MusicBrainz recordings found")
+
+    mbid = recordings[0]["id"]
+    get_feature_cache().put_mbid(isrc, mbid)
+    return mbid
+
+async def fetch_ab_features(mbid: str, priority: int = INTERACTIVE) -> dict:
+    """High- and low-level AcousticBrainz lookups for one MBID, cached.
+
+    The offline index (ab_index.py) answers before any live call is made.
+    """
+    features = await get_feature_cache().lookup("features", mbid)
+    if features is not None:
+        return features
+    index = _ab_index()
+    features = index and index.features(mbid)
+    if features is not None:
+        return features
+    return await _feature_flights.do(mbid, lambda: _fetch_ab_features(mbid, priority))
+
+async def _fetch_ab_features(mbid: str, priority: int) -> dict:
+    # High-level data
+    ab_high_resp = await scheduler.request(
+        "GET", f"{ACOUSTICBRAINZ_URL}/{mbid}/high-level", priority=priority
+    )
+    if ab_high_resp.status_code == 404:
+        raise NoFeaturesError("No AcousticBrainz high-level data found")
+    if ab_high_resp.status_code != 200:
+        raise Exception(f"AcousticBrainz high-level lookup failed with HTTP {ab_high_resp.status_code}")
+    highlevel = ab_high_resp.json().get("highlevel", {})
+
+    # Low-level data: a large document of which only a few fields are used,
+    # so parse those out of the stream instead of building the whole tree
+    ab_low_resp = await scheduler.request(
+        "GET", f"{ACOUSTICBRAINZ_URL}/{mbid}/low-level", priority=priority, stream=True
+    )
+    try:
+        if ab_low_resp.status_code == 404:
+            raise NoFeaturesError("No AcousticBrainz low-level data found")
         if ab_low_resp.status_code != 200:
-            raise Exception("No AcousticBrainz low-level data found")
-        lowlevel = ab_low_resp.json()
+            raise Exception(f"AcousticBrainz low-level lookup failed with HTTP {ab_low_resp.status_code}")
+        with tracer.start_as_current_span("acousticbrainz low-level parse"):
+            async with aclosing(ab_low_resp.aiter_bytes()) as chunks:
+                lowlevel = await select_paths(chunks, LOWLEVEL_PATHS)
+    finally:
+        await ab_low_resp.aclose()
+
+    features = extract_ab_features(highlevel, lowlevel)
+    get_feature_cache().put_features(mbid, features)
+    return features
+
+async def get_acousticbrainz_features(isrc: str) -> dict:
+    mbid = await get_mbid(isrc)
+    features = await fetch_ab_features(mbid)
+
+    return {"success": True, **features}
+
+async def get_track_features(track_id: str, access_token: str) -> dict:
+    """Features for one Spotify track: AcousticBrainz's, or computed from its audio when it has none.
+
+    Only a NoFeaturesError falls back; failed requests propagate, so the next
+    call asks upstream again. A track that was analysed locally once is
+    served from that result from then on, without repeating the lookups
+    that found nothing the first time.
+    """
+    found, _ = await local_features.cached_features([track_id])
+    if track_id in found:
+        return {"success": True, **found[track_id]}
+    try:
+        isrc = await get_spotify_isrc(track_id, access_token)
+        return await get_acousticbrainz_features(isrc)
+    except NoFeaturesError as e:
+        if not config.LOCAL_FEATURES_ENABLED:
+            raise
+        try:
+            features = await local_features.get_local_features(track_id, access_token)
+        except Exception as local_error:
+            if str(local_error) == str(e):
+                raise
+            raise Exception(f"{e}; {local_error}") from e
+        return {"success": True, **features}
+
+# ── Batch pipeline ───────────────────────────────────────────────────────────
+# Each stage takes many keys and returns (results, errors) dicts keyed the same
+# way, so one bad track never fails the rest of the batch. Errors are the
+# exception for each key, so callers can tell NoFeaturesError from a failure.
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+async def get_spotify_isrcs(track_ids: list[str], access_token: str,
+                            priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Resolve ISRCs through Spotify's multi-id /v1/tracks endpoint."""
+    cache = get_feature_cache()
+    isrcs = await cache.get_many("track_isrc", track_ids)
+    errors = {}
+    missing = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in isrcs]
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    for chunk in _chunks(missing, config.SPOTIFY_TRACKS_BATCH_SIZE):
+        resp = await scheduler.request(
+            "GET", f"{config.SPOTIFY_API_URL}/v1/tracks",
+            params={"ids": ",".join(chunk)}, headers=headers, priority=priority,
+        )
+        if resp.status_code != 200:
+            for track_id in chunk:
+                errors[track_id] = Exception(f"Spotify track metadata error: {resp.text}")
+            continue
+
+        # Spotify returns tracks in request order, with null for unknown ids
+        for track_id, track in zip(chunk, resp.json().get("tracks", [])):
+            if track is None:
+                errors[track_id] = Exception("Spotify track not found")
+                continue
+            isrc = track.get("external_ids", {}).get("isrc")
+            if isrc:
+                isrcs[track_id] = isrc
+                cache.put_isrc(track_id, isrc)
+            else:
+                errors[track_id] = NoFeaturesError("No ISRC found in Spotify metadata")
+
+    for track_id in missing:
+        if track_id not in isrcs and track_id not in errors:
+            errors[track_id] = Exception("Spotify track not found")
+    return isrcs, errors
+
+async def get_mbids(isrcs: list[str], priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Resolve many ISRCs per MusicBrainz search using OR queries."""
+    cache = get_feature_cache()
+    index = _ab_index()
+    mbids = await cache.get_many("isrc_mbid", isrcs)
+    errors, missing = {}, []
+    for isrc in dict.fromkeys(isrcs):
+        mbid = mbids.get(isrc) or (index and index.mbid(isrc))
+        if mbid:
+            mbids[isrc] = mbid
+        else:
+            missing.append(isrc)
+
+    for chunk in _chunks(missing, config.MUSICBRAINZ_ISRC_BATCH_SIZE):
+        query = " OR ".join(f"isrc:{isrc}" for isrc in chunk)
+        # Spotify's ISRCs are not always upper case, MusicBrainz's are
+        wanted, offset, failure = {}, 0, None
+        for isrc in chunk:
+            wanted.setdefault(isrc.upper(), []).append(isrc)
+        # One ISRC can match many recordings, so the hits for a chunk may
+        # span pages; read on until every ISRC is matched or the hits run out
+        while wanted:
+            params = {"query": query, "fmt": "json", "limit": _MB_SEARCH_LIMIT, "offset": offset}
+            mb_resp = await scheduler.request(
+                "GET", f"{MUSICBRAINZ_SEARCH_URL}/", params=params, priority=priority
+            )
+            if mb_resp.status_code != 200:
+                failure = Exception(f"MusicBrainz ISRC search failed: {mb_resp.text}")
+                break
+
+            # Results are score-ordered across pages; keep the best recording for each ISRC
+            body = mb_resp.json()
+            recordings = body.get("recordings", [])
+            for recording in recordings:
+                for found in recording.get("isrcs", []):
+                    for isrc in wanted.pop(found.upper(), ()):
+                        mbids[isrc] = recording["id"]
+                        cache.put_mbid(isrc, recording["id"])
+            offset += len(recordings)
+            if not recordings or offset >= body.get("count", 0):
+                break
+
+        # Only a search that was read to the end says an ISRC has no recording
+        for isrc in itertools.chain.from_iterable(wanted.values()):
+            errors[isrc] = failure or NoFeaturesError("No MusicBrainz recordings found")
+
+    return mbids, errors
+
+async def get_acousticbrainz_features_batch(track_ids: list[str], access_token: str,
+                                            priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Features for many Spotify tracks at once, as (features, error messages) keyed by track id.
+
+    Batches are grid pre-computation, so they run in the background lane by
+    default and yield to interactive lookups on every upstream host. Tracks
+    AcousticBrainz has nothing for are analysed locally instead.
+    """
+    results, pending = await local_features.cached_features(track_ids)
+    track_mbids, errors = await resolve_mbids(pending, access_token, priority)
+    by_mbid = await fetch_ab_features_many(list(track_mbids.values()), priority)
+
+    for track_id, mbid in track_mbids.items():
+        outcome = by_mbid[mbid]
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome  # never mistaken for features
+        if isinstance(outcome, Exception):
+            errors[track_id] = outcome
+        else:
+            results[track_id] = outcome
+
+    analysed, errors = await analyse_failed_locally(errors, access_token, priority)
+    results.update(analysed)
+    return results, errors
+
+async def analyse_failed_locally(errors: dict, access_token: str,
+                                 priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Local analysis for a batch's NoFeaturesError tracks, as (features, messages for the rest).
+
+    Other errors are reported as they are, so a later batch asks upstream again.
+    """
+    missing = [track_id for track_id, error in errors.items() if isinstance(error, NoFeaturesError)]
+    features, local_errors = {}, {}
+    if missing and config.LOCAL_FEATURES_ENABLED:
+        features, local_errors = await local_features.analyse_tracks(missing, access_token, priority)
+
+    remaining = {}
+    for track_id, error in errors.items():
+        if track_id in features:
+            continue
+        message, local_error = str(error), local_errors.get(track_id)
+        remaining[track_id] = f"{message}; {local_error}" if local_error and local_error != message else message
+    return features, remaining
+
+async def resolve_mbids(track_ids: list[str], access_token: str,
+                        priority: int = BACKGROUND) -> tuple[dict, dict]:
+    """Spotify track id -> MBID for many tracks, as (mbids, errors) keyed by track id."""
+    isrcs, errors = await get_spotify_isrcs(track_ids, access_token, priority)
+    mbids, isrc_errors = await get_mbids(list(isrcs.values()), priority)
 
-        beats = lowlevel.get("rhythm", {}).get("beats_position", [])
-        mfccs = lowlevel.get("lowlevel", {}).get("mfcc", []).get("mean", [])
+    track_mbids = {}
+    for track_id, isrc in isrcs.items():
+        if isrc in mbids:
+            track_mbids[track_id] = mbids[isrc]
+        else:
+            errors[track_id] = isrc_errors.get(isrc) or NoFeaturesError("No MusicBrainz recordings found")
+    return track_mbids, errors
 
+async def fetch_ab_features_many(mbids: list[str], priority: int = BACKGROUND) -> dict:
+    """fetch_ab_features for each distinct MBID; values are features or the exception raised."""
+    semaphore = asyncio.Semaphore(config.ACOUSTICBRAINZ_BATCH_CONCURRENCY)
 
-        # Extract metrics function (your existing or updated one)
-        metrics = extract_ab_metrics(highlevel)
+    async def fetch(mbid):
+        async with semaphore:
+            return await fetch_ab_features(mbid, priority)
 
-        return {
-            "success": True,
-            **metrics,
-            "beats": beats,
-            "mfccs": mfccs,
-        }
+    unique = list(dict.fromkeys(mbids))
+    fetched = await asyncio.gather(*(fetch(mbid) for mbid in unique), return_exceptions=True)
+    return dict(zip(unique, fetched))
@@ -5,15 +5,16 @@ import { TileGrid } from './components/TileGrid'
 import { DragCameraControls } from './utils/DragCameraControls'
 import {
   getAccessToken,
+  getSessionId,
   redirectToSpotifyAuth,
 } from './hooks/spotifyAccessToken'
-import { fetchUserLikedTracks } from './hooks/spotifyApi'
+import { streamUserLikedTracks } from './hooks/spotifyApi'
 import { playNextTrack } from './hooks/spotifyPlayer'
 import { TrackInfo } from './types/spotifyTypes'
 // import { FocusedTrackScene } from './components/FocusedTrackScene'
 import AudioParticleField  from './components/AudioParticleField'
 import { CameraFlyTransition } from './components/CameraFlyTransition' // <-- we'll add this!
-import { useAudioAnalysis } from './hooks/spotifyAudioAnalysis'
+import { prefetchAudioAnalysis, useAudioAnalysis } from './hooks/spotifyAudioAnalysis'
 import { Html } from '@react-three/drei'
 import './index.css'
 
@@ -50,13 +51,14 @@ const App: React.FC = () => {
   console.log("Active track:", activeTrack, "Analysis:", analysis, "Loading:", analysisLoading
   )
   useEffect(() => {
+    let cancelled = false
     const init = async () => {
       let token = getAccessToken()
 
       const urlParams = new URLSearchParams(window.location.search)
       const code = urlParams.get('code')
 
-      if (!token && code) {
+      if (!token && !getSessionId() && code) {
         try {
           const response = await fetch('http://127.0.0.1:8000/auth/exchange', {
             method: 'POST',
@@ -70,7 +72,10 @@ const App: React.FC = () => {
             if (token) {
               localStorage.setItem('access_token', token)
             }
-            localStorage.setItem('expires_at', (Date.now() + 3600 * 1000).toString())
+            localStorage.setItem('expires_at', (Date.now() + (data.expires_in ?? 3600) * 1000).toString())
+            if (data.session_id) {
+              localStorage.setItem('session_id', data.session_id)
+            }
           }
 
           window.history.replaceState({}, '', window.location.pathname)
@@ -79,22 +84,34 @@ const App: React.FC = () => {
         }
       }
 
-      if (!token) {
+      if (!token && !getSessionId()) {
         redirectToSpotifyAuth()
         return
       }
 
       try {
-        const fetchedTracks = await fetchUserLikedTracks(token, 500)
-        const arts = fetchedTracks.map((item) => item.album.images[0]?.url)
-        setAlbumTracks(fetchedTracks)
-        setAlbumArts(arts)
+        // Render tiles as each page arrives instead of waiting for the whole library
+        let prefetched = false
+        await streamUserLikedTracks(token ?? '', (tracks) => {
+          if (cancelled) return
+          if (!prefetched) {
+            // The first tiles are the ones most likely to be opened
+            prefetched = true
+            prefetchAudioAnalysis(tracks.map((t) => t.id), token).catch(() => {})
+          }
+          const arts = tracks.map((item) => item.album.images[0]?.url)
+          setAlbumTracks((prev) => [...prev, ...tracks])
+          setAlbumArts((prev) => [...prev, ...arts])
+        }, 500)
       } catch (err) {
         console.error('Error fetching liked songs:', err)
       }
     }
 
     init()
+    return () => {
+      cancelled = true
+    }
   }, [])
 
   return (
@@ -141,6 +158,8 @@ const App: React.FC = () => {
             beats={analysis.beats}
             danceability={analysis.danceability}
             mfccs={analysis.mfccs}
+            pulse={analysis.pulse}
+            frameRate={analysis.frameRate}
             onBack={() => setScene('transition-out')}
           />
         </Html>
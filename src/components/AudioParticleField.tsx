@@ -11,7 +11,7 @@ import Dither from "../utils/Dither";
 
 /* ------------------------------------------------ helpers */
 
-function interpolateMFCCs(mfcc: number[], beats: number[]) {
+function interpolateMFCCs(mfcc: ArrayLike<number>, beats: ArrayLike<number>) {
   if (!mfcc.length || !beats.length) return [];
   const M = beats.length;
   const N = mfcc.length;
@@ -31,8 +31,10 @@ interface MusicDitherFieldProps {
   valence: number;
   tempo: number;
   danceability: number;
-  beats: number[];
-  mfccs: number[]; // mean vector
+  beats: ArrayLike<number>;
+  mfccs: ArrayLike<number>; // mean vector
+  pulse?: ArrayLike<number>; // precomputed beat envelope, one sample per frame
+  frameRate?: number;
   onBack?: () => void;
   style?: React.CSSProperties;
 }
@@ -44,6 +46,8 @@ export default function MusicDitherField({
   danceability,
   beats = [],
   mfccs = [],
+  pulse,
+  frameRate = 30,
   onBack,
   style,
 }: MusicDitherFieldProps) {
@@ -79,15 +83,22 @@ export default function MusicDitherField({
         beatIdxRef.current++;
       }
 
-      // decay burst & ease hue ---------------------------------------
-      burstRef.current = Math.max(0, burstRef.current - 0.02);
+      // burst from the server timeline, else decay locally ----------
+      if (pulse && pulse.length) {
+        const f = Math.min(t * frameRate, pulse.length - 1);
+        const i = Math.floor(f);
+        burstRef.current = i + 1 < pulse.length ? pulse[i] + (pulse[i + 1] - pulse[i]) * (f - i) : pulse[i];
+      } else {
+        burstRef.current = Math.max(0, burstRef.current - 0.02);
+      }
+      // ease hue -----------------------------------------------------
       hueCurrentRef.current += (hueTargetRef.current - hueCurrentRef.current) * 0.05; // lerp 5%
 
       rafRef.current = requestAnimationFrame(loop);
     };
     rafRef.current = requestAnimationFrame(loop);
     return () => rafRef.current && cancelAnimationFrame(rafRef.current);
-  }, [beats, mfccPerBeat, valence]);
+  }, [beats, mfccPerBeat, valence, pulse, frameRate]);
 
   /* ---------- colour helper ---------- */
   const waveColor = useMemo<[number, number, number]>(() => {
@@ -20,6 +20,8 @@ export const TileGrid: React.FC<TileGridProps> = ({
   const { camera, raycaster, pointer } = useThree()
   const tileRefs = useRef<Array<Mesh>>([])
   const textures = useRef<Array<THREE.Texture | null>>([])
+  // Keyed by image URL so tracks arriving later don't reload existing textures
+  const textureCache = useRef(new Map<string, Promise<THREE.Texture>>())
   const [loaded, setLoaded] = useState(false)
 
   const hoverHeight = 1.0
@@ -28,12 +30,17 @@ export const TileGrid: React.FC<TileGridProps> = ({
   useEffect(() => {
     const loader = new TextureLoader()
     Promise.all(
-      tracks.map(
-        (track) =>
-          new Promise<THREE.Texture>((resolve) => {
-            loader.load(track.album.images[0]?.url, resolve)
+      tracks.map((track) => {
+        const url = track.album.images[0]?.url
+        let texture = textureCache.current.get(url)
+        if (!texture) {
+          texture = new Promise<THREE.Texture>((resolve) => {
+            loader.load(url, resolve)
           })
-      )
+          textureCache.current.set(url, texture)
+        }
+        return texture
+      })
     ).then((loadedTextures) => {
       textures.current = loadedTextures
       setLoaded(true)
@@ -52,6 +52,17 @@ export function getAccessToken(): string | null {
   return null
 }
 
+// Server-side session from /auth/exchange; the backend keeps its token fresh
+export function getSessionId(): string | null {
+  return localStorage.getItem('session_id')
+}
+
+// Request body fields naming the caller: the session when there is one, else the raw token
+export function authFields(token: string | null): { access_token: string; session_id?: string } {
+  const sessionId = getSessionId()
+  return sessionId ? { access_token: '', session_id: sessionId } : { access_token: token ?? '' }
+}
+
 // Retrieve refresh token from localStorage
 export function getRefreshToken(): string | null {
   return localStorage.getItem('refresh_token')
@@ -1,4 +1,5 @@
-import { TrackInfo } from '../types/spotifyTypes'
+import { AlbumInfo, ArtistInfo, TrackInfo } from '../types/spotifyTypes'
+import { authFields } from './spotifyAccessToken'
 
 export async function fetchUserLikedTracks(token: string, total = 50): Promise<TrackInfo[]> {
   const response = await fetch('http://127.0.0.1:8000/tracks/liked', {
@@ -6,7 +7,7 @@ export async function fetchUserLikedTracks(token: string, total = 50): Promise<T
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ access_token: token, total }),
+    body: JSON.stringify({ ...authFields(token), total }),
   })
 
   const data = await response.json()
@@ -15,4 +16,62 @@ export async function fetchUserLikedTracks(token: string, total = 50): Promise<T
     throw new Error('Failed to fetch liked tracks from backend')
   }
   return data.tracks
-}
\ No newline at end of file
+}
+
+// Streams liked tracks as NDJSON, calling onTracks once per received chunk.
+// total = 0 streams the whole library.
+export async function streamUserLikedTracks(
+  token: string,
+  onTracks: (tracks: TrackInfo[]) => void,
+  total = 0,
+): Promise<void> {
+  const response = await fetch('http://127.0.0.1:8000/tracks/liked/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ ...authFields(token), total, normalized: true }),
+  })
+
+  if (!response.ok || !response.body) {
+    throw new Error('Failed to stream liked tracks from backend')
+  }
+
+  // Each line is a page; albums/artists are sent once and tracks index into
+  // these tables, so every track of an album shares one AlbumInfo object
+  const albums: AlbumInfo[] = []
+  const artists: ArtistInfo[] = []
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+  let buffered = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffered += value
+    const lines = buffered.split('\n')
+    buffered = lines.pop() ?? ''
+
+    const tracks: TrackInfo[] = []
+    for (const line of lines) {
+      if (!line) continue
+      const page = JSON.parse(line)
+      if (page.success === false) {
+        throw new Error(page.error ?? 'Liked tracks stream failed')
+      }
+      albums.push(...page.albums)
+      artists.push(...page.artists)
+      for (const track of page.tracks) {
+        const trackArtists = track.artist_indices.map((i: number) => artists[i])
+        tracks.push({
+          id: track.id,
+          name: track.name,
+          uri: track.uri,
+          album: albums[track.album_index],
+          artists: trackArtists,
+          artist: trackArtists[0]?.name ?? '',
+        })
+      }
+    }
+    if (tracks.length > 0) onTracks(tracks)
+  }
+}
@@ -1,13 +1,66 @@
 import { useState, useEffect } from 'react'
 import { TrackInfo } from '../types/spotifyTypes'
+import { authFields } from './spotifyAccessToken'
 
 type AudioAnalysis = {
   energy: number
   valence: number
   tempo: number
   danceability: number
-  beats: number[]
-  mfccs: number[]
+  beats: Float32Array
+  mfccs: Float32Array
+  // Server-computed beat pulse sampled at `frameRate` frames per second
+  pulse?: Float32Array
+  frameRate?: number
+}
+
+// Layout of the proxy's `format: 'binary'` body (all float32, little-endian):
+// [energy, valence, tempo, danceability, nBeats, nMfccs, ...beats, ...mfccs]
+const HEADER_LENGTH = 6
+
+function decodeAnalysis(buffer: ArrayBuffer): AudioAnalysis {
+  const values = new Float32Array(buffer)
+  const nBeats = values[4]
+  const nMfccs = values[5]
+  return {
+    energy: values[0],
+    valence: values[1],
+    tempo: values[2],
+    danceability: values[3],
+    // Views into the same buffer; no copying or number parsing
+    beats: values.subarray(HEADER_LENGTH, HEADER_LENGTH + nBeats),
+    mfccs: values.subarray(HEADER_LENGTH + nBeats, HEADER_LENGTH + nBeats + nMfccs),
+  }
+}
+
+// Bodies we already hold, by track id; revalidated with If-None-Match instead of refetched
+const analysisCache = new Map<string, { etag: string; buffer: ArrayBuffer }>()
+
+function decodeFloat32(b64: string): Float32Array {
+  const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0))
+  return new Float32Array(bytes.buffer)
+}
+
+async function fetchPulseTimeline(trackId: string, accessToken: string) {
+  const res = await fetch('http://localhost:8000/audio-analysis/timelines', {
+    method: 'POST',
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ track_ids: [trackId], ...authFields(accessToken) }),
+  })
+  const data = await res.json()
+  const timeline = data.success && data.timelines?.[trackId]
+  if (!timeline) return null
+  return { pulse: decodeFloat32(timeline.pulse), frameRate: data.frame_rate as number }
+}
+
+// Ask the backend to warm features and timelines for tracks likely to be opened soon
+export async function prefetchAudioAnalysis(trackIds: string[], accessToken: string | null): Promise<void> {
+  if (!trackIds.length) return
+  await fetch('http://localhost:8000/audio-analysis/prefetch', {
+    method: 'POST',
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ track_ids: trackIds, ...authFields(accessToken) }),
+  })
 }
 
 export function useAudioAnalysis(track: TrackInfo | null, accessToken: string | null) {
@@ -22,25 +75,34 @@ export function useAudioAnalysis(track: TrackInfo | null, accessToken: string |
     }
     setLoading(true)
     setError(null)
+    const timeline = fetchPulseTimeline(track.id, accessToken).catch(() => null)
+    const cached = analysisCache.get(track.id)
     fetch('http://localhost:8000/audio-analysis', {
       method: 'POST',
       headers: {
-        "Content-Type": "application/json"
+        "Content-Type": "application/json",
+        ...(cached ? { "If-None-Match": cached.etag } : {}),
       },
-      body: JSON.stringify({ track_id: track.id, access_token: accessToken }),
+      body: JSON.stringify({ track_id: track.id, ...authFields(accessToken), format: 'binary' }),
     })
-      .then(res => res.json())
-      .then(data => {
+      .then(async res => {
+        if (res.status === 304 && cached) {
+          return { success: true, analysis: decodeAnalysis(cached.buffer) }
+        }
+        // Successes come back as raw float32; errors are still JSON
+        if (res.headers.get('Content-Type')?.startsWith('application/octet-stream')) {
+          const buffer = await res.arrayBuffer()
+          const etag = res.headers.get('ETag')
+          if (etag) analysisCache.set(track.id, { etag, buffer })
+          return { success: true, analysis: decodeAnalysis(buffer) }
+        }
+        return res.json()
+      })
+      .then(async data => {
         console.log('Audio analysis response:', data)
         if (data.success) {
-          setAnalysis({
-            energy: data.energy,
-            valence: data.valence,
-            tempo: data.tempo,
-            danceability: data.danceability,
-            beats: data.beats,
-            mfccs: data.mfccs,
-          })
+          // The pulse is optional; the field falls back to its own beat decay without it
+          setAnalysis({ ...data.analysis, ...(await timeline) })
         } else {
           console.warn('No audio analysis available:', data.error)
           setAnalysis(null)
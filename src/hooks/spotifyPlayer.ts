@@ -1,18 +1,45 @@
-export async function playNextTrack(currentUri: string, allUris: string[], token: string) {
-  const res = await fetch("http://localhost:8000/tracks/play-next", {
+import { authFields } from './spotifyAccessToken'
+
+// Play order registered with the backend, so clicks only send the queue id and a track
+let queue: { id: string; uris: string[] } | null = null
+
+async function postJson(path: string, body: object) {
+  const res = await fetch(`http://localhost:8000${path}`, {
     method: "POST",
-    headers: {
-      Authorization: `Bearer ${token}`,
-      "Content-Type": "application/json"
-    },
-    body: JSON.stringify({
-      access_token: token,
-      current_track_uri: currentUri,
-      uris: allUris,
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  })
+  if (!res.ok) {
+    throw new Error(`${path} failed with ${res.status}`)
+  }
+  return res.json()
+}
+
+async function syncQueue(allUris: string[]): Promise<string> {
+  if (queue && queue.uris.length === allUris.length && queue.uris.every((uri, i) => uri === allUris[i])) {
+    return queue.id
+  }
+  if (queue && queue.uris.length < allUris.length && queue.uris.every((uri, i) => uri === allUris[i])) {
+    // The library grew page by page; send only the new tail
+    await postJson("/tracks/queue/update", {
+      queue_id: queue.id,
+      add_uris: allUris.slice(queue.uris.length),
+      add_at_front: false,
     })
-  });
+  } else {
+    const data = await postJson("/tracks/queue", { uris: allUris, queue_id: queue?.id ?? "" })
+    queue = { id: data.queue_id, uris: [] }
+  }
+  queue.uris = [...allUris]
+  return queue.id
+}
 
-  if (!res.ok) {
-    throw new Error("Failed to start next track playback");
+export async function playNextTrack(currentUri: string, allUris: string[], token: string) {
+  try {
+    const queueId = await syncQueue(allUris)
+    await postJson("/tracks/queue/play", { ...authFields(token), queue_id: queueId, track_uri: currentUri })
+  } catch (err) {
+    queue = null // registered again on the next click
+    throw new Error(`Failed to start next track playback: ${err}`)
   }
-}
\ No newline at end of file
+}
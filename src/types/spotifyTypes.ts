@@ -1,12 +1,21 @@
+export type AlbumInfo = {
+      images: { url: string }[]
+      uri: string
+      id: string
+      name: string
+  }
+
+export type ArtistInfo = {
+      name: string
+      id: string
+      uri: string
+  }
+
 export type TrackInfo = {
       id: string
       name: string
       artist: string
+      artists?: ArtistInfo[]
       uri: string
-      album: {
-        images: { url: string }[]
-        uri: string
-        id: string
-        name: string
-      }
+      album: AlbumInfo
   }
\ No newline at end of file